@@ -0,0 +1,190 @@
+import json
+import os
+from threading import Lock
+from eth_abi import encode
+from web3 import Web3
+from DEX.constants import ZERO_ADDRESS
+
+
+def sort_tokens(token_a: str, token_b: str) -> tuple[str, str]:
+    """
+    @param token_a: token address
+    @param token_b: token address
+    @return: (token0, token1) checksum addresses in the same order as pair and pool contracts store them
+    """
+    token_a = Web3.to_checksum_address(token_a)
+    token_b = Web3.to_checksum_address(token_b)
+    return (token_a, token_b) if int(token_a, 16) < int(token_b, 16) else (token_b, token_a)
+
+
+def create2_address(deployer: str, salt: bytes, init_code_hash: str) -> str:
+    """
+    Address of a contract deployed with CREATE2 opcode
+    @param deployer: address of a deploying contract
+    @param salt: 32 bytes salt
+    @param init_code_hash: keccak256 hash of the contract creation code
+    @return: checksum address
+    """
+    address = Web3.keccak(b'\xff' + bytes.fromhex(deployer[2:]) + salt
+                          + bytes.fromhex(init_code_hash.removeprefix('0x')))[12:]
+    return Web3.to_checksum_address(address)
+
+
+def compute_v2_pair_address(factory: str, token_a: str, token_b: str, init_code_hash: str) -> str:
+    """
+    The same as pairFor function of a UniswapV2Library
+    @param factory: factory contract address
+    @param token_a: token address
+    @param token_b: token address
+    @param init_code_hash: keccak256 hash of a pair contract creation code
+    @return: checksum address of a pair contract
+    """
+    token0, token1 = sort_tokens(token_a, token_b)
+    salt = Web3.solidity_keccak(['address', 'address'], [token0, token1])
+    return create2_address(factory, salt, init_code_hash)
+
+
+def compute_v3_pool_address(deployer: str, token_a: str, token_b: str, fee: int, init_code_hash: str) -> str:
+    """
+    The same as computeAddress function of a PoolAddress library of Uniswap V3 periphery
+    @param deployer: factory contract address, or pool deployer for forks which split them
+    @param token_a: token address
+    @param token_b: token address
+    @param fee: pool fee in hundredths of a bip
+    @param init_code_hash: keccak256 hash of a pool contract creation code
+    @return: checksum address of a pool contract
+    """
+    token0, token1 = sort_tokens(token_a, token_b)
+    salt = Web3.keccak(encode(['address', 'address', 'uint24'], [token0, token1, fee]))
+    return create2_address(deployer, salt, init_code_hash)
+
+
+class AddressResolver:
+    """
+    Resolves pair and pool contract addresses for exchanges of one network.
+    Addresses are computed offline with CREATE2 formula, verified on-chain once
+    and saved to an index file DEX/resources/pools/{network}-{subnet}.json,
+    so the next start doesn't need any request for already known pools.
+    Exchanges without a known init code hash are resolved by their Factory contract,
+    results are saved to the same index.
+    Index structure: {exchange class name: {fee: {"token0-token1": address}}}
+    """
+
+    # token0() function selector, pair and pool contracts have it
+    TOKEN0_SELECTOR = '0x0dfe1681'
+
+    _resolvers = {}
+    _resolvers_lock = Lock()
+
+    def __init__(self, network: str, subnet: str, index_path: str = None):
+        """
+        @param network: network name like Ethereum, Polygon, etc.
+        @param subnet: MAINNET or TESTNET
+        @param index_path: path of the index file, DEX/resources/pools/{network}-{subnet}.json by default
+        """
+        if index_path is None:
+            index_path = f'{os.path.dirname(os.path.abspath(__file__))}/' \
+                         f'resources/pools/{network}-{subnet.lower()}.json'
+        self.index_path = index_path
+        self._lock = Lock()
+        self.index = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as file:
+                self.index = json.load(file)
+
+    @classmethod
+    def get(cls, network: str, subnet: str):
+        """
+        @param network: network name like Ethereum, Polygon, etc.
+        @param subnet: MAINNET or TESTNET
+        @return: resolver shared by all exchanges of the network in the process
+        """
+        key = (network.upper(), subnet.upper())
+        with cls._resolvers_lock:
+            if key not in cls._resolvers:
+                cls._resolvers[key] = cls(network, subnet)
+            return cls._resolvers[key]
+
+    def lookup(self, exchange_name: str, fee: int, token_a: str, token_b: str):
+        """
+        @param exchange_name: exchange class name
+        @param fee: pool fee in hundredths of a bip
+        @param token_a: token address
+        @param token_b: token address
+        @return: address from the index, None if it's unknown
+        """
+        token0, token1 = sort_tokens(token_a, token_b)
+        return self.index.get(exchange_name, {}).get(str(fee), {}).get(f'{token0}-{token1}')
+
+    def _add(self, exchange_name: str, fee: int, token_a: str, token_b: str, address: str):
+        """
+        Put address to the index
+        """
+        token0, token1 = sort_tokens(token_a, token_b)
+        self.index.setdefault(exchange_name, {}).setdefault(str(fee), {})[f'{token0}-{token1}'] = address
+
+    def save(self):
+        """
+        Write the index to index_path
+        """
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(self.index_path, 'w') as file:
+            json.dump(self.index, file, indent=2, sort_keys=True)
+
+    def resolve(self, exchange, pairs: dict) -> dict:
+        """
+        Find pair or pool addresses of the exchange.
+        1. Addresses from the index are returned without requests
+        2. Addresses computed with exchange.compute_pool_address are verified
+        by calling token0() on them, all in one multicall
+        3. Rest are requested from the factory with exchange.encode_factory_pool_call in one multicall
+        @param exchange: UniswapV2 or UniswapV3 like exchange object
+        @param pairs: dictionary {pair name: (token_a address, token_b address)}
+        @return: dictionary {pair name: address}, ZERO_ADDRESS for pairs without a pool
+        """
+        exchange_name = exchange.__class__.__name__
+        fee = exchange.pool_index_fee
+        with self._lock:
+            addresses = {}
+            for pair, (token_a, token_b) in pairs.items():
+                address = self.lookup(exchange_name, fee, token_a, token_b)
+                if address is not None:
+                    addresses[pair] = address
+            missing_pairs = [pair for pair in pairs if pair not in addresses]
+            if not missing_pairs:
+                return addresses
+
+            computed = {}
+            for pair in missing_pairs:
+                address = exchange.compute_pool_address(*pairs[pair])
+                if address is not None:
+                    computed[pair] = address
+            if computed:
+                calls = [(address, self.TOKEN0_SELECTOR) for address in computed.values()]
+                multicall_raw_data = exchange.multicall.functions.tryAggregate(False, calls).call()
+                for (pair, address), (success, raw_data) in zip(computed.items(), multicall_raw_data):
+                    # there is no code at the address if returned data is empty
+                    if success and len(raw_data) == 32:
+                        token0 = exchange.web3_client.codec.decode(['address'], raw_data)[0]
+                        if Web3.to_checksum_address(token0) == sort_tokens(*pairs[pair])[0]:
+                            addresses[pair] = address
+
+            factory_pairs = [pair for pair in missing_pairs if pair not in addresses]
+            if factory_pairs:
+                calls = [(exchange.factory.address, exchange.encode_factory_pool_call(*pairs[pair]))
+                         for pair in factory_pairs]
+                multicall_raw_data = exchange.multicall.functions.tryAggregate(False, calls).call()
+                for pair, (success, raw_data) in zip(factory_pairs, multicall_raw_data):
+                    address = ZERO_ADDRESS
+                    if success:
+                        address = Web3.to_checksum_address(
+                            exchange.web3_client.codec.decode(['address'], raw_data)[0])
+                    addresses[pair] = address
+
+            # pools which don't exist yet may be created later, so they are not saved
+            found_pairs = [pair for pair in missing_pairs if addresses[pair] != ZERO_ADDRESS]
+            for pair in found_pairs:
+                self._add(exchange_name, fee, *pairs[pair], addresses[pair])
+            if found_pairs:
+                self.save()
+        return addresses
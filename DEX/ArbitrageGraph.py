@@ -0,0 +1,487 @@
+import numpy as np
+from networkx import DiGraph
+from DEX.arbitrage_edges import pair_vertices, split_pair
+from DEX.PriceBook import PriceBook
+from DEX.ShardedCycleEvaluator import ShardedCycleEvaluator, top_cycle_profits
+
+
+class ArbitrageGraph:
+    """
+    Arbitrage graph and catalogue of its simple cycles kept between scans.
+    Vertices are "{exchange_name}_{pair_name}_{buy/sell}" like in token_edges.
+    When a pair appears or disappears only edges and cycles through its vertices are changed,
+    so a scan with the same pairs as the previous one doesn't search cycles at all.
+    Cycles are compiled to a matrix of vertex ids, so profits of all cycles
+    are summed log-rates of one price vector computed in one NumPy pass.
+    Without the catalogue profitable cycles are found by negative_cycles,
+    a hop indexed Bellman-Ford search over edges weighted by -log(rate)
+    """
+
+    # amount of (search, edge) candidates relaxed at once by negative_cycles
+    RELAXATION_BLOCK_SIZE = 1 << 20
+
+    def __init__(self, max_path_length: int = 4, catalogue: bool = True):
+        """
+        @param max_path_length: Max amount of steps in arbitrage cycles
+        @param catalogue: if False simple cycles are not enumerated,
+        which is exponential in max_path_length, use negative_cycles instead
+        """
+        self.catalogue = catalogue
+        self.graph = DiGraph()
+        # {exchange name: set of pair names} currently in the graph
+        self.pairs = {}
+        # {token: {exchange name: {vertex: (follows a buy vertex, follows a sell vertex)}}}
+        self._consumers = {}
+        # {token: {exchange name: {vertex: is buy vertex}}}
+        self._holders = {}
+        # cycles as tuples starting at their smallest vertex, dict keeps insertion order
+        self._cycles = {}
+        # {vertex: set of cycles through the vertex}
+        self._vertex_cycles = {}
+        # {vertex: id}, ids are never reused, so a pair quoted again gets its old ids
+        self._vertex_ids = {}
+        # id: (exchange name, pair name, is buy vertex)
+        self._vertex_quotes = []
+        # cycles compiled to arrays, None after the catalogue changed
+        self._compiled = None
+        self._max_path_length = None
+        self.max_path_length = max_path_length
+
+    @property
+    def max_path_length(self) -> int:
+        return self._max_path_length
+
+    @max_path_length.setter
+    def max_path_length(self, value: int):
+        """
+        Setting another length searches the cycle catalogue again
+        @raise ValueError: If value is not an integer bigger than 1
+        """
+        if not isinstance(value, int) or value < 2:
+            raise ValueError(f'max_path_length must be an integer bigger than 1, got {value}')
+        if value != self._max_path_length:
+            self._max_path_length = value
+            self._cycles = {}
+            self._vertex_cycles = {}
+            self._compiled = None
+            self._find_cycles(list(self.graph))
+
+    @property
+    def cycles(self) -> list[tuple]:
+        """
+        @return: simple cycles of the graph with 2 to max_path_length vertices,
+        in the order of cycle_profits results
+        """
+        return self._compile()['cycles']
+
+    def sync(self, price_books: list[tuple[str, list]]) -> tuple[int, int]:
+        """
+        Make the graph contain exactly the pairs of the price books:
+        pairs added with add_pair or quoted again are added, pairs missing from price books are removed
+        @param price_books: list of tuples (exchange name, pair names of its price book)
+        @return: amount of added and removed pairs
+        """
+        current = {exchange_name: set(pairs) for exchange_name, pairs in price_books}
+        removed = [(exchange_name, pair) for exchange_name, pairs in self.pairs.items()
+                   for pair in pairs - current.get(exchange_name, set())]
+        added = [(exchange_name, pair) for exchange_name, pairs in current.items()
+                 for pair in pairs - self.pairs.get(exchange_name, set())]
+        if removed:
+            self.remove_pairs(removed)
+        if added:
+            self.add_pairs(added)
+        return len(added), len(removed)
+
+    def add_pairs(self, pairs: list[tuple[str, str]]):
+        """
+        Add vertices of the pairs, their edges and cycles through them
+        @param pairs: list of tuples (exchange name, pair name)
+        """
+        new_vertices = []
+        for exchange_name, pair in pairs:
+            exchange_pairs = self.pairs.setdefault(exchange_name, set())
+            if pair in exchange_pairs:
+                continue
+            exchange_pairs.add(pair)
+            for vertex, is_buy, held, consumed, after_buy, after_sell in pair_vertices(exchange_name, pair):
+                self.graph.add_node(vertex)
+                # edges to vertices of other exchanges which consume the held token
+                for consumer_exchange, consumers in self._consumers.get(held, {}).items():
+                    if consumer_exchange != exchange_name:
+                        self.graph.add_edges_from((vertex, consumer) for consumer, matches in consumers.items()
+                                                  if matches[0 if is_buy else 1])
+                # edges from vertices of other exchanges which hold the consumed token
+                for holder_exchange, holders in self._holders.get(consumed, {}).items():
+                    if holder_exchange != exchange_name:
+                        self.graph.add_edges_from((holder, vertex) for holder, holder_is_buy in holders.items()
+                                                  if (after_buy if holder_is_buy else after_sell))
+                self._consumers.setdefault(consumed, {}).setdefault(exchange_name, {})[vertex] = \
+                    (after_buy, after_sell)
+                self._holders.setdefault(held, {}).setdefault(exchange_name, {})[vertex] = is_buy
+                if vertex not in self._vertex_ids:
+                    self._vertex_ids[vertex] = len(self._vertex_quotes)
+                    self._vertex_quotes.append((exchange_name, pair, is_buy))
+                new_vertices.append(vertex)
+        if new_vertices:
+            self._compiled = None
+        self._find_cycles(new_vertices)
+
+    def remove_pairs(self, pairs: list[tuple[str, str]]):
+        """
+        Remove vertices of the pairs with their edges and cycles through them
+        @param pairs: list of tuples (exchange name, pair name)
+        """
+        for exchange_name, pair in pairs:
+            exchange_pairs = self.pairs.get(exchange_name, set())
+            if pair not in exchange_pairs:
+                continue
+            exchange_pairs.discard(pair)
+            if not exchange_pairs:
+                del self.pairs[exchange_name]
+            self._compiled = None
+            for vertex, is_buy, held, consumed, after_buy, after_sell in pair_vertices(exchange_name, pair):
+                self.graph.remove_node(vertex)
+                del self._consumers[consumed][exchange_name][vertex]
+                del self._holders[held][exchange_name][vertex]
+                for cycle in self._vertex_cycles.pop(vertex, ()):
+                    del self._cycles[cycle]
+                    for cycle_vertex in cycle:
+                        if cycle_vertex != vertex:
+                            self._vertex_cycles[cycle_vertex].discard(cycle)
+
+    def _find_cycles(self, vertices: list[str]):
+        """
+        Add cycles through the vertices to the catalogue.
+        Every cycle is found once: through the first of the vertices it contains,
+        the vertices before it in the list are not entered
+        """
+        if not self.catalogue:
+            return
+        excluded = set()
+        for vertex in vertices:
+            for path in self._cycles_through(vertex, excluded):
+                start = path.index(min(path))
+                cycle = tuple(path[start:] + path[:start])
+                self._cycles[cycle] = None
+                for cycle_vertex in cycle:
+                    self._vertex_cycles.setdefault(cycle_vertex, set()).add(cycle)
+            excluded.add(vertex)
+
+    def _cycles_through(self, vertex: str, excluded: set):
+        """
+        Depth first search of simple cycles with 2 to max_path_length vertices
+        starting and ending at the vertex
+        @return: generator of cycles as lists of vertices starting at the vertex
+        """
+        successors = self.graph.succ
+        path = [vertex]
+        on_path = {vertex}
+        stack = [iter(successors[vertex])]
+        while stack:
+            next_vertex = next(stack[-1], None)
+            if next_vertex is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            if next_vertex == vertex:
+                if len(path) > 1:
+                    yield list(path)
+                continue
+            if next_vertex in on_path or next_vertex in excluded or len(path) == self._max_path_length:
+                continue
+            path.append(next_vertex)
+            on_path.add(next_vertex)
+            stack.append(iter(successors[next_vertex]))
+
+    def _compile(self) -> dict:
+        """
+        @return: cached dictionary with
+        cycles - list of cycles,
+        vertex_ids - matrix of cycle vertex ids, short cycles are padded with the id of a zero log-rate,
+        exchanges - {exchange name: (vertex ids, pair names, is buy flags, pair ids cached for a PriceBook)}
+        """
+        if self._compiled is not None:
+            return self._compiled
+        cycles = list(self._cycles)
+        padding = len(self._vertex_quotes)
+        vertex_ids = np.full((len(cycles), self._max_path_length), padding, dtype=np.intp)
+        for row, cycle in enumerate(cycles):
+            vertex_ids[row, :len(cycle)] = [self._vertex_ids[vertex] for vertex in cycle]
+        exchanges = {}
+        for vertex in self.graph:
+            vertex_id = self._vertex_ids[vertex]
+            exchange_name, pair, is_buy = self._vertex_quotes[vertex_id]
+            ids, pairs, buys, _ = exchanges.setdefault(exchange_name, ([], [], [], {}))
+            ids.append(vertex_id)
+            pairs.append(pair)
+            buys.append(is_buy)
+        self._compiled = {'cycles': cycles,
+                          'vertex_ids': vertex_ids,
+                          'exchanges': {exchange_name: (np.array(ids, dtype=np.intp), pairs,
+                                                        np.array(buys, dtype=bool), book_pair_ids)
+                                        for exchange_name, (ids, pairs, buys, book_pair_ids) in exchanges.items()}}
+        return self._compiled
+
+    def log_rates(self, price_books: dict) -> np.ndarray:
+        """
+        @param price_books: {exchange name: price book}, dictionaries or PriceBook objects
+        @return: log of the rate of every vertex id: -log(buy_price) for buy and log(sell_price) for sell vertices,
+        -inf for vertices without a positive price, the last element is the zero padding
+        """
+        compiled = self._compile()
+        rates = np.full(len(self._vertex_quotes) + 1, -np.inf)
+        rates[-1] = 0
+        for exchange_name, (vertex_ids, pairs, buys, book_pair_ids) in compiled['exchanges'].items():
+            price_book = price_books.get(exchange_name)
+            if not price_book:
+                continue
+            if isinstance(price_book, PriceBook):
+                # pair ids of a PriceBook are stable, so they are looked up once per book
+                if book_pair_ids.get('book') is not price_book:
+                    book_pair_ids['book'] = price_book
+                    book_pair_ids['pair_ids'] = np.array([price_book.pair_id(pair) for pair in pairs], dtype=np.intp)
+                pair_ids = book_pair_ids['pair_ids']
+                prices = np.where(buys, price_book.columns['buy_price'][pair_ids],
+                                  price_book.columns['sell_price'][pair_ids])
+                prices[~price_book.valid[pair_ids]] = 0
+            else:
+                prices = np.array([price_book[pair]['buy_price' if is_buy else 'sell_price']
+                                   if pair in price_book else 0
+                                   for pair, is_buy in zip(pairs, buys)], dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                logs = np.log(prices)
+            rates[vertex_ids] = np.where(prices > 0, np.where(buys, -logs, logs), -np.inf)
+        return rates
+
+    def cycle_profits(self, price_books: dict) -> np.ndarray:
+        """
+        @param price_books: {exchange name: price book}, dictionaries or PriceBook objects
+        @return: profit in percents of every cycle of cycles property at quote prices,
+        -100 for cycles with a missing quote
+        """
+        compiled = self._compile()
+        log_rates = self.log_rates(price_books)
+        return np.expm1(log_rates[compiled['vertex_ids']].sum(axis=1)) * 100
+
+    def exchange_vector(self, values: dict) -> np.ndarray:
+        """
+        @param values: {exchange name: value}
+        @return: value of the exchange of every vertex id, 0 for other exchanges and the padding
+        """
+        vector = np.zeros(len(self._vertex_quotes) + 1)
+        for exchange_name, (vertex_ids, _, _, _) in self._compile()['exchanges'].items():
+            vector[vertex_ids] = values.get(exchange_name, 0)
+        return vector
+
+    def profitable_cycles(self, price_books: dict, spread_threshold: float, top_k: int = None,
+                          evaluator: ShardedCycleEvaluator = None,
+                          costs: np.ndarray = None) -> list[tuple[tuple, float]]:
+        """
+        @param price_books: {exchange name: price book}, dictionaries or PriceBook objects
+        @param spread_threshold: minimum profit in percents
+        @param top_k: amount of the most profitable cycles to return, all above the threshold if None
+        @param evaluator: process pool evaluator for big catalogues, cycles are evaluated in this thread if None
+        @param costs: matrix of 2 rows made of exchange_vector in percents of the traded amount:
+        cost of a step into every vertex and cost of a cycle starting at every vertex, gross profits if None
+        @return: list of tuples (cycle, profit) with profit not less than spread_threshold
+        """
+        compiled = self._compile()
+        log_rates = self.log_rates(price_books)
+        evaluate = top_cycle_profits if evaluator is None else evaluator.top_cycle_profits
+        indexes, profits = evaluate(compiled['vertex_ids'], log_rates, spread_threshold, top_k, costs)
+        cycles = compiled['cycles']
+        return [(cycles[index], float(profit)) for index, profit in zip(indexes, profits)]
+
+    def _compile_edges(self) -> dict:
+        """
+        @return: cached dictionary with edge arrays sorted by target vertex id:
+        sources, targets, segment_starts - first edge of every target,
+        segment_targets - target of every segment, segment_sizes - edges in every segment,
+        segment_sources - matrix of sources of every segment padded with an id past the last vertex,
+        vertex_segments - segment of every vertex id, -1 for vertices without incoming edges,
+        held - token id held after every vertex id, -1 for vertices out of the graph,
+        start_tokens, start_exchanges - token and exchange ids of negative_cycles searches,
+        start_vertices - matrix of vertex ids which start every search, padded with -1
+        """
+        compiled = self._compile()
+        if 'edges' in compiled:
+            return compiled['edges']
+        vertex_ids = self._vertex_ids
+        edges = np.array([(vertex_ids[source], vertex_ids[target]) for source, target in self.graph.edges],
+                         dtype=np.intp).reshape(-1, 2)
+        edges = edges[np.argsort(edges[:, 1], kind='stable')]
+        sources, targets = edges[:, 0], edges[:, 1]
+        segment_starts = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]]) if len(targets) else \
+            np.zeros(0, dtype=np.intp)
+        # every pair has its quote token, so a cycle has a vertex which consumes one of the quote tokens
+        # and searches start only from such vertices, grouped by the consumed token and exchange
+        token_ids = {}
+        exchange_ids = {}
+        held = np.full(len(self._vertex_quotes) + 1, -1, dtype=np.intp)
+        exchange_of = np.full(len(self._vertex_quotes) + 1, -1, dtype=np.intp)
+        starts = {}
+        quote_tokens = {split_pair(pair)[1] for pairs in self.pairs.values() for pair in pairs}
+        for vertex in self.graph:
+            vertex_id = vertex_ids[vertex]
+            exchange_name, pair, is_buy = self._vertex_quotes[vertex_id]
+            base, quote = split_pair(pair)
+            consumed, held_token = (quote, base) if is_buy else (base, quote)
+            held[vertex_id] = token_ids.setdefault(held_token, len(token_ids))
+            exchange_of[vertex_id] = exchange_ids.setdefault(exchange_name, len(exchange_ids))
+            if consumed in quote_tokens:
+                start = (token_ids.setdefault(consumed, len(token_ids)), exchange_of[vertex_id])
+                starts.setdefault(start, []).append(vertex_id)
+        start_vertices = np.full((len(starts), max(map(len, starts.values()), default=0)), -1, dtype=np.intp)
+        for row, start_ids in enumerate(starts.values()):
+            start_vertices[row, :len(start_ids)] = start_ids
+        segment_sizes = np.diff(np.r_[segment_starts, len(targets)])
+        # sources of every segment padded with the id past the last vertex, which is never reached
+        segment_sources = np.full((len(segment_starts), segment_sizes.max(initial=0)), len(held), dtype=np.intp)
+        segment_sources[np.repeat(np.arange(len(segment_starts)), segment_sizes),
+                        np.arange(len(sources)) - np.repeat(segment_starts, segment_sizes)] = sources
+        vertex_segments = np.full(len(held), -1, dtype=np.intp)
+        vertex_segments[targets[segment_starts]] = np.arange(len(segment_starts))
+        compiled['edges'] = {'sources': sources, 'targets': targets, 'segment_starts': segment_starts,
+                             'segment_targets': targets[segment_starts], 'segment_sizes': segment_sizes,
+                             'segment_sources': segment_sources, 'vertex_segments': vertex_segments,
+                             'held': held, 'exchanges': exchange_of,
+                             'start_tokens': np.array([token for token, _ in starts], dtype=np.intp),
+                             'start_exchanges': np.array([exchange for _, exchange in starts], dtype=np.intp),
+                             'start_vertices': start_vertices}
+        return compiled['edges']
+
+    def negative_cycles(self, price_books: dict, spread_threshold: float = 0,
+                        costs: np.ndarray = None, walks_per_vertex: int = 4) -> list[tuple[tuple, float]]:
+        """
+        Hop indexed Bellman-Ford search of cycles with negative sum of -log(rate) weights.
+        An edge into a vertex weighs -log of the vertex rate, so quoter fees are included.
+        Every search starts from the vertices of one exchange which consume one quote token,
+        keeps walks_per_vertex best walks into every vertex for every amount of hops
+        up to max_path_length and closes a walk at vertices which hold the start token,
+        so cycles are found by construction without a length filter.
+        All searches relax all edges at once with NumPy, the work is linear in edges times
+        max_path_length times searches, where searches are quote tokens of pairs per exchange.
+        It's a heuristic, not a list of all cycles: the best cycle through every start is found,
+        but a profitable cycle is missed when more than walks_per_vertex better walks
+        of the same search reach one of its vertices with the same amount of hops.
+        More walks per vertex miss fewer cycles and cost proportionally more
+        @param price_books: {exchange name: price book}, dictionaries or PriceBook objects
+        @param spread_threshold: minimum profit in percents
+        @param costs: matrix of 2 rows like in profitable_cycles, found cycles are filtered by net profit
+        @param walks_per_vertex: amount of the best walks kept for every search, vertex and amount of hops
+        @return: list of tuples (cycle, profit) with 2 to max_path_length vertices
+        and profit not less than spread_threshold
+        @raise ValueError: If walks_per_vertex is less than 1
+        """
+        if walks_per_vertex < 1:
+            raise ValueError(f'walks_per_vertex must be at least 1, got {walks_per_vertex}')
+        edges = self._compile_edges()
+        log_rates = self.log_rates(price_books)
+        if not len(edges['sources']) or not len(edges['start_vertices']):
+            return []
+        weights = -log_rates
+        # closed walks with smaller weight can't reach the threshold
+        max_weight = -np.log1p(spread_threshold / 100) if spread_threshold > -100 else np.inf
+        found = {}
+        searches = len(edges['start_vertices'])
+        # searches are relaxed in blocks, so a block of candidates stays in a few megabytes
+        block = max(1, self.RELAXATION_BLOCK_SIZE // (edges['segment_sources'].size * walks_per_vertex))
+        for first in range(0, searches, block):
+            self._relax_searches(edges, slice(first, min(first + block, searches)), weights, walks_per_vertex,
+                                 max_weight, log_rates, spread_threshold, found, costs)
+        return sorted(found.items(), key=lambda item: item[1], reverse=True)
+
+    def _relax_searches(self, edges: dict, searches: slice, weights: np.ndarray, walks_per_vertex: int,
+                        max_weight: float, log_rates: np.ndarray, spread_threshold: float, found: dict,
+                        costs: np.ndarray = None):
+        """
+        Hop indexed relaxation of a block of searches, found cycles are added to found {cycle: profit}
+        """
+        segment_sources, segment_targets = edges['segment_sources'], edges['segment_targets']
+        vertex_segments = edges['vertex_segments']
+        start_vertices = edges['start_vertices'][searches]
+        rows = len(start_vertices)
+        vertices = len(weights)
+        ranks = walks_per_vertex
+        # walks of one hop are their start vertices, distances[search, vertex, rank] are sorted by rank,
+        # the column past the last vertex is padding of segment_sources and is never reached
+        distances = np.full((rows, vertices + 1, ranks), np.inf)
+        valid = start_vertices >= 0
+        distances[np.nonzero(valid)[0], start_vertices[valid], 0] = weights[start_vertices[valid]]
+        # predecessors[hops - 2][search, vertex, rank] is position of the previous walk among
+        # (source in the segment of the vertex, rank) of the best walks with the hops
+        predecessors = []
+        # the walk can be closed at vertices of other exchanges which hold the start token
+        closing = ((edges['held'][None, :vertices] == edges['start_tokens'][searches, None])
+                   & (edges['exchanges'][None, :vertices] != edges['start_exchanges'][searches, None]))
+        for hops in range(2, self._max_path_length + 1):
+            # walks into all sources of every segment, the weight of its target is the same for all of them
+            candidates = distances[:, segment_sources, :].reshape(rows, len(segment_targets), -1)
+            if candidates.shape[2] > ranks:
+                best_candidates = np.argpartition(candidates, ranks - 1, axis=2)[:, :, :ranks]
+            else:
+                best_candidates = np.broadcast_to(np.arange(ranks), candidates.shape)
+            best = np.take_along_axis(candidates, best_candidates, axis=2)
+            order = np.argsort(best, axis=2)
+            distances = np.full((rows, vertices + 1, ranks), np.inf)
+            distances[:, segment_targets, :] = (np.take_along_axis(best, order, axis=2)
+                                                + weights[segment_targets, None])
+            hop_predecessors = np.zeros((rows, vertices, ranks), dtype=np.intp)
+            hop_predecessors[:, segment_targets, :] = np.take_along_axis(best_candidates, order, axis=2)
+            predecessors.append(hop_predecessors)
+            for row, vertex, rank in zip(*np.nonzero(closing[:, :, None] & (distances[:, :vertices] <= max_weight))):
+                walk = [vertex]
+                for hop_predecessors in predecessors[::-1]:
+                    candidate = hop_predecessors[row, walk[-1], rank]
+                    walk.append(segment_sources[vertex_segments[walk[-1]], candidate // ranks])
+                    rank = candidate % ranks
+                self._add_walk(walk[::-1], log_rates, spread_threshold, found, costs)
+
+    def _add_walk(self, walk: list, log_rates: np.ndarray, spread_threshold: float,
+                  found: dict, costs: np.ndarray = None):
+        """
+        Split a closed walk of vertex ids into simple cycles and add cycles with profit
+        not less than spread_threshold to found {cycle: profit}
+        """
+        cycles = []
+        path = []
+        positions = {}
+        for vertex_id in walk:
+            if vertex_id in positions:
+                # the walk came back to a vertex, vertices since then make a cycle
+                position = positions[vertex_id]
+                cycles.append(path[position:])
+                for removed in path[position:]:
+                    del positions[removed]
+                path = path[:position]
+            positions[vertex_id] = len(path)
+            path.append(vertex_id)
+        cycles.append(path)
+        vertex_names = self._vertex_names()
+        for cycle_ids in cycles:
+            if len(cycle_ids) < 2:
+                continue
+            cycle_ids = np.array(cycle_ids, dtype=np.intp)
+            profit = float(np.expm1(log_rates[cycle_ids].sum()) * 100)
+            if profit < spread_threshold:
+                continue
+            cycle = [vertex_names[vertex_id] for vertex_id in cycle_ids]
+            # the closing edge of a walk through a pair with equal tokens may be missing
+            if not self.graph.has_edge(cycle[-1], cycle[0]):
+                continue
+            start = cycle.index(min(cycle))
+            if costs is not None:
+                # like in the catalogue, the cycle cost is taken at its smallest vertex
+                profit -= float(costs[0][cycle_ids].sum() + costs[1][cycle_ids[start]])
+                if profit < spread_threshold:
+                    continue
+            found[tuple(cycle[start:] + cycle[:start])] = profit
+
+    def _vertex_names(self) -> dict:
+        """
+        @return: cached dictionary {vertex id: vertex}
+        """
+        compiled = self._compile()
+        if 'vertex_names' not in compiled:
+            compiled['vertex_names'] = {vertex_id: vertex for vertex, vertex_id in self._vertex_ids.items()}
+        return compiled['vertex_names']
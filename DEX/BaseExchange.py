@@ -1,12 +1,18 @@
 import json
-from web3 import Web3, AsyncWeb3
 from web3.contract.contract import ContractFunction
 from DEX.utils import get_contract
 from DEX.Token import Token
 from DEX.constants import AVAILABLE_SUBNETS
+from DEX.AddressResolver import AddressResolver
+from DEX.TokenRegistry import TokenRegistry
+from DEX.ProviderRegistry import ProviderRegistry
+from DEX.CalldataTemplate import CalldataTemplate
+from DEX.PriceBook import PriceBook
+from DEX.multicall_codec import try_block_and_aggregate, try_block_and_aggregate_async, result_words
 import os
 from urllib.parse import urlparse
 import time
+from numbers import Real
 
 
 class BaseExchange:
@@ -17,14 +23,24 @@ class BaseExchange:
 
     # The same for all child classes
     _quote_asset_prices = None
+    # Approximate gas used by one quote call inside multicall,
+    # child classes override it, it is used to split batches
+    quote_call_gas = 100_000
+    # Approximate gas of one swap of an arbitrage transaction, child classes override it
+    swap_gas = 150_000
 
-    def __init__(self, network, subnet, web3_provider=None, pairs=None):
+    def __init__(self, network, subnet, web3_provider=None, pairs=None,
+                 web3_client=None, web3_client_async=None):
         """
         @param network: Network name like "Ethereum", "Polygon", etc.
         All available networks in available_networks property
         @param subnet: MAINNET or TESTNET
-        @param web3_provider: HTTP or HTTPS url for connecting to RPC node
+        @param web3_provider: HTTP or HTTPS url for connecting to RPC node,
+        or a list of urls of the same network to route requests between
         @param pairs: List of pairs in format "Token0-Token1"
+        @param web3_client: existing Web3 client, by default the client
+        shared by all exchanges with the same web3_provider is taken from ProviderRegistry
+        @param web3_client_async: existing AsyncWeb3 client, taken from ProviderRegistry by default
         """
         self._pair_list = None
         self._weth_addr = None
@@ -32,7 +48,17 @@ class BaseExchange:
         self._factory = None
         self._router = None
         self._price_book = None
+        # keep price_book in a columnar PriceBook updated in place instead of a new dictionary every refresh
+        self.columnar_price_book = False
+        self._quote_ladder = [1]
+        # {(encode function name, args, template_key): CalldataTemplate}
+        self._calldata_templates = {}
+        # {calls property name: (cache key, calls)}
+        self._calls_cache = {}
+        self.block_number = None
+        self.block_hash = None
         self._available_networks = None
+        self._web3_provider = None
         self.multicall_abi = 'General/multicall'
         self.factory_abi = ''
         self.router_abi = ''
@@ -40,9 +66,14 @@ class BaseExchange:
         self.name = self.__class__.__name__
         self.network = network
         self.subnet = subnet
-        self.web3_provider = web3_provider
-        self.web3_client = Web3(Web3.HTTPProvider(self.web3_provider))
-        self.web3_client_async = AsyncWeb3(Web3.AsyncHTTPProvider(self.web3_provider))
+        if web3_provider is not None or web3_client is None or web3_client_async is None:
+            self.web3_provider = web3_provider
+        if web3_client is None:
+            web3_client = ProviderRegistry.default().web3(self.web3_provider)
+        if web3_client_async is None:
+            web3_client_async = ProviderRegistry.default().async_web3(self.web3_provider)
+        self.web3_client = web3_client
+        self.web3_client_async = web3_client_async
         if pairs is not None:
             self.pair_list = pairs
 
@@ -85,14 +116,29 @@ class BaseExchange:
 
     @property
     def web3_provider(self):
-        # HTTP/HTTPS url blockhain rpc provider
+        # HTTP/HTTPS url blockhain rpc provider, None if only clients were passed
         return self._web3_provider
 
     @web3_provider.setter
-    def web3_provider(self, provider: str):
+    def web3_provider(self, provider: str | list[str]):
         """
         Set the web3_provider property
+        @param provider: an HTTP/HTTPS url blockhain rpc provider,
+        or a list of urls, then requests are routed between them by RPCRouter
+        @raise ValueError: If provider is not correct http/https url string or a list of them
+        """
+        if isinstance(provider, (list, tuple)):
+            if not provider:
+                raise ValueError("List of web3 providers is empty")
+            self._web3_provider = [self._check_provider_url(url) for url in provider]
+        else:
+            self._web3_provider = self._check_provider_url(provider)
+
+    @staticmethod
+    def _check_provider_url(provider: str) -> str:
+        """
         @param provider: an HTTP/HTTPS url blockhain rpc provider
+        @return: validated url
         @raise ValueError: If provider is not correct http/https url string
         """
         # Just an HTTP/HTTPS RPC node url
@@ -104,25 +150,43 @@ class BaseExchange:
             raise ValueError("Not valid web3 provider url was given")
         if parsed_web3_url.scheme not in ['http', 'https']:
             raise ValueError(f"Web3 provider url must be http or https but {parsed_web3_url.scheme} was given")
-        self._web3_provider = provider
+        return provider
 
     @property
-    def price_book(self) -> dict:
+    def price_book(self) -> dict | PriceBook:
         """
-        Property which contains quotes from DEX for pairs in {pair_list} property
+        Property which contains quotes from DEX for pairs in {pair_list} property,
+        a PriceBook if columnar_price_book is True
         """
         return self._price_book
 
     @price_book.setter
-    def price_book(self, price_book: dict):
+    def price_book(self, price_book: dict | PriceBook):
         """
-        Set the price_book property
-        @param price_book: A dictionary which contains prices
-        @raise ValueError: If passed price_book is not a dictionary
+        Set the price_book property.
+        If columnar_price_book is True, quotes from a dictionary are written
+        to the existing PriceBook in place
+        @param price_book: A dictionary which contains prices or a PriceBook
+        @raise ValueError: If passed price_book is not a dictionary or a PriceBook
         """
+        if isinstance(price_book, PriceBook):
+            self._price_book = price_book
+            return
         if not isinstance(price_book, dict):
             raise ValueError('Price book must be a dictionary!')
-        self._price_book = price_book
+        if self.columnar_price_book:
+            self.columnar_book.load(price_book)
+        else:
+            self._price_book = price_book
+
+    @property
+    def columnar_book(self) -> PriceBook:
+        """
+        @return: PriceBook of the exchange, it's created once and then reused
+        """
+        if not isinstance(self._price_book, PriceBook):
+            self._price_book = PriceBook(max(16, len(self.pair_list or ())))
+        return self._price_book
 
     @property
     def quote_asset_prices(self):
@@ -140,6 +204,152 @@ class BaseExchange:
             raise ValueError('quote_asset_prices must be a dictionary!')
         BaseExchange._quote_asset_prices = prices
 
+    @property
+    def quote_ladder(self) -> list:
+        """
+        Multipliers of the quote asset amount from quote_asset_prices property
+        every pair is quoted for. [1] by default - only one size is quoted.
+        With several sizes every quote in price_book also has a "depth" curve
+        """
+        return self._quote_ladder
+
+    @quote_ladder.setter
+    def quote_ladder(self, multipliers: list):
+        """
+        @param multipliers: list of positive numbers like [0.1, 0.3, 1, 3, 10],
+        1 is added if it is missing, because main quote is made for it
+        @raise ValueError: If multipliers is not a list of positive numbers
+        """
+        if not isinstance(multipliers, list):
+            raise ValueError(f'quote_ladder must be a list, got {type(multipliers)} instead')
+        for multiplier in multipliers:
+            if not isinstance(multiplier, Real) or multiplier <= 0:
+                raise ValueError(f'quote_ladder must contain only positive numbers, got {multiplier}')
+        self._quote_ladder = sorted(set(multipliers) | {1})
+
+    def ladder_amounts(self, pair: str) -> list:
+        """
+        @param pair: pair name from pair_list property
+        @return: quote asset amounts for every multiplier from quote_ladder property
+        """
+        quote_currency_amount = self.quote_asset_prices[self.pair_list[pair]['quote_asset'].symbol]
+        return [quote_currency_amount * multiplier for multiplier in self.quote_ladder]
+
+    def _ladder_quote(self, amounts: list, buy_amounts: list, sell_amounts: list):
+        """
+        Make a price_book quote from amounts quoted for every size of quote_ladder
+        @param amounts: quote asset amounts
+        @param buy_amounts: base asset amounts we get for quote asset amounts, None if failed
+        @param sell_amounts: base asset amounts we pay for quote asset amounts, None if failed
+        @return: quote dictionary or None if the main size was not quoted
+        """
+        return self._row_to_quote(self._ladder_row(amounts, buy_amounts, sell_amounts))
+
+    @staticmethod
+    def _row_to_quote(row):
+        """
+        @param row: tuple from _ladder_row or None
+        @return: quote dictionary or None
+        """
+        if row is None:
+            return None
+        buy_price, buy_amount, sell_price, sell_amount, depth = row
+        quote = {'buy_price': buy_price, 'buy_amount': buy_amount,
+                 'sell_price': sell_price, 'sell_amount': sell_amount}
+        if depth is not None:
+            quote['depth'] = depth
+        return quote
+
+    def _ladder_row(self, amounts: list, buy_amounts: list, sell_amounts: list):
+        """
+        The same as _ladder_quote, but values are returned as a tuple
+        @return: (buy_price, buy_amount, sell_price, sell_amount, depth or None),
+        None if the main size was not quoted
+        """
+        main_index = self.quote_ladder.index(1)
+        quote_currency_amount = amounts[main_index]
+        buy_amount = buy_amounts[main_index]
+        sell_amount = sell_amounts[main_index]
+        if not buy_amount or not sell_amount:
+            return None
+        depth = None
+        if len(amounts) > 1:
+            depth = {'amounts': amounts, 'buy_amounts': buy_amounts, 'sell_amounts': sell_amounts}
+        return quote_currency_amount / buy_amount, buy_amount, quote_currency_amount / sell_amount, sell_amount, depth
+
+    def _decode_ladder_results(self, multicall_raw_data, buy_word_index: int, sell_word_index: int) -> dict:
+        """
+        Decode results of buy and sell calls made for every size of quote_ladder
+        by reading one uint256 word of every result with a fixed offset
+        @param multicall_raw_data: results of the calls, buy and sell call results go one by one
+        @param buy_word_index: index of the word with base asset amount in buy call result
+        @param sell_word_index: index of the word with base asset amount in sell call result
+        @return: quotes dictionary
+        """
+        calls_per_pair = 2 * len(self.quote_ladder)
+        raw_amounts = result_words(multicall_raw_data,
+                                   [buy_word_index, sell_word_index] * (len(multicall_raw_data) // 2))
+        # columnar price book is filled in place
+        book = self.columnar_book if self.columnar_price_book else None
+        if book is not None:
+            book.clear()
+        quotes = {}
+        for pair_index, (pair, tokens) in enumerate(self.pair_list.items()):
+            start = pair_index * calls_per_pair
+            if start >= len(raw_amounts):
+                break
+            scale = 10 ** tokens['base_asset'].decimals
+            buy_amounts = [amount / scale if amount is not None else None
+                           for amount in raw_amounts[start:start + calls_per_pair:2]]
+            sell_amounts = [amount / scale if amount is not None else None
+                            for amount in raw_amounts[start + 1:start + calls_per_pair:2]]
+            row = self._ladder_row(self.ladder_amounts(pair), buy_amounts, sell_amounts)
+            if row is None:
+                continue
+            if book is not None:
+                book.set_quote(pair, *row)
+            else:
+                quotes[pair] = self._row_to_quote(row)
+        return quotes if book is None else book
+
+    @property
+    def _template_key(self) -> tuple:
+        """
+        Exchange settings which are encoded to quote calls besides pair tokens,
+        child classes add them, so templates and cached calls are rebuilt when they change
+        """
+        return ()
+
+    def _calldata_template(self, encode_function, *args) -> CalldataTemplate:
+        """
+        @param encode_function: method which takes args and a raw amount as the last argument
+        and returns encoded function call
+        @param args: arguments of encode_function except the amount
+        @return: template compiled once for the encode_function and args
+        """
+        key = (encode_function.__name__, args, self._template_key)
+        template = self._calldata_templates.get(key)
+        if template is None:
+            template = CalldataTemplate(lambda amount: encode_function(*args, amount))
+            self._calldata_templates[key] = template
+        return template
+
+    def _cached_calls(self, name: str, build_calls) -> list[tuple]:
+        """
+        Reuse the whole calls list while quote_asset_prices, quote_ladder, pairs
+        and _template_key are the same
+        @param name: name of calls property
+        @param build_calls: function without arguments which builds calls
+        @return: list of tuples (calling_address, encoded data)
+        """
+        key = (tuple(self.quote_asset_prices.items()), tuple(self.quote_ladder),
+               tuple(self.pair_list), self._template_key)
+        cached = self._calls_cache.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, build_calls())
+            self._calls_cache[name] = cached
+        return cached[1]
+
     @property
     def available_networks(self):
         """
@@ -177,6 +387,20 @@ class BaseExchange:
                                         net=self.network, subnet=self.subnet)
         return self._router
 
+    @property
+    def address_resolver(self) -> AddressResolver:
+        """
+        @return: pair and pool address resolver shared by exchanges of the same network
+        """
+        return AddressResolver.get(self.network, self.subnet)
+
+    @property
+    def token_registry(self) -> TokenRegistry:
+        """
+        @return: tokens of the network shared by all exchanges, loaded once per process
+        """
+        return TokenRegistry.get(self.network, self.subnet)
+
     @property
     def factory(self):
         """
@@ -197,9 +421,10 @@ class BaseExchange:
     def pair_list(self, pairs: list[str]):
         """
         For a given pair finds tokens in DEX/resources/tokens/{current-network}.json
+        with TokenRegistry shared by all exchanges of the network, the first token with a symbol wins.
         This token information was webscraped from different Exchange.
         You can add tokens to this json files if you need. or with add_pair method
-        Creates Token objects for each token in pair and add them to a ditctionary
+        Adds Token objects for each token in pair to a ditctionary
         @param pairs: list of trading pairs in format "token0_name-token1_name", with "-" delimiter between tokens
         @raise ValueError:
             1. If passed pairs parameter is not a list
@@ -209,9 +434,6 @@ class BaseExchange:
         self._pair_list = {}
         if not isinstance(pairs, list):
             raise ValueError(f'pair_list must be a list of trading pairs got {type(pairs)} instead')
-        with open(f'{os.path.dirname(os.path.abspath(__file__))}/'
-                  f'resources/tokens/{self.network}-{self.subnet.lower()}.json', 'r') as file:
-            tokens = json.load(file)
         for pair in pairs:
             if not isinstance(pair, str):
                 raise ValueError(f'Each pair must be a string, got {pair} instead')
@@ -220,18 +442,131 @@ class BaseExchange:
 
             symbol1 = pair.split('-')[0].upper()
             symbol2 = pair.split('-')[1].upper()
-            search_result_symbol1 = list(filter(lambda token: token['symbol'].upper() == symbol1, tokens))
-            search_result_symbol2 = list(filter(lambda token: token['symbol'].upper() == symbol2, tokens))
-            if len(search_result_symbol1) < 1:
+            token0 = self.token_registry.by_symbol(symbol1)
+            token1 = self.token_registry.by_symbol(symbol2)
+            if token0 is None:
                 raise ValueError(f"Couldn't find symbol {symbol1}, \n"
                                  f"Try to add manually using add_pair method")
-            if len(search_result_symbol2) < 1:
+            if token1 is None:
                 raise ValueError(f"Couldn't find symbol {symbol2}, \n"
                                  f"Try to add manually using add_pair method")
-            token0 = Token(**search_result_symbol1[0])
-            token1 = Token(**search_result_symbol2[0])
             self._pair_list[pair] = {'base_asset': token0, 'quote_asset': token1}
 
+    @property
+    def price_calls(self) -> list[tuple]:
+        """
+        Calls for multicall contract which are needed to get quotes for every pair
+        Child classes must implement it
+        @return: list of tuples (calling_address, encoded data)
+        """
+        raise NotImplementedError
+
+    def decode_price_calls(self, multicall_raw_data) -> dict:
+        """
+        Decode results of price_calls made via multicall contract
+        Child classes must implement it
+        @param multicall_raw_data: results of the calls from price_calls property
+        @return: quotes dictionary
+        """
+        raise NotImplementedError
+
+    def stamp_price_book(self, block_number, block_hash):
+        """
+        Mark price_book property and every quote in it
+        with the block the quotes were taken from
+        @param block_number: number of the block
+        @param block_hash: hash of the block, bytes or hex string
+        """
+        if not isinstance(block_hash, str):
+            block_hash = self.web3_client.to_hex(block_hash)
+        self.block_number = block_number
+        self.block_hash = block_hash
+        if isinstance(self.price_book, PriceBook):
+            self.price_book.stamp(block_number, block_hash)
+            return
+        for quote in self.price_book.values():
+            quote['block_number'] = block_number
+            quote['block_hash'] = block_hash
+
+    def apply_price_calls(self, multicall_raw_data, block_number, block_hash):
+        """
+        Decode results of price_calls made at the given block,
+        put quotes to the price_book property and stamp them with the block
+        @param multicall_raw_data: results of the calls from price_calls property
+        @param block_number: number of the block the calls were made at
+        @param block_hash: hash of the block the calls were made at
+        """
+        # decoders which need extra requests make them at the same block
+        self.block_number = block_number
+        self.price_book = self.decode_price_calls(multicall_raw_data)
+        self.stamp_price_book(block_number, block_hash)
+
+    async def decode_price_calls_async(self, multicall_raw_data) -> dict:
+        """
+        Asynchronous version of decode_price_calls,
+        child classes which make extra requests while decoding override it
+        @param multicall_raw_data: results of the calls from price_calls property
+        @return: quotes dictionary
+        """
+        return self.decode_price_calls(multicall_raw_data)
+
+    async def apply_price_calls_async(self, multicall_raw_data, block_number, block_hash):
+        """
+        Asynchronous version of apply_price_calls
+        @param multicall_raw_data: results of the calls from price_calls property
+        @param block_number: number of the block the calls were made at
+        @param block_hash: hash of the block the calls were made at
+        """
+        self.block_number = block_number
+        self.price_book = await self.decode_price_calls_async(multicall_raw_data)
+        self.stamp_price_book(block_number, block_hash)
+
+    def update_price_book(self, block_identifier='latest'):
+        """
+        Calls multicall contract to get quotes
+        then decode multicall and put quotes dictionary
+        to the price_book property, every quote is stamped with block number and hash
+        @param block_identifier: block number to get quotes at, "latest" by default
+        """
+        block_number, block_hash, multicall_raw_data = try_block_and_aggregate(
+            self.web3_client, self.multicall.address, self.price_calls, block_identifier)
+        self.apply_price_calls(multicall_raw_data, block_number, block_hash)
+
+    async def update_price_book_async(self, block_identifier='latest'):
+        """
+        Asynchronous version of update_price_book method,
+        so quotes for several exchanges can be requested concurrently
+        @param block_identifier: block number to get quotes at, "latest" by default
+        """
+        block_number, block_hash, multicall_raw_data = await try_block_and_aggregate_async(
+            self.web3_client_async, self.multicall.address, self.price_calls, block_identifier)
+        await self.apply_price_calls_async(multicall_raw_data, block_number, block_hash)
+
+    def quote_amounts(self, pair: str, amounts: list) -> tuple[list, list]:
+        """
+        Calculate buy and sell amounts for several quote asset amounts
+        from locally stored pool state. Child classes which can quote
+        without requests to blockchain implement it
+        @param pair: pair name from pair_list property
+        @param amounts: list of quote asset amounts
+        @return: lists of base asset amounts (buy_amounts, sell_amounts)
+        """
+        raise NotImplementedError
+
+    def local_price_book(self, pairs) -> dict:
+        """
+        Calculate quotes with quote_amounts method for every size of quote_ladder
+        @param pairs: pair names to quote
+        @return: quotes dictionary
+        """
+        quotes = {}
+        for pair in pairs:
+            amounts = self.ladder_amounts(pair)
+            quote = self._ladder_quote(amounts, *self.quote_amounts(pair, amounts))
+            if quote is not None:
+                quotes[pair] = quote
+        return quotes
+
     def encode_router_approval(self, token: Token, amount):
         """
         Encode ERC20 approve function for Router or SwapRouter contract
@@ -247,7 +582,8 @@ class BaseExchange:
 
     def add_pair(self, token0: Token, token1: Token):
         """
-        Add pair to pair_list property
+        Add pair to pair_list property and register tokens in token_registry,
+        so other exchanges of the network find them by symbol or address
         @param token0: Token obj of token0
         @param token1: Token obj of token1
         @raise ValueError: If token0 or token1 is not Token objects
@@ -256,13 +592,12 @@ class BaseExchange:
         if not isinstance(token0, Token) or not isinstance(token1, Token):
             raise ValueError("token 0 and token1 must be the Token class instances!")
 
+        self.token_registry.register(token0)
+        self.token_registry.register(token1)
         if self._pair_list is None:
-
-            self.pair_list = {f"{token0.symbol.upper()}-{token1.symbol.upper()}":
-                                  {'base_asset': token0, 'quote_asset': token1}}
-        else:
-            self._pair_list[f"{token0.symbol.upper()}-{token1.symbol.upper()}"] = \
-                {'base_asset': token0, 'quote_asset': token1}
+            self._pair_list = {}
+        self._pair_list[f"{token0.symbol.upper()}-{token1.symbol.upper()}"] = \
+            {'base_asset': token0, 'quote_asset': token1}
 
     def build_and_send_tx(self, function: ContractFunction, tx_params, private_key):
         """
@@ -0,0 +1,45 @@
+class CalldataTemplate:
+    """
+    Encoded function call where only one uint256 argument changes.
+    The template is compiled once from two encodings with different amounts:
+    the only differing 32 bytes word is the amount slot, everything else
+    (selector, addresses, fee, offsets) is kept as a static prefix and suffix,
+    so encoding a new amount is just a string concatenation
+    """
+
+    # amounts used for finding the amount slot
+    _PROBE_AMOUNTS = (1, 2)
+
+    def __init__(self, encode_function):
+        """
+        @param encode_function: function which takes a raw integer amount
+        and returns encoded function call as a hex string with 0x prefix
+        @raise ValueError: If encodings differ not in exactly one 32 bytes word
+        or the word doesn't contain the amount
+        """
+        first, second = (encode_function(amount) for amount in self._PROBE_AMOUNTS)
+        if len(first) != len(second):
+            raise ValueError('Encoded calls have different lengths, amount is not a static argument')
+        differing = [index for index in range(len(first)) if first[index] != second[index]]
+        if not differing:
+            raise ValueError('Encoded calls are equal, amount is not an argument of the function')
+        # 0x and 4 bytes selector go before 64 hex chars words
+        slot_start = 10 + (differing[0] - 10) // 64 * 64
+        slot_end = slot_start + 64
+        if differing[-1] >= slot_end:
+            raise ValueError('Encoded calls differ in more than one word')
+        for amount, encoded in zip(self._PROBE_AMOUNTS, (first, second)):
+            if encoded[slot_start:slot_end] != format(amount, '064x'):
+                raise ValueError('Differing word is not a uint256 amount')
+        self.prefix = first[:slot_start]
+        self.suffix = first[slot_end:]
+
+    def encode(self, amount: int) -> str:
+        """
+        @param amount: raw integer amount
+        @return: encoded function call as a hex string with 0x prefix
+        @raise ValueError: If amount doesn't fit to uint256
+        """
+        if not 0 <= amount < 2 ** 256:
+            raise ValueError(f'Amount must fit to uint256, got {amount}')
+        return f'{self.prefix}{amount:064x}{self.suffix}'
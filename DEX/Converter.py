@@ -1,26 +1,44 @@
 import requests
 from numbers import Real
-from DEX.constants import BINANCE_API_URL, BINANCE_SYMBOLS, DEX_QUOTE_ASSETS
+from DEX.constants import BINANCE_API_URL, BINANCE_SYMBOLS, DEX_QUOTE_ASSETS, QUOTE_ASSET_ALIASES
+from DEX.cross_rates import pair_mid_prices, token_rates
+from DEX.CrossRateMatrix import CrossRateMatrix
 
 
 class Converter:
     """
     Converts quote asset amount to other assets amount
-    based on quotes from Binance API
+    based on quotes from Binance API or from price books of exchanges
     """
 
-    def __init__(self, quote_asset: str, quote_amount: Real):
+    SOURCES = ('binance', 'price_books')
+
+    def __init__(self, quote_asset: str, quote_amount: Real, source: str = 'binance',
+                 cross_rates: CrossRateMatrix = None):
         """
         @param quote_asset: asset in relation to which
         determine the amount of other assets
         @param quote_amount: amount of quote_asset
-        """
+        @param source: "binance" fetches prices from Binance API, "price_books" derives them
+        from price books passed to convert, Binance is used only while there are no price books
+        @param cross_rates: matrix of rates between DEX_QUOTE_ASSETS, can be shared by several Converters,
+        a new one by default
+        @raise ValueError: If source is unknown
+        """
+        if source not in self.SOURCES:
+            raise ValueError(f'source must be one of {self.SOURCES}, got {source}')
+        self.source = source
+        self.coin_list = DEX_QUOTE_ASSETS
         self._symbols = None
         self.symbols = BINANCE_SYMBOLS
         self.quote_asset = quote_asset
         self.quote_amount = quote_amount
-        self.coin_list = DEX_QUOTE_ASSETS
+        self.cross_rates = CrossRateMatrix(self.coin_list) if cross_rates is None else cross_rates
         self.matic_price = None
+        # requests.Session to reuse connections, a new connection for every request if None
+        self.session = None
+        # seconds to wait for Binance API, forever if None
+        self.timeout = None
 
     @property
     def symbols(self):
@@ -34,6 +52,7 @@ class Converter:
         """
         @param symbols: binance symbols, pairs like ETHUSDC, USDCUSDT
         @raise ValueError: if passed symbols are not list
+        or a symbol doesn't start with one of coin_list assets
         """
         if not isinstance(symbols, list):
             raise ValueError(f'Symbols must be a list, got {symbols} instead')
@@ -41,6 +60,13 @@ class Converter:
         for symbol in symbols:
             pairs.append(f'"{symbol}"')
         self._symbols = ','.join(pairs)
+        # Binance symbol: (base, quote), parsed once instead of for every response
+        self._binance_pairs = {}
+        for symbol in symbols:
+            pair = self._convert_binance_symbol_format(symbol)
+            if pair is None:
+                raise ValueError(f'Symbol {symbol} must start with one of {self.coin_list}')
+            self._binance_pairs[symbol] = tuple(pair.split('-'))
 
     @property
     def quote_amount(self):
@@ -86,35 +112,27 @@ class Converter:
 
         self._quote_asset = asset
 
-    def get_prices(self):
+    def get_prices(self) -> CrossRateMatrix:
         """
         Fetch quotes from binance api for 1 token
-        and put it to a dictionary
-        @return: prices dictionary
+        and put them to cross_rates matrix, missing rates are triangulated
+        @return: cross_rates matrix
         """
         params = {"symbols": f'[{self.symbols}]'}
-        raw_response = requests.get(BINANCE_API_URL, params=params).json()
+        raw_response = (self.session or requests).get(BINANCE_API_URL, params=params, timeout=self.timeout)
+        raw_response.raise_for_status()
+        asset_ids = self.cross_rates.asset_ids
         prices = {}
-        for symbol in raw_response:
-            prices[self._convert_binance_symbol_format(
-                symbol['symbol'])] = float(symbol['price'])
-
-        # calculate approximate price USDC-DAI from USDT-DAI and USDC-USDT
-        self.matic_price = prices['MATIC-USDC']
-        prices['USDC-DAI'] = prices['USDT-DAI'] / prices['USDC-USDT']
-        prices['MATIC-DAI'] = prices['MATIC-ETH'] * prices['ETH-DAI']
-        prices['USDC.E-USDT'] = prices['USDC-USDT']
-        prices['USDC-USDC.E'] = 1
-        prices['ETH-USDC.E'] = prices['ETH-USDC']
-        prices['MATIC-USDC.E'] = prices['MATIC-USDC']
-        prices['USDC.E-DAI'] = prices['USDC-DAI']
-        revert_prices = {}
-        # calculating revert pairs
-        for price_key in prices:
-            price_key_parts = price_key.split('-')
-            revert_prices[f'{price_key_parts[1]}-{price_key_parts[0]}'] = 1 / prices[price_key]
-        prices.update(revert_prices)
-        return prices
+        for symbol in raw_response.json():
+            base, quote = self._binance_pairs[symbol['symbol']]
+            if base in asset_ids and quote in asset_ids:
+                prices[(base, quote)] = float(symbol['price'])
+        # Bridged USDC.E is not traded on Binance, it is pegged to USDC
+        if 'USDC.E' in self.cross_rates.asset_ids:
+            prices[('USDC.E', 'USDC')] = 1
+        self.cross_rates.update(prices)
+        self._update_matic_price()
+        return self.cross_rates
 
     def _convert_binance_symbol_format(self, symbol: str):
         """
@@ -129,27 +147,51 @@ class Converter:
                 new_format_symbol = f"{symbol[:(len(coin))]}-{symbol[len(coin):]}"
                 return new_format_symbol
 
-    def convert(self):
+    def _update_matic_price(self):
+        asset_ids = self.cross_rates.asset_ids
+        if 'MATIC' in asset_ids and 'USDC' in asset_ids:
+            matic_price = self.cross_rates.rate('MATIC', 'USDC')
+            if matic_price == matic_price:
+                self.matic_price = matic_price
+
+    def convert(self, price_books=None, refresh: bool = True):
         """
-        Method that fetch prices from binance Api
+        Method that fetch prices from binance Api or takes them from price books
         and calculate of quote asset amount in relative to other assets
+        @param price_books: iterable of price books of the last scan, used if source is "price_books"
+        @param refresh: if False amounts are looked up in cross_rates without fetching prices,
+        for example when another Converter refreshes the shared matrix
         @return: dictionary with converted tokens amount
         """
-        converted_amount = {}
-        prices = self.get_prices()
+        if refresh:
+            price_books = [price_book for price_book in price_books or [] if price_book]
+            if self.source == 'price_books' and price_books:
+                self.update_price_books(price_books)
+            else:
+                self.get_prices()
+        else:
+            self._update_matic_price()
+        # because No ETH token in Ethereum, arbitrum, polygon networks etc., only Wrapped ETH
+        # and no MATIC token in Polygon, only Wrapped MATIC, amounts are keyed by wrapped tokens
+        return self.cross_rates.quote_asset_prices(self.quote_asset, self.quote_amount)
+
+    def update_price_books(self, price_books):
+        """
+        Put rates of assets to the quote asset from mid prices of price books to cross_rates matrix,
+        every asset is priced through the most liquid chain of pairs to the quote asset.
+        Assets which aren't connected to the quote asset keep previous rates
+        @param price_books: iterable of price books {pair: quote}, dictionaries or PriceBook objects
+        """
+        quote_symbol = QUOTE_ASSET_ALIASES.get(self.quote_asset, self.quote_asset).upper()
+        rates = token_rates(pair_mid_prices(price_books), quote_symbol)
+        prices = {}
         for coin in self.coin_list:
-            if coin == self.quote_asset:
-                converted_amount[coin] = self.quote_amount
-                continue
-            converted_price = prices[f'{self.quote_asset}-{coin}'] * self.quote_amount
-
-            # because No ETH token in Ethereum, arbitrum, polygon networks etc., only Wrapped ETH
-            coin = 'WETH' if coin == 'ETH' else coin
-            # because No MATIC token in Polygon, only Wrapped MATIC
-            coin = 'WMATIC' if coin == 'MATIC' else coin
-            converted_amount[coin] = converted_price
-
-        return converted_amount
+            symbol = QUOTE_ASSET_ALIASES.get(coin, coin).upper()
+            if coin != self.quote_asset and rates.get(symbol, 0) > 0:
+                # rates are amounts of assets worth 1 quote asset
+                prices[(coin, self.quote_asset)] = 1 / rates[symbol]
+        self.cross_rates.update(prices)
+        self._update_matic_price()
 
 
 if __name__ == "__main__":
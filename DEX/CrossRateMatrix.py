@@ -0,0 +1,105 @@
+from threading import RLock
+import numpy as np
+from DEX.constants import DEX_QUOTE_ASSETS, QUOTE_ASSET_ALIASES
+
+
+class CrossRateMatrix:
+    """
+    N x N matrix of exchange rates between quote assets indexed by asset id,
+    rates[i, j] is the amount of asset j worth 1 asset i.
+    Only source rates are set from outside, missing entries are triangulated
+    through other assets and the matrix is recalculated only when a source rate changes.
+    One matrix can serve quote asset prices for any quote asset and amount,
+    so Converters with different quote assets can share it.
+    Updates are serialized, readers always see a complete matrix
+    """
+
+    def __init__(self, assets: list[str] = None):
+        """
+        @param assets: asset symbols, DEX_QUOTE_ASSETS by default
+        @raise ValueError: If assets contain duplicates
+        """
+        assets = list(DEX_QUOTE_ASSETS if assets is None else assets)
+        if len(set(assets)) != len(assets):
+            raise ValueError(f'assets must be unique, got {assets}')
+        self.assets = assets
+        self.asset_ids = {asset: asset_id for asset_id, asset in enumerate(assets)}
+        # source rates, nan where a rate is unknown
+        self._source_rates = np.full((len(assets), len(assets)), np.nan)
+        np.fill_diagonal(self._source_rates, 1)
+        self.rates = self._source_rates.copy()
+        self._lock = RLock()
+        # amounts are keyed by on-chain symbols of assets
+        self.symbols = [QUOTE_ASSET_ALIASES.get(asset, asset) for asset in assets]
+
+    def set_rate(self, base: str, quote: str, price: float) -> bool:
+        """
+        Set a source rate without triangulation, call triangulate after all rates are set
+        @param base: asset symbol
+        @param quote: asset symbol
+        @param price: price of 1 base asset in quote asset
+        @return: True if the rate was changed
+        @raise ValueError: If an asset is unknown or price is not positive
+        """
+        if base not in self.asset_ids or quote not in self.asset_ids:
+            raise ValueError(f'Unknown asset in {base}-{quote}, assets are {self.assets}')
+        if not price > 0:
+            raise ValueError(f'Price must be positive, got {price} for {base}-{quote}')
+        base_id, quote_id = self.asset_ids[base], self.asset_ids[quote]
+        with self._lock:
+            if self._source_rates[base_id, quote_id] == price:
+                return False
+            self._source_rates[base_id, quote_id] = price
+            self._source_rates[quote_id, base_id] = 1 / price
+        return True
+
+    def update(self, prices: dict) -> bool:
+        """
+        Set source rates and triangulate if any of them changed
+        @param prices: dictionary {(base, quote): price of 1 base asset in quote asset}
+        @return: True if the matrix was changed
+        """
+        changed = False
+        with self._lock:
+            for (base, quote), price in prices.items():
+                changed |= self.set_rate(base, quote, price)
+            if changed:
+                self.triangulate()
+        return changed
+
+    def triangulate(self):
+        """
+        Recalculate rates: source rates are kept, missing ones are filled
+        with the product of rates through an intermediate asset, as in Floyd-Warshall.
+        The new matrix replaces rates at once, so concurrent readers never see it half filled
+        """
+        with self._lock:
+            rates = self._source_rates.copy()
+            for via in range(len(self.assets)):
+                through = rates[:, via, None] * rates[None, via, :]
+                missing = np.isnan(rates) & ~np.isnan(through)
+                rates[missing] = through[missing]
+            self.rates = rates
+
+    def rate(self, base: str, quote: str) -> float:
+        """
+        @return: price of 1 base asset in quote asset, nan if it's unknown
+        """
+        return self.rates[self.asset_ids[base], self.asset_ids[quote]].item()
+
+    def amounts(self, quote_asset: str, quote_amount: float) -> np.ndarray:
+        """
+        @param quote_asset: asset symbol
+        @param quote_amount: amount of quote_asset
+        @return: amount of every asset worth quote_amount, in the order of assets, nan where it's unknown
+        """
+        return self.rates[self.asset_ids[quote_asset]] * quote_amount
+
+    def quote_asset_prices(self, quote_asset: str, quote_amount: float) -> dict:
+        """
+        @param quote_asset: asset symbol
+        @param quote_amount: amount of quote_asset
+        @return: dictionary {on-chain symbol like WETH: amount worth quote_amount} of known assets
+        """
+        amounts = self.amounts(quote_asset, quote_amount).tolist()
+        return {symbol: amount for symbol, amount in zip(self.symbols, amounts) if amount == amount}
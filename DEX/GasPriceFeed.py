@@ -0,0 +1,73 @@
+import time
+from threading import Thread, Event, Lock
+
+
+class GasPriceFeed:
+    """
+    Gas price of one network refreshed in a background thread,
+    so scans read the last known price without an RPC request
+    """
+
+    def __init__(self, web3_client, interval: float = 5):
+        """
+        @param web3_client: Web3 client of the network
+        @param interval: seconds between two refreshes
+        @raise ValueError: If interval is not positive
+        """
+        if interval <= 0:
+            raise ValueError(f'interval must be positive, got {interval}')
+        self.web3_client = web3_client
+        self.interval = interval
+        self._gas_price = None
+        self.updated_at = None
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread = None
+
+    def refresh(self) -> int:
+        """
+        Request the gas price now
+        @return: gas price in wei
+        """
+        gas_price = self.web3_client.eth.gas_price
+        with self._lock:
+            self._gas_price = gas_price
+            self.updated_at = time.monotonic()
+        return gas_price
+
+    @property
+    def gas_price(self) -> int:
+        """
+        @return: the last known gas price in wei, None until the first refresh is done
+        """
+        return self._gas_price
+
+    @property
+    def age(self) -> float:
+        """
+        @return: seconds since the last refresh, None if the price was never refreshed
+        """
+        return None if self.updated_at is None else time.monotonic() - self.updated_at
+
+    def start(self):
+        """
+        Start refreshing in a background thread, does nothing if it's already running
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name='gas-price-feed', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f'Gas price refresh failed: {e}')
+            self._stopped.wait(self.interval)
@@ -0,0 +1,193 @@
+import asyncio
+from DEX.BaseExchange import BaseExchange
+from DEX.multicall_codec import try_block_and_aggregate, try_block_and_aggregate_async
+
+
+class MulticallBatcher:
+    """
+    Collects quote calls from all registered exchanges of one network
+    and sends them to the multicall contract with as few
+    tryBlockAndAggregate requests as possible.
+    Every exchange gets back only its own slice of results to decode
+    """
+
+    def __init__(self, *exchanges, max_calldata_size=120_000, max_gas=40_000_000):
+        """
+        @param exchanges: Exchange objects from the same network and subnet
+        @param max_calldata_size: maximum size of one tryBlockAndAggregate calldata in bytes
+        @param max_gas: maximum estimated gas for one tryBlockAndAggregate request,
+        estimation is based on quote_call_gas of every exchange
+        """
+        self.exchanges = []
+        self.max_calldata_size = max_calldata_size
+        self.max_gas = max_gas
+        for exchange in exchanges:
+            self.register(exchange)
+
+    def register(self, exchange: BaseExchange):
+        """
+        Add exchange to the batcher
+        @param exchange: Exchange object
+        @raise ValueError:
+            1. If passed exchange is not a BaseExchange instance
+            2. If exchange network or subnet differs from already registered exchanges
+        """
+        if not isinstance(exchange, BaseExchange):
+            raise ValueError(f'Exchange must be a BaseExchange instance, got {type(exchange)} instead')
+        if self.exchanges:
+            first = self.exchanges[0]
+            if (exchange.network.upper(), exchange.subnet) != (first.network.upper(), first.subnet):
+                raise ValueError(f"All exchanges must be in {first.network} {first.subnet}, "
+                                 f"got {exchange.network} {exchange.subnet} for {exchange.name}")
+        self.exchanges.append(exchange)
+
+    @property
+    def multicall(self):
+        """
+        @return: multicall contract instance shared by all registered exchanges
+        """
+        return self.exchanges[0].multicall
+
+    @staticmethod
+    def _call_size(call: tuple) -> int:
+        """
+        Approximate size of one (address, bytes) tuple in ABI encoded calldata
+        @param call: tuple (calling_address, encoded data)
+        @return: size in bytes
+        """
+        data = call[1]
+        data_size = (len(data) - 2) // 2 if isinstance(data, str) else len(data)
+        # tuple offset, address, bytes offset, bytes length and padded bytes
+        return 32 * 4 + (data_size + 31) // 32 * 32
+
+    def _collect_calls(self):
+        """
+        Collect price_calls of all registered exchanges
+        @return: list of all calls, and list of (exchange, start, end)
+        where start and end are bounds of exchange calls in the list
+        """
+        calls = []
+        slices = []
+        for exchange in self.exchanges:
+            exchange_calls = exchange.price_calls
+            slices.append((exchange, len(calls), len(calls) + len(exchange_calls)))
+            calls.extend(exchange_calls)
+        return calls, slices
+
+    def _split(self, calls, slices) -> list[tuple]:
+        """
+        Split calls to batches which fit to max_calldata_size and max_gas
+        @param calls: list of all calls
+        @param slices: list of (exchange, start, end)
+        @return: list of (start, end) bounds of every batch
+        """
+        batches = []
+        batch_start = 0
+        batch_size = 0
+        batch_gas = 0
+        for exchange, start, end in slices:
+            for index in range(start, end):
+                call_size = self._call_size(calls[index])
+                if index > batch_start and (batch_size + call_size > self.max_calldata_size
+                                            or batch_gas + exchange.quote_call_gas > self.max_gas):
+                    batches.append((batch_start, index))
+                    batch_start = index
+                    batch_size = 0
+                    batch_gas = 0
+                batch_size += call_size
+                batch_gas += exchange.quote_call_gas
+        if batch_start < len(calls):
+            batches.append((batch_start, len(calls)))
+        return batches
+
+    @staticmethod
+    def _slice_results(results: list[tuple], start: int, end: int):
+        """
+        Results of calls from start to end, without copying if they are in one batch
+        @param results: list of (batch start, batch results) sorted by batch start
+        @param start: index of the first call
+        @param end: index after the last call
+        @return: results of the calls, None if some of them are missing
+        """
+        parts = []
+        position = start
+        for batch_start, batch_results in results:
+            batch_end = batch_start + len(batch_results)
+            if batch_start <= position < batch_end:
+                parts.append(batch_results[position - batch_start:min(end, batch_end) - batch_start])
+                position = min(end, batch_end)
+            if position >= end:
+                break
+        if position < end:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        return [result for part in parts for result in part]
+
+    def update_price_books(self, block_identifier='latest'):
+        """
+        Get quotes for all registered exchanges
+        and update price_book property of every exchange.
+        All batches are pinned to the same block, so quotes are consistent
+        @param block_identifier: block number to get quotes at, "latest" by default
+        """
+        calls, slices = self._collect_calls()
+        batches = self._split(calls, slices)
+        if not batches:
+            return
+        if block_identifier == 'latest' and len(batches) > 1:
+            block_identifier = self.exchanges[0].web3_client.eth.block_number
+        # list of (start, batch results)
+        results = []
+        block_number = block_hash = None
+        for start, end in batches:
+            block_number, block_hash, batch_results = try_block_and_aggregate(
+                self.exchanges[0].web3_client, self.multicall.address, calls[start:end], block_identifier)
+            results.append((start, batch_results))
+        for exchange, start, end in slices:
+            exchange.apply_price_calls(self._slice_results(results, start, end), block_number, block_hash)
+
+    async def update_price_books_async(self, timeout=5, block_identifier='latest'):
+        """
+        Asynchronous version of update_price_books, all batches are sent concurrently.
+        Exchanges whose calls were in a failed batch or whose follow-up requests failed get an empty price book
+        @param timeout: maximum time in seconds to wait for every batch and for follow-up requests of every exchange
+        @param block_identifier: block number to get quotes at, "latest" by default
+        @return: list of exchange names which dropped out
+        """
+        calls, slices = self._collect_calls()
+        batches = self._split(calls, slices)
+        if not batches:
+            return []
+        if block_identifier == 'latest' and len(batches) > 1:
+            block_identifier = await self.exchanges[0].web3_client_async.eth.block_number
+        web3_client_async = self.exchanges[0].web3_client_async
+        batch_results = await asyncio.gather(
+            *(asyncio.wait_for(try_block_and_aggregate_async(
+                web3_client_async, self.multicall.address, calls[start:end], block_identifier), timeout)
+              for start, end in batches),
+            return_exceptions=True)
+        results = []
+        block_number = block_hash = None
+        for (start, end), batch_result in zip(batches, batch_results):
+            if not isinstance(batch_result, BaseException):
+                block_number, block_hash, batch_results = batch_result
+                results.append((start, batch_results))
+        dropped = []
+        decoded_exchanges = []
+        decodes = []
+        for exchange, start, end in slices:
+            exchange_results = self._slice_results(results, start, end)
+            if exchange_results is None:
+                exchange.price_book = {}
+                dropped.append(exchange.name)
+            else:
+                decoded_exchanges.append(exchange)
+                decodes.append(asyncio.wait_for(
+                    exchange.apply_price_calls_async(exchange_results, block_number, block_hash), timeout))
+        # decoders which make follow-up requests wait for them concurrently
+        for exchange, result in zip(decoded_exchanges, await asyncio.gather(*decodes, return_exceptions=True)):
+            if isinstance(result, BaseException):
+                exchange.price_book = {}
+                dropped.append(exchange.name)
+        return dropped
@@ -0,0 +1,226 @@
+import csv
+import heapq
+import itertools
+import json
+import sys
+import time
+from queue import Queue, Empty, Full
+from threading import Thread, Event
+from prettytable import PrettyTable
+
+
+class TopOpportunities:
+    """
+    Bounded min-heap of the best arbitrage opportunities of a scan.
+    An opportunity is a tuple (path_preview, profit) like calculate_path_income returns,
+    pushing is O(log k) and the weakest opportunity is dropped when the heap is full
+    """
+
+    def __init__(self, size: int = None):
+        """
+        @param size: amount of opportunities to keep, all of them if None
+        @raise ValueError: If size is less than 1
+        """
+        if size is not None and size < 1:
+            raise ValueError(f'size must be at least 1, got {size}')
+        self.size = size
+        self._heap = []
+        # tie breaker, so path previews are never compared
+        self._counter = itertools.count()
+
+    def push(self, opportunity: tuple) -> bool:
+        """
+        @param opportunity: tuple (path_preview, profit)
+        @return: True if the opportunity is kept
+        """
+        if not self.accepts(opportunity[1]):
+            return False
+        entry = (opportunity[1], next(self._counter), opportunity)
+        if self.size is None or len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+        return True
+
+    def accepts(self, profit: float) -> bool:
+        """
+        @param profit: profit of an opportunity in percents
+        @return: True if an opportunity with the profit would be kept
+        """
+        return self.size is None or len(self._heap) < self.size or profit > self._heap[0][0]
+
+    def clear(self):
+        self._heap = []
+
+    def items(self) -> list[tuple]:
+        """
+        @return: kept opportunities from the most profitable one
+        """
+        return [entry[2] for entry in sorted(self._heap, key=lambda entry: (-entry[0], entry[1]))]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class OpportunityRenderer:
+    """
+    Renders opportunities of scans in a background thread, so formatting and printing
+    don't slow down scans. Only the newest snapshot waits for rendering,
+    older ones are dropped if the renderer is behind or throttled
+    """
+
+    FORMATS = ('table', 'jsonl', 'csv')
+
+    def __init__(self, output_format: str = 'table', output=None, min_interval: float = 0):
+        """
+        @param output_format: "table" for PrettyTable, "jsonl" for JSON lines or "csv"
+        @param output: text stream to write to, sys.stdout by default
+        @param min_interval: minimum seconds between two renders
+        @raise ValueError: If output_format is unknown or min_interval is negative
+        """
+        if output_format not in self.FORMATS:
+            raise ValueError(f'output_format must be one of {self.FORMATS}, got {output_format}')
+        if min_interval < 0:
+            raise ValueError(f'min_interval must not be negative, got {min_interval}')
+        self.output_format = output_format
+        self.output = output
+        self.min_interval = min_interval
+        self._queue = Queue(maxsize=1)
+        self._stopped = Event()
+        self._csv_header_written = False
+        self._thread = Thread(target=self._run, name='opportunity-renderer', daemon=True)
+        self._thread.start()
+
+    def submit(self, opportunities: list[tuple]):
+        """
+        Hand a snapshot of opportunities to the rendering thread, never blocks
+        @param opportunities: list of tuples (path_preview, profit)
+        """
+        snapshot = (time.time(), list(opportunities))
+        while True:
+            try:
+                self._queue.put_nowait(snapshot)
+                return
+            except Full:
+                try:
+                    self._queue.get_nowait()
+                except Empty:
+                    pass
+
+    def stop(self, timeout: float = None):
+        """
+        Stop the rendering thread, a waiting snapshot is not rendered
+        """
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    def render(self, opportunities: list[tuple], timestamp: float = None) -> str:
+        """
+        @param opportunities: list of tuples (path_preview, profit)
+        @param timestamp: unix time of the scan, current time by default
+        @return: opportunities formatted in output_format
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.output_format == 'table':
+            arbitrage_table = PrettyTable()
+            arbitrage_table.field_names = ['PATH', 'Profit %']
+            arbitrage_table.max_table_width = 800
+            for path_preview, profit in opportunities:
+                arbitrage_table.add_row([' -> '.join(path_preview.keys()), profit], divider=True)
+            return f'{arbitrage_table}\n'
+        if self.output_format == 'jsonl':
+            return ''.join(json.dumps({'timestamp': timestamp, 'path': list(path_preview.keys()), 'profit': profit})
+                           + '\n' for path_preview, profit in opportunities)
+        lines = []
+        writer = csv.writer(_LineCollector(lines))
+        if not self._csv_header_written:
+            writer.writerow(['timestamp', 'path', 'profit'])
+            self._csv_header_written = True
+        for path_preview, profit in opportunities:
+            writer.writerow([timestamp, ' -> '.join(path_preview.keys()), profit])
+        return ''.join(lines)
+
+    def _run(self):
+        last_render = 0
+        while not self._stopped.is_set():
+            try:
+                timestamp, opportunities = self._queue.get(timeout=0.1)
+            except Empty:
+                continue
+            wait = last_render + self.min_interval - time.monotonic()
+            if wait > 0 and self._stopped.wait(wait):
+                return
+            try:
+                # a newer snapshot may have arrived while waiting
+                timestamp, opportunities = self._queue.get_nowait()
+            except Empty:
+                pass
+            output = self.output or sys.stdout
+            try:
+                output.write(self.render(opportunities, timestamp))
+                output.flush()
+            except Exception as e:
+                print(f'Rendering of opportunities failed: {e}')
+            last_render = time.monotonic()
+
+
+class OpportunityStream:
+    """
+    Opportunities of the current scan: a bounded top-k heap, subscribers called
+    as soon as an opportunity is evaluated and an optional background renderer
+    which gets the top-k list when the scan ends
+    """
+
+    def __init__(self, top_k: int = None, renderer: OpportunityRenderer = None):
+        """
+        @param top_k: amount of the best opportunities kept for a scan, all of them if None
+        @param renderer: renderer for the results of scans, nothing is rendered if None
+        """
+        self.top = TopOpportunities(top_k)
+        self.renderer = renderer
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """
+        @param callback: function called in the scanning thread with (path_preview, profit)
+        of every opportunity above the threshold, it should return fast
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        @raise ValueError: If callback is not subscribed
+        """
+        self._subscribers.remove(callback)
+
+    def start_scan(self):
+        self.top.clear()
+
+    def publish(self, opportunity: tuple):
+        """
+        @param opportunity: tuple (path_preview, profit)
+        """
+        self.top.push(opportunity)
+        for callback in self._subscribers:
+            try:
+                callback(*opportunity)
+            except Exception as e:
+                print(f'Opportunity subscriber {callback} failed: {e}')
+
+    def end_scan(self) -> list[tuple]:
+        """
+        @return: the best opportunities of the scan from the most profitable one
+        """
+        opportunities = self.top.items()
+        if self.renderer is not None:
+            self.renderer.submit(opportunities)
+        return opportunities
+
+
+class _LineCollector:
+    """
+    File-like object for csv.writer which collects written lines
+    """
+
+    def __init__(self, lines: list):
+        self.write = lines.append
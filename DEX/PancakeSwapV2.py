@@ -7,13 +7,22 @@ class PancakeSwapV2(UniswapV2):
     PancakeSwapV2 is a fork of Uniswap V2
     """
 
-    def __init__(self, network, subnet, web3_provider=None, pairs=None):
+    # PancakeSwap V2 pairs take 0.25% fee
+    fee_numerator = 9975
+    fee_denominator = 10000
+    init_code_hash = '0x00fb7f630766e6a796048ea87d01acd3068e8ff67d078148a3fa3f4a84f69bd5'
+
+    def __init__(self, network, subnet, web3_provider=None, pairs=None,
+                 web3_client=None, web3_client_async=None):
         """
         @param network: network name like Ethereum, Arbitrum, etc.
         @param subnet: MAINNET or TESTNET
         @param web3_provider: http/https url for connecting to rpc blockchain node
         @param pairs: List of trading pairs in format "token0_name-token1_name"
+        @param web3_client: existing Web3 client, shared one from ProviderRegistry by default
+        @param web3_client_async: existing AsyncWeb3 client, shared one from ProviderRegistry by default
         """
-        super().__init__(network, subnet, web3_provider, pairs)
+        super().__init__(network, subnet, web3_provider, pairs,
+                         web3_client=web3_client, web3_client_async=web3_client_async)
         self.router_abi = "PancakeSwapV2/Router02"
         self.factory_abi = 'PancakeSwapV2/Factory'
@@ -7,15 +7,23 @@ class PancakeSwapV3(SushiSwapV3):
     PancakeSwapV3 is also a fork of UniswapV3
     """
 
-    def __init__(self, network, subnet, web3_provider=None, fee=None, pairs=None):
+    init_code_hash = '0x6ce8eb472fa82df5469c6ab6d485f17c3ad13c8cd7af59b3d4a8026c5ce0f7e2'
+    # PancakeSwap V3 pools are deployed by a separate PoolDeployer contract
+    pool_deployer = '0x41ff9AA7e16B8B1a8a8dc4f0eFacd93D02d071c9'
+
+    def __init__(self, network, subnet, web3_provider=None, fee=None, pairs=None,
+                 web3_client=None, web3_client_async=None):
         """
         @param network: network name like Ethereum, Arbitrum, etc.
         @param subnet: MAINNET or TESTNET
         @param web3_provider: http/https url for connecting to rpc blockchain node
         @param fee: commission of a pool, one of [100,500,3000,10000]
         @param pairs: List of trading pairs in format "token0_name-token1_name"
+        @param web3_client: existing Web3 client, shared one from ProviderRegistry by default
+        @param web3_client_async: existing AsyncWeb3 client, shared one from ProviderRegistry by default
         """
-        super().__init__(network, subnet, web3_provider, fee, pairs)
+        super().__init__(network, subnet, web3_provider, fee, pairs,
+                         web3_client=web3_client, web3_client_async=web3_client_async)
         self.quoter_ver = "v2"
         self.multicall_abi = "General/multicall"
         self.abi_folder = "PancakeSwapV3"
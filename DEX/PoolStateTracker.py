@@ -0,0 +1,308 @@
+from collections import deque
+from web3 import Web3
+from DEX.UniswapV2 import UniswapV2
+from DEX.UniswapV3 import UniswapV3
+from DEX.v3_math import tick_position
+
+
+class PoolStateTracker:
+    """
+    Keeps reserves of V2 pairs and state of V3 pools up to date
+    by polling Sync, Swap, Mint and Burn event logs instead of
+    re-requesting all pools every scan. Only pools touched by events
+    are marked as dirty and re-quoted.
+    Keeps a short history of block hashes and an undo journal,
+    so on chain reorganization state is rolled back to the fork point
+    and logs are replayed from there
+    """
+
+    SYNC_TOPIC = bytes(Web3.keccak(text='Sync(uint112,uint112)'))
+    SWAP_V3_TOPIC = bytes(Web3.keccak(text='Swap(address,address,int256,int256,uint160,uint128,int24)'))
+    # PancakeSwap V3 pools emit protocol fees in the Swap event as well
+    SWAP_PANCAKE_V3_TOPIC = bytes(Web3.keccak(
+        text='Swap(address,address,int256,int256,uint160,uint128,int24,uint128,uint128)'))
+    MINT_V3_TOPIC = bytes(Web3.keccak(text='Mint(address,address,int24,int24,uint128,uint256,uint256)'))
+    BURN_V3_TOPIC = bytes(Web3.keccak(text='Burn(address,int24,int24,uint128,uint256,uint256)'))
+
+    def __init__(self, *exchanges, history_size=64, max_block_range=2000):
+        """
+        @param exchanges: UniswapV2 like exchanges with "reserves" quote_source
+        or UniswapV3 like exchanges with "pool_state" quote_source
+        @param history_size: how many last blocks can be rolled back on reorganization
+        @param max_block_range: maximum number of blocks in one eth_getLogs request
+        """
+        self.exchanges = []
+        self.history_size = history_size
+        self.max_block_range = max_block_range
+        self.last_block = None
+        # (block number, block hash) of processed blocks
+        self.block_hashes = deque(maxlen=history_size)
+        # (block number, list of (exchange name, pair, undo function)) for processed blocks
+        self._journal = deque()
+        # {pool address: (exchange, pair)}
+        self._pools = {}
+        # {(exchange name, pair)}
+        self.dirty = set()
+        for exchange in exchanges:
+            self.register(exchange)
+
+    @property
+    def web3_client(self) -> Web3:
+        """
+        @return: web3 client of the first registered exchange
+        """
+        return self.exchanges[0].web3_client
+
+    def register(self, exchange):
+        """
+        Add exchange and its pools to the tracker
+        @param exchange: UniswapV2 or UniswapV3 exchange object
+        @raise ValueError: If exchange doesn't quote from locally stored pool state
+        """
+        if isinstance(exchange, UniswapV2) and exchange.quote_source == 'reserves':
+            pools = exchange.pair_addresses
+        elif isinstance(exchange, UniswapV3) and exchange.quote_source == 'pool_state':
+            pools = exchange.pool_addresses
+        else:
+            raise ValueError(f'{exchange.name} must quote from "reserves" or "pool_state" to be tracked')
+        if exchange not in self.exchanges:
+            self.exchanges.append(exchange)
+        for pair, address in pools.items():
+            self._pools[address.lower()] = (exchange, pair)
+
+    def start(self):
+        """
+        Load full state of all registered exchanges
+        and remember the block from which logs will be polled
+        """
+        head = self.web3_client.eth.get_block('latest')
+        for exchange in self.exchanges:
+            exchange.update_price_book(block_identifier=head['number'])
+        self.last_block = head['number']
+        self.block_hashes.clear()
+        self._journal.clear()
+        self.block_hashes.append((head['number'], bytes(head['hash'])))
+
+    def _find_fork_point(self):
+        """
+        Compare stored block hashes with the chain from the newest to the oldest
+        @return: number of the newest block which is still in the chain,
+        last_block if there was no reorganization,
+        None if reorganization is deeper than stored history
+        """
+        for block_number, block_hash in reversed(self.block_hashes):
+            chain_block = self.web3_client.eth.get_block(block_number)
+            if bytes(chain_block['hash']) == block_hash:
+                return block_number
+        return None
+
+    def _rollback(self, fork_block):
+        """
+        Undo changes of all blocks after fork_block
+        @param fork_block: the newest block which is still in the chain
+        """
+        while self._journal and self._journal[-1][0] > fork_block:
+            _, undo_records = self._journal.pop()
+            for exchange_name, pair, undo in reversed(undo_records):
+                undo()
+                self.dirty.add((exchange_name, pair))
+        while self.block_hashes and self.block_hashes[-1][0] > fork_block:
+            self.block_hashes.pop()
+        self.last_block = fork_block
+
+    def _get_logs(self, from_block, to_block) -> list:
+        """
+        @return: Sync, Swap, Mint and Burn logs of tracked pools in the block range
+        """
+        topics = [[self.SYNC_TOPIC, self.SWAP_V3_TOPIC, self.SWAP_PANCAKE_V3_TOPIC,
+                   self.MINT_V3_TOPIC, self.BURN_V3_TOPIC]]
+        addresses = [Web3.to_checksum_address(address) for address in self._pools]
+        logs = []
+        for start in range(from_block, to_block + 1, self.max_block_range):
+            end = min(start + self.max_block_range - 1, to_block)
+            logs.extend(self.web3_client.eth.get_logs({'fromBlock': start, 'toBlock': end,
+                                                       'address': addresses, 'topics': topics}))
+        return logs
+
+    def poll(self) -> set:
+        """
+        Apply all new logs since the last processed block,
+        handle reorganizations and re-quote touched pools
+        @return: set of (exchange name, pair) which were changed
+        """
+        if self.last_block is None:
+            self.start()
+            return set()
+        fork_block = self._find_fork_point()
+        if fork_block is None:
+            # reorganization is deeper than history, so load everything again
+            self.start()
+            self.dirty = {(exchange.name, pair) for exchange, pair in self._pools.values()}
+            return self.pop_dirty()
+        if fork_block < self.last_block:
+            self._rollback(fork_block)
+
+        head = self.web3_client.eth.get_block('latest')
+        if head['number'] <= self.last_block:
+            return self.pop_dirty()
+        block_records = {}
+        for log in self._get_logs(self.last_block + 1, head['number']):
+            if log.get('removed'):
+                continue
+            block_number = log['blockNumber']
+            if block_number not in block_records:
+                block_records[block_number] = []
+                self.block_hashes.append((block_number, bytes(log['blockHash'])))
+            self._apply_log(log, block_records[block_number])
+        for block_number in sorted(block_records):
+            self._journal.append((block_number, block_records[block_number]))
+        if not self.block_hashes or self.block_hashes[-1][0] != head['number']:
+            # the head block is already stored if it has logs
+            self.block_hashes.append((head['number'], bytes(head['hash'])))
+        while self._journal and self._journal[0][0] <= head['number'] - self.history_size:
+            self._journal.popleft()
+        self.last_block = head['number']
+        self._complete_v3_pools()
+        return self.pop_dirty()
+
+    def _apply_log(self, log, undo_records: list):
+        """
+        Patch cached state with one log and record how to undo it
+        @param log: log entry from eth_getLogs
+        @param undo_records: list of (exchange name, pair, undo function) for the log block
+        """
+        exchange, pair = self._pools[log['address'].lower()]
+        topic = bytes(log['topics'][0])
+        data = bytes(log['data'])
+        words = [int.from_bytes(data[i:i + 32], 'big') for i in range(0, len(data), 32)]
+        if topic == self.SYNC_TOPIC:
+            self._apply_sync(exchange, pair, words, undo_records)
+        elif topic in (self.SWAP_V3_TOPIC, self.SWAP_PANCAKE_V3_TOPIC):
+            self._apply_swap(exchange, pair, words, undo_records)
+        elif topic in (self.MINT_V3_TOPIC, self.BURN_V3_TOPIC):
+            tick_lower = self._to_signed(int.from_bytes(bytes(log['topics'][2]), 'big'))
+            tick_upper = self._to_signed(int.from_bytes(bytes(log['topics'][3]), 'big'))
+            if topic == self.MINT_V3_TOPIC:
+                # Mint data: sender, amount, amount0, amount1
+                liquidity_delta = words[1]
+            else:
+                # Burn data: amount, amount0, amount1
+                liquidity_delta = -words[0]
+            self._apply_liquidity_change(exchange, pair, tick_lower, tick_upper,
+                                         liquidity_delta, undo_records)
+        self.dirty.add((exchange.name, pair))
+
+    @staticmethod
+    def _to_signed(value: int, bits: int = 256) -> int:
+        """
+        @return: two's complement value as a signed integer
+        """
+        return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+    @staticmethod
+    def _apply_sync(exchange, pair, words, undo_records):
+        """
+        Sync event contains new reserve0 and reserve1 of a V2 pair
+        """
+        old_reserves = exchange.reserves.get(pair)
+        base_asset = exchange.pair_list[pair]['base_asset']
+        quote_asset = exchange.pair_list[pair]['quote_asset']
+        if int(base_asset.address, 16) < int(quote_asset.address, 16):
+            exchange.reserves[pair] = (words[0], words[1])
+        else:
+            exchange.reserves[pair] = (words[1], words[0])
+
+        def undo():
+            if old_reserves is None:
+                exchange.reserves.pop(pair, None)
+            else:
+                exchange.reserves[pair] = old_reserves
+        undo_records.append((exchange.name, pair, undo))
+
+    def _apply_swap(self, exchange, pair, words, undo_records):
+        """
+        Swap event contains sqrt price, liquidity and tick after the swap
+        """
+        pool = exchange.pool_states[pair]
+        old_state = (pool.sqrt_price_x96, pool.liquidity, pool.tick)
+        pool.sqrt_price_x96 = words[2]
+        pool.liquidity = words[3]
+        pool.tick = self._to_signed(words[4])
+
+        def undo():
+            pool.sqrt_price_x96, pool.liquidity, pool.tick = old_state
+        undo_records.append((exchange.name, pair, undo))
+
+    @staticmethod
+    def _apply_liquidity_change(exchange, pair, tick_lower, tick_upper, liquidity_delta, undo_records):
+        """
+        Mint and Burn change liquidity of boundary ticks, may flip them in the tick bitmap
+        and change active liquidity if the current tick is inside the position
+        """
+        pool = exchange.pool_states[pair]
+        if liquidity_delta == 0 or not pool.is_loaded:
+            return
+        old_liquidity = pool.liquidity
+        old_ticks = {}
+        old_words = {}
+        for tick, net_delta in ((tick_lower, liquidity_delta), (tick_upper, -liquidity_delta)):
+            word_position, bit_position = tick_position(tick // pool.tick_spacing)
+            if word_position not in pool.tick_bitmap:
+                # tick is out of the loaded words, it is not used for quoting
+                continue
+            old_ticks[tick] = pool.ticks.get(tick)
+            old_words.setdefault(word_position, pool.tick_bitmap[word_position])
+            liquidity_gross, liquidity_net = pool.ticks.get(tick, (0, 0))
+            new_gross = liquidity_gross + liquidity_delta
+            pool.ticks[tick] = (new_gross, liquidity_net + net_delta)
+            if (liquidity_gross == 0) != (new_gross == 0):
+                pool.tick_bitmap[word_position] ^= 1 << bit_position
+            if new_gross == 0:
+                del pool.ticks[tick]
+        if tick_lower <= pool.tick < tick_upper:
+            pool.liquidity += liquidity_delta
+
+        def undo():
+            pool.liquidity = old_liquidity
+            pool.tick_bitmap.update(old_words)
+            for old_tick, old_value in old_ticks.items():
+                if old_value is None:
+                    pool.ticks.pop(old_tick, None)
+                else:
+                    pool.ticks[old_tick] = old_value
+        undo_records.append((exchange.name, pair, undo))
+
+    def _complete_v3_pools(self):
+        """
+        If price moved out of the loaded tick bitmap words, load missing words and ticks
+        """
+        for exchange in self.exchanges:
+            if not isinstance(exchange, UniswapV3):
+                continue
+            pairs = [pair for exchange_name, pair in self.dirty
+                     if exchange_name == exchange.name and pair in exchange.pool_states]
+            if pairs:
+                exchange._load_missing_pool_data(pairs, self.last_block)
+
+    def pop_dirty(self) -> set:
+        """
+        Re-quote pools which were changed and put new quotes to price books,
+        all quotes of tracked exchanges are stamped with the last processed block
+        @return: set of (exchange name, pair) which were changed
+        """
+        dirty = self.dirty
+        self.dirty = set()
+        for exchange in self.exchanges:
+            pairs = [pair for exchange_name, pair in dirty if exchange_name == exchange.name]
+            if not pairs:
+                continue
+            price_book = dict(exchange.price_book or {})
+            for pair in pairs:
+                price_book.pop(pair, None)
+            price_book.update(exchange.local_price_book(pairs))
+            exchange.price_book = price_book
+        last_block_hash = self.block_hashes[-1][1] if self.block_hashes else None
+        for exchange in self.exchanges:
+            if exchange.price_book is not None and last_block_hash is not None:
+                exchange.stamp_price_book(self.last_block, last_block_hash)
+        return dirty
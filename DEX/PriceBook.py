@@ -0,0 +1,155 @@
+import time
+from collections.abc import Mapping
+import numpy as np
+
+
+class QuoteView(Mapping):
+    """
+    Read-only view of one row of a PriceBook,
+    works like a quote dictionary {'buy_price', 'buy_amount', 'sell_price', 'sell_amount', ...}
+    """
+
+    __slots__ = ('_book', '_pair_id')
+
+    def __init__(self, book, pair_id: int):
+        self._book = book
+        self._pair_id = pair_id
+
+    def _keys(self) -> tuple:
+        if self._pair_id in self._book.depth:
+            return PriceBook.QUOTE_KEYS + ('depth',)
+        return PriceBook.QUOTE_KEYS
+
+    def __getitem__(self, key):
+        book = self._book
+        if key in PriceBook.FIELDS:
+            return book.columns[key][self._pair_id].item()
+        if key == 'block_hash':
+            return book.block_hash
+        if key == 'depth' and self._pair_id in book.depth:
+            return book.depth[self._pair_id]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class PriceBook(Mapping):
+    """
+    Columnar price book: quote fields of all pairs are kept in NumPy arrays
+    indexed by a stable integer pair id and overwritten in place on every refresh.
+    Works as a read-only mapping {pair: quote}, so price_book[pair]['buy_price'] keeps working,
+    vectorized code reads whole columns from columns property without copying
+    """
+
+    FIELDS = ('buy_price', 'buy_amount', 'sell_price', 'sell_amount', 'block_number', 'timestamp')
+    QUOTE_KEYS = FIELDS + ('block_hash',)
+
+    def __init__(self, capacity: int = 16):
+        """
+        @param capacity: amount of rows allocated at the start, arrays grow twice when they are full
+        """
+        # {pair name: pair id}, ids are never reused
+        self.pair_ids = {}
+        self.pairs = []
+        self.columns = {}
+        for field in self.FIELDS:
+            self.columns[field] = np.zeros(capacity, dtype=np.int64 if field == 'block_number' else np.float64)
+        # rows which contain a quote of the last refresh
+        self.valid = np.zeros(capacity, dtype=bool)
+        # {pair id: depth curve} for exchanges with several quote_ladder sizes
+        self.depth = {}
+        self.block_hash = None
+
+    def pair_id(self, pair: str) -> int:
+        """
+        @param pair: pair name
+        @return: id of the pair, a new one is assigned to an unknown pair
+        """
+        pair_id = self.pair_ids.get(pair)
+        if pair_id is None:
+            pair_id = len(self.pairs)
+            if pair_id == len(self.valid):
+                self._grow()
+            self.pair_ids[pair] = pair_id
+            self.pairs.append(pair)
+        return pair_id
+
+    def _grow(self):
+        capacity = 2 * len(self.valid)
+        for field, column in self.columns.items():
+            self.columns[field] = np.resize(column, capacity)
+        self.valid = np.resize(self.valid, capacity)
+        self.valid[len(self.pairs):] = False
+
+    def clear(self):
+        """
+        Mark all rows as empty before a refresh
+        """
+        self.valid[:] = False
+        self.depth.clear()
+
+    def set_quote(self, pair: str, buy_price: float, buy_amount: float,
+                  sell_price: float, sell_amount: float, depth: dict = None):
+        """
+        Write a quote of the pair to its row
+        """
+        pair_id = self.pair_id(pair)
+        columns = self.columns
+        columns['buy_price'][pair_id] = buy_price
+        columns['buy_amount'][pair_id] = buy_amount
+        columns['sell_price'][pair_id] = sell_price
+        columns['sell_amount'][pair_id] = sell_amount
+        self.valid[pair_id] = True
+        if depth is not None:
+            self.depth[pair_id] = depth
+        else:
+            self.depth.pop(pair_id, None)
+
+    def load(self, quotes: Mapping):
+        """
+        Replace content with quote dictionaries, rows are overwritten in place
+        @param quotes: {pair: quote} with buy_price, buy_amount, sell_price, sell_amount
+        and optional depth keys, QuoteView of this book are accepted too
+        """
+        rows = [(pair, quote['buy_price'], quote['buy_amount'], quote['sell_price'],
+                 quote['sell_amount'], quote.get('depth')) for pair, quote in quotes.items()]
+        self.clear()
+        for row in rows:
+            self.set_quote(*row)
+
+    def stamp(self, block_number: int, block_hash: str, timestamp: float = None):
+        """
+        Mark all quotes with the block they were taken from
+        @param block_number: number of the block
+        @param block_hash: hash of the block as a hex string
+        @param timestamp: unix time of the refresh, current time by default
+        """
+        self.columns['block_number'][self.valid] = block_number
+        self.columns['timestamp'][self.valid] = time.time() if timestamp is None else timestamp
+        self.block_hash = block_hash
+
+    def __getitem__(self, pair: str) -> QuoteView:
+        pair_id = self.pair_ids.get(pair)
+        if pair_id is None or not self.valid[pair_id]:
+            raise KeyError(pair)
+        return QuoteView(self, pair_id)
+
+    def __contains__(self, pair) -> bool:
+        pair_id = self.pair_ids.get(pair)
+        return pair_id is not None and bool(self.valid[pair_id])
+
+    def __iter__(self):
+        return (self.pairs[pair_id] for pair_id in np.flatnonzero(self.valid[:len(self.pairs)]))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.valid))
+
+    def __bool__(self):
+        return bool(self.valid.any())
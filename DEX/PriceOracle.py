@@ -0,0 +1,112 @@
+import time
+from threading import Thread, Event, Lock
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from DEX.Converter import Converter
+
+
+class PriceOracle:
+    """
+    Quote asset prices of a Converter refreshed in a background thread on a TTL.
+    Scans read the last good snapshot without waiting for HTTP,
+    a snapshot older than max_staleness is not served
+    """
+
+    def __init__(self, converter: Converter, ttl: float = 30, max_staleness: float = 300,
+                 timeout: float = 5, retries: int = 3):
+        """
+        @param converter: Converter which fetches prices, it gets a pooled session and the timeout
+        @param ttl: seconds between two refreshes
+        @param max_staleness: maximum age of a snapshot in seconds which is still served
+        @param timeout: seconds to wait for one HTTP request
+        @param retries: amount of retries of failed connections and 429/5xx responses with backoff
+        @raise ValueError: If ttl, max_staleness or timeout is not positive
+        or max_staleness is less than ttl
+        """
+        for name, value in (('ttl', ttl), ('max_staleness', max_staleness), ('timeout', timeout)):
+            if value <= 0:
+                raise ValueError(f'{name} must be positive, got {value}')
+        if max_staleness < ttl:
+            raise ValueError(f'max_staleness must not be less than ttl, got {max_staleness} and {ttl}')
+        self.converter = converter
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',))
+        session.mount('https://', HTTPAdapter(max_retries=retry))
+        session.mount('http://', HTTPAdapter(max_retries=retry))
+        converter.session = session
+        converter.timeout = timeout
+        self._prices = None
+        self.updated_at = None
+        # failed refreshes since the last good one and the last error
+        self.failures = 0
+        self.last_error = None
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread = None
+
+    def refresh(self) -> dict:
+        """
+        Fetch prices now and keep them as the last good snapshot
+        @return: quote asset prices like Converter.convert returns
+        """
+        prices = self.converter.convert()
+        with self._lock:
+            self._prices = prices
+            self.updated_at = time.monotonic()
+            self.failures = 0
+        return prices
+
+    @property
+    def staleness(self) -> float:
+        """
+        @return: age of the last good snapshot in seconds, None if there is no snapshot
+        """
+        return None if self.updated_at is None else time.monotonic() - self.updated_at
+
+    @property
+    def prices(self) -> dict:
+        """
+        @return: the last good snapshot of quote asset prices,
+        None if there is no snapshot or it is older than max_staleness
+        """
+        with self._lock:
+            prices, updated_at = self._prices, self.updated_at
+        if updated_at is None or time.monotonic() - updated_at > self.max_staleness:
+            return None
+        return prices
+
+    def start(self):
+        """
+        Start refreshing in a background thread, does nothing if it's already running
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name='price-oracle', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.converter.session.close()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # a snapshot fetched synchronously by the first scan is still fresh
+            wait = self.ttl - (self.staleness if self.updated_at is not None else self.ttl)
+            if wait > 0 and self._stopped.wait(wait):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                    self.last_error = e
+                print(f'Quote asset prices refresh failed: {e}')
+                # retry failed refreshes sooner than the next TTL, but don't hammer the API
+                self._stopped.wait(min(self.ttl, 5))
@@ -0,0 +1,139 @@
+from threading import Lock
+import requests
+from requests.adapters import HTTPAdapter
+from aiohttp import ClientTimeout
+from web3 import Web3, AsyncWeb3, HTTPProvider, AsyncHTTPProvider
+from DEX.RPCRouter import RPCRouter, RoutedHTTPProvider, RoutedAsyncHTTPProvider
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider which sends every request through one shared requests.Session
+    instead of a session per thread cached by web3
+    """
+
+    def __init__(self, endpoint_uri: str, session: requests.Session, request_timeout: float = 10):
+        """
+        @param endpoint_uri: http/https url of an RPC node
+        @param session: shared session with a connection pool
+        @param request_timeout: timeout of one request in seconds
+        """
+        super().__init__(endpoint_uri)
+        self.session = session
+        self.request_timeout = request_timeout
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        request_kwargs = self.get_request_kwargs()
+        request_kwargs.setdefault('timeout', self.request_timeout)
+        response = self.session.post(self.endpoint_uri, data=request_data, **request_kwargs)
+        response.raise_for_status()
+        return self.decode_rpc_response(response.content)
+
+
+class ProviderRegistry:
+    """
+    Hands out one pooled HTTP session and one Web3/AsyncWeb3 client per RPC url,
+    so all exchanges connected to the same node reuse keep-alive connections,
+    DNS lookups and TLS sessions. Async clients use aiohttp sessions which web3 caches per url
+    """
+
+    _default = None
+    _default_lock = Lock()
+
+    def __init__(self, pool_size=20, request_timeout=10, hedge=2):
+        """
+        @param pool_size: maximum amount of open connections per url of sync clients
+        @param request_timeout: timeout of one request in seconds
+        @param hedge: amount of endpoints hedged requests of routed clients are sent to
+        @raise ValueError: If pool_size is not a positive integer
+        """
+        if not isinstance(pool_size, int) or pool_size <= 0:
+            raise ValueError(f'pool_size must be a positive integer, got {pool_size}')
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+        self.hedge = hedge
+        self._lock = Lock()
+        self._sessions = {}
+        self._clients = {}
+        self._async_clients = {}
+        self._routers = {}
+
+    @classmethod
+    def default(cls):
+        """
+        @return: registry shared by the whole process
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def session(self, url: str) -> requests.Session:
+        """
+        @param url: http/https url of an RPC node
+        @return: requests session with a connection pool of pool_size connections
+        """
+        with self._lock:
+            if url not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[url] = session
+            return self._sessions[url]
+
+    def router(self, urls: list[str]) -> RPCRouter:
+        """
+        @param urls: http/https urls of RPC nodes of the same network
+        @return: RPCRouter shared by all users of the same urls
+        """
+        key = tuple(urls)
+        with self._lock:
+            if key not in self._routers:
+                self._routers[key] = RPCRouter(urls, self, self.hedge, request_timeout=self.request_timeout)
+            return self._routers[key]
+
+    def web3(self, url: str | list[str]) -> Web3:
+        """
+        @param url: http/https url of an RPC node or a list of urls to route requests between
+        @return: Web3 client shared by all users of the url
+        """
+        if isinstance(url, (list, tuple)):
+            router = self.router(url)
+            with self._lock:
+                if tuple(url) not in self._clients:
+                    self._clients[tuple(url)] = Web3(RoutedHTTPProvider(router))
+                return self._clients[tuple(url)]
+        session = self.session(url)
+        with self._lock:
+            if url not in self._clients:
+                self._clients[url] = Web3(PooledHTTPProvider(url, session, self.request_timeout))
+            return self._clients[url]
+
+    def async_web3(self, url: str | list[str]) -> AsyncWeb3:
+        """
+        @param url: http/https url of an RPC node or a list of urls to route requests between
+        @return: AsyncWeb3 client shared by all users of the url
+        """
+        if isinstance(url, (list, tuple)):
+            router = self.router(url)
+            with self._lock:
+                if tuple(url) not in self._async_clients:
+                    self._async_clients[tuple(url)] = AsyncWeb3(RoutedAsyncHTTPProvider(router))
+                return self._async_clients[tuple(url)]
+        with self._lock:
+            if url not in self._async_clients:
+                self._async_clients[url] = AsyncWeb3(AsyncHTTPProvider(
+                    url, request_kwargs={'timeout': ClientTimeout(total=self.request_timeout)}))
+            return self._async_clients[url]
+
+    def close(self):
+        """
+        Close all sync sessions
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._clients.clear()
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+from aiohttp import ClientTimeout
+from web3._utils.request import async_get_response_from_post_request
+from web3.providers.base import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+
+class RPCEndpointError(ConnectionError):
+    """
+    Raised when an endpoint doesn't give a usable answer:
+    connection error, timeout, bad HTTP status or rate limit
+    """
+
+
+class RPCEndpoint:
+    """
+    One RPC url with rolling latency and error rate
+    """
+
+    def __init__(self, url: str, smoothing: float = 0.2, error_penalty: float = 10):
+        """
+        @param url: http/https url of an RPC node
+        @param smoothing: weight of the newest sample in exponential moving averages
+        @param error_penalty: seconds added to the score of an endpoint which always fails
+        """
+        self.url = url
+        self.smoothing = smoothing
+        self.error_penalty = error_penalty
+        self.latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._lock = Lock()
+
+    def record(self, latency: float = None, error: bool = False):
+        """
+        Add a sample to the rolling scores
+        @param latency: seconds the request took, None if it's unknown
+        @param error: True if the endpoint failed
+        """
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+            self.error_rate += self.smoothing * (error - self.error_rate)
+            if latency is not None:
+                self.latency = latency if self.latency is None \
+                    else self.latency + self.smoothing * (latency - self.latency)
+
+    @property
+    def score(self) -> float:
+        """
+        @return: expected latency penalized by errors, lower is better,
+        0 for an endpoint without samples, so it's tried first.
+        The penalty is added, not multiplied, so an endpoint that fails fast doesn't look good
+        """
+        if self.latency is None:
+            return 0.0
+        return self.latency + self.error_penalty * self.error_rate
+
+    def __repr__(self):
+        return f'RPCEndpoint({self.url}, latency={self.latency}, error_rate={self.error_rate:.3f})'
+
+
+class RPCRouter:
+    """
+    Routes JSON-RPC requests between several endpoints of the same network.
+    Latency critical methods are hedged: sent to `hedge` best scored endpoints at once
+    and the first good answer is taken. Other methods go to one endpoint
+    chosen randomly with weights by score, with failover to the next best endpoints
+    """
+
+    HEDGED_METHODS = ('eth_call', 'eth_sendRawTransaction')
+    # JSON-RPC error codes which mean the endpoint is limited, not that the request is wrong
+    RATE_LIMIT_CODES = (-32005, 429)
+
+    def __init__(self, urls: list[str], registry, hedge: int = 2, hedged_methods=HEDGED_METHODS,
+                 smoothing: float = 0.2, request_timeout: float = 10):
+        """
+        @param urls: http/https urls of RPC nodes
+        @param registry: ProviderRegistry with pooled sync sessions for the urls
+        @param hedge: amount of endpoints a hedged request is sent to
+        @param hedged_methods: JSON-RPC methods to hedge
+        @param smoothing: weight of the newest sample in endpoint scores
+        @param request_timeout: timeout of one request in seconds
+        @raise ValueError: If urls is empty or hedge is less than 1
+        """
+        if not urls:
+            raise ValueError('At least one RPC url must be provided')
+        if hedge < 1:
+            raise ValueError(f'hedge must be at least 1, got {hedge}')
+        self.endpoints = [RPCEndpoint(url, smoothing, request_timeout) for url in urls]
+        self.registry = registry
+        self.hedge = min(hedge, len(urls))
+        self.hedged_methods = set(hedged_methods)
+        self.request_timeout = request_timeout
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(urls), thread_name_prefix='rpc-router')
+
+    def ranked(self) -> list[RPCEndpoint]:
+        """
+        @return: endpoints from the best score to the worst
+        """
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.score)
+
+    def pick(self) -> RPCEndpoint:
+        """
+        @return: endpoint chosen randomly with weights inverse to scores,
+        endpoints without samples are chosen first
+        """
+        unsampled = [endpoint for endpoint in self.endpoints if endpoint.latency is None]
+        if unsampled:
+            return random.choice(unsampled)
+        return random.choices(self.endpoints, weights=[1 / (endpoint.score or 1e-9)
+                                                       for endpoint in self.endpoints])[0]
+
+    def _route(self, method: str) -> tuple[list[RPCEndpoint], bool]:
+        """
+        @param method: JSON-RPC method
+        @return: endpoints to use in order and True if they are requested at once
+        """
+        ranked = self.ranked()
+        if method in self.hedged_methods and self.hedge > 1:
+            return ranked[:self.hedge], True
+        first = self.pick()
+        return [first] + [endpoint for endpoint in ranked if endpoint is not first], False
+
+    def _check_response(self, endpoint: RPCEndpoint, response: dict, latency: float) -> dict:
+        """
+        Record a sample for the answer
+        @raise RPCEndpointError: If the endpoint answered with a rate limit error
+        """
+        error = response.get('error') if isinstance(response, dict) else None
+        if isinstance(error, dict) and error.get('code') in self.RATE_LIMIT_CODES:
+            endpoint.record(latency, error=True)
+            raise RPCEndpointError(f'{endpoint.url} is rate limited: {error.get("message")}')
+        endpoint.record(latency)
+        return response
+
+    def _post(self, endpoint: RPCEndpoint, request_data: bytes) -> dict:
+        """
+        Send request to one endpoint
+        @raise RPCEndpointError: If the endpoint failed
+        """
+        start = time.perf_counter()
+        try:
+            response = self.registry.session(endpoint.url).post(
+                endpoint.url, data=request_data, headers={'Content-Type': 'application/json'},
+                timeout=self.request_timeout)
+            response.raise_for_status()
+            response = json.loads(response.content)
+        except Exception as error:
+            endpoint.record(time.perf_counter() - start, error=True)
+            raise RPCEndpointError(f'{endpoint.url} failed: {error}') from error
+        return self._check_response(endpoint, response, time.perf_counter() - start)
+
+    async def _post_async(self, endpoint: RPCEndpoint, request_data: bytes) -> dict:
+        """
+        Asynchronous version of _post, a cancelled request is recorded
+        with the time it took so far if it's longer than the current latency,
+        so slow endpoints lose their score
+        @raise RPCEndpointError: If the endpoint failed
+        """
+        start = time.perf_counter()
+        try:
+            # aiohttp session cached by web3 for the url, it raises for error statuses
+            response = await async_get_response_from_post_request(
+                endpoint.url, data=request_data, headers={'Content-Type': 'application/json'},
+                timeout=ClientTimeout(total=self.request_timeout))
+            response = json.loads(await response.read())
+        except asyncio.CancelledError:
+            # time so far is only a lower bound, it tells something only if it's worse than the score
+            elapsed = time.perf_counter() - start
+            if endpoint.latency is None or elapsed > endpoint.latency:
+                endpoint.record(elapsed)
+            raise
+        except Exception as error:
+            endpoint.record(time.perf_counter() - start, error=True)
+            raise RPCEndpointError(f'{endpoint.url} failed: {error}') from error
+        return self._check_response(endpoint, response, time.perf_counter() - start)
+
+    @staticmethod
+    def _is_good(response: dict) -> bool:
+        return 'error' not in response
+
+    def request(self, method: str, request_data: bytes) -> dict:
+        """
+        @param method: JSON-RPC method
+        @param request_data: encoded JSON-RPC request
+        @return: the first answer without an error,
+        an answer with an error if all endpoints returned errors
+        @raise RPCEndpointError: If no endpoint answered
+        """
+        endpoints, hedged = self._route(method)
+        error_response = None
+        last_error = None
+        if hedged:
+            futures = [self._executor.submit(self._post, endpoint, request_data) for endpoint in endpoints]
+            for future in as_completed(futures):
+                try:
+                    response = future.result()
+                except RPCEndpointError as error:
+                    last_error = error
+                    continue
+                if self._is_good(response):
+                    return response
+                error_response = error_response or response
+        else:
+            for endpoint in endpoints:
+                try:
+                    response = self._post(endpoint, request_data)
+                except RPCEndpointError as error:
+                    last_error = error
+                    continue
+                return response
+        if error_response is not None:
+            return error_response
+        raise last_error
+
+    async def request_async(self, method: str, request_data: bytes) -> dict:
+        """
+        Asynchronous version of request, slower hedged requests are cancelled
+        @param method: JSON-RPC method
+        @param request_data: encoded JSON-RPC request
+        @return: the first answer without an error,
+        an answer with an error if all endpoints returned errors
+        @raise RPCEndpointError: If no endpoint answered
+        """
+        endpoints, hedged = self._route(method)
+        error_response = None
+        last_error = None
+        if hedged:
+            tasks = [asyncio.create_task(self._post_async(endpoint, request_data)) for endpoint in endpoints]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    try:
+                        response = await next_done
+                    except RPCEndpointError as error:
+                        last_error = error
+                        continue
+                    if self._is_good(response):
+                        return response
+                    error_response = error_response or response
+            finally:
+                for task in tasks:
+                    task.cancel()
+        else:
+            for endpoint in endpoints:
+                try:
+                    response = await self._post_async(endpoint, request_data)
+                except RPCEndpointError as error:
+                    last_error = error
+                    continue
+                return response
+        if error_response is not None:
+            return error_response
+        raise last_error
+
+
+class RoutedHTTPProvider(JSONBaseProvider):
+    """
+    Web3 provider which sends requests through RPCRouter
+    """
+
+    def __init__(self, router: RPCRouter):
+        """
+        @param router: router with endpoints of one network
+        """
+        super().__init__()
+        self.router = router
+
+    def __str__(self):
+        return f'Routed RPC connection {", ".join(endpoint.url for endpoint in self.router.endpoints)}'
+
+    def make_request(self, method, params):
+        return self.router.request(method, self.encode_rpc_request(method, params))
+
+
+class RoutedAsyncHTTPProvider(AsyncJSONBaseProvider):
+    """
+    AsyncWeb3 provider which sends requests through RPCRouter
+    """
+
+    def __init__(self, router: RPCRouter):
+        """
+        @param router: router with endpoints of one network
+        """
+        super().__init__()
+        self.router = router
+
+    def __str__(self):
+        return f'Routed async RPC connection {", ".join(endpoint.url for endpoint in self.router.endpoints)}'
+
+    async def make_request(self, method, params):
+        return await self.router.request_async(method, self.encode_rpc_request(method, params))
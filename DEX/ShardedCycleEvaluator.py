@@ -0,0 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+
+def top_cycle_profits(vertex_ids: np.ndarray, log_rates: np.ndarray, spread_threshold: float,
+                      top_k: int = None, costs: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    @param vertex_ids: matrix of cycle vertex ids, one cycle per row
+    @param log_rates: log-rate of every vertex id
+    @param spread_threshold: minimum profit in percents
+    @param top_k: amount of the most profitable cycles to return, all above the threshold if None
+    @param costs: matrix of 2 rows in percents of the traded amount: cost of a step into every vertex id
+    and cost of a cycle starting at every vertex id, profits are net of them, gross if None
+    @return: row indexes of cycles with profit not less than spread_threshold and their profits in percents
+    """
+    profits = np.expm1(log_rates[vertex_ids].sum(axis=1)) * 100
+    if costs is not None:
+        profits -= costs[0][vertex_ids].sum(axis=1) + costs[1][vertex_ids[:, 0]]
+    indexes = np.flatnonzero(profits >= spread_threshold)
+    if top_k is not None and len(indexes) > top_k:
+        indexes = indexes[np.argpartition(profits[indexes], -top_k)[-top_k:]]
+    return indexes, profits[indexes]
+
+
+# shared memory blocks attached in a worker process, {role: (name, block)}
+_attached = {}
+
+
+def _attach(role: str, name: str, shape: tuple, dtype) -> np.ndarray:
+    """
+    @return: array over the shared memory block, the block is attached once per worker
+    """
+    attached = _attached.get(role)
+    if attached is None or attached[0] != name:
+        if attached is not None:
+            attached[1].close()
+        # workers share the resource tracker of the main process, which unlinks the block
+        attached = _attached[role] = (name, SharedMemory(name=name))
+    return np.ndarray(shape, dtype=dtype, buffer=attached[1].buf)
+
+
+def _evaluate_shard(rates_name: str, rates_length: int, with_costs: bool, cycles_name: str, cycles_shape: tuple,
+                    start: int, stop: int, spread_threshold: float, top_k: int):
+    """
+    Worker task: local top-k of cycles[start:stop]
+    @return: global row indexes and profits
+    """
+    # log-rates are followed by 2 rows of costs in the same block
+    rates = _attach('rates', rates_name, (3 if with_costs else 1, rates_length), np.float64)
+    vertex_ids = _attach('cycles', cycles_name, cycles_shape, np.intp)
+    indexes, profits = top_cycle_profits(vertex_ids[start:stop], rates[0], spread_threshold, top_k,
+                                         rates[1:] if with_costs else None)
+    return indexes + start, profits
+
+
+class ShardedCycleEvaluator:
+    """
+    Evaluates profits of a cycle catalogue in a process pool.
+    The cycle matrix is copied to shared memory once per topology change
+    and the price vector once per scan, so nothing big is pickled.
+    Every worker evaluates a contiguous shard of cycles and returns only its local top-k
+    """
+
+    def __init__(self, workers: int):
+        """
+        @param workers: amount of worker processes and shards
+        @raise ValueError: If workers is less than 1
+        """
+        if workers < 1:
+            raise ValueError(f'workers must be at least 1, got {workers}')
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._cycles_block = None
+        # cycle matrix the cycles block was copied from
+        self._cycles_source = None
+        self._rates_block = None
+
+    def _share_cycles(self, vertex_ids: np.ndarray):
+        if vertex_ids is self._cycles_source:
+            return
+        block = SharedMemory(create=True, size=max(vertex_ids.nbytes, 1))
+        np.ndarray(vertex_ids.shape, dtype=np.intp, buffer=block.buf)[:] = vertex_ids
+        self._release(self._cycles_block)
+        self._cycles_block = block
+        self._cycles_source = vertex_ids
+
+    def _share_rates(self, rates: np.ndarray):
+        """
+        @param rates: log-rates, with rows of costs after them if they are used
+        """
+        if self._rates_block is None or self._rates_block.size < rates.nbytes:
+            # room to grow, so new pairs don't allocate a block every scan
+            block = SharedMemory(create=True, size=2 * rates.nbytes)
+            self._release(self._rates_block)
+            self._rates_block = block
+        np.ndarray(rates.shape, dtype=np.float64, buffer=self._rates_block.buf)[:] = rates
+
+    @staticmethod
+    def _release(block: SharedMemory):
+        if block is not None:
+            block.close()
+            block.unlink()
+
+    def top_cycle_profits(self, vertex_ids: np.ndarray, log_rates: np.ndarray, spread_threshold: float,
+                          top_k: int = None, costs: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Parallel version of top_cycle_profits, the same matrix object is shared only once
+        @param vertex_ids: matrix of cycle vertex ids, one cycle per row
+        @param log_rates: log-rate of every vertex id
+        @param spread_threshold: minimum profit in percents
+        @param top_k: amount of the most profitable cycles to return, all above the threshold if None
+        @param costs: matrix of 2 rows in percents of the traded amount: cost of a step into every vertex id
+        and cost of a cycle starting at every vertex id, profits are net of them, gross if None
+        @return: row indexes of cycles with profit not less than spread_threshold and their profits in percents
+        """
+        if not len(vertex_ids):
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+        self._share_cycles(vertex_ids)
+        self._share_rates(log_rates if costs is None else np.vstack([log_rates, costs]))
+        bounds = np.linspace(0, len(vertex_ids), self.workers + 1).astype(int)
+        futures = [self._executor.submit(_evaluate_shard, self._rates_block.name, len(log_rates),
+                                         costs is not None, self._cycles_block.name, vertex_ids.shape, int(start), int(stop),
+                                         spread_threshold, top_k)
+                   for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        results = [future.result() for future in futures]
+        indexes = np.concatenate([result[0] for result in results])
+        profits = np.concatenate([result[1] for result in results])
+        if top_k is not None and len(indexes) > top_k:
+            best = np.argpartition(profits, -top_k)[-top_k:]
+            indexes, profits = indexes[best], profits[best]
+        return indexes, profits
+
+    def close(self):
+        """
+        Stop worker processes and free shared memory
+        """
+        self._executor.shutdown()
+        self._release(self._cycles_block)
+        self._release(self._rates_block)
+        self._cycles_block = self._rates_block = self._cycles_source = None
@@ -7,13 +7,20 @@ class SushiSwapV2(UniswapV2):
     SushiSwapV2 is also a fork of UniswapV2
     """
 
-    def __init__(self, network, subnet, web3_provider=None, pairs=None):
+    # pair addresses are requested from the factory
+    init_code_hash = None
+
+    def __init__(self, network, subnet, web3_provider=None, pairs=None,
+                 web3_client=None, web3_client_async=None):
         """
         @param network: network name like Ethereum, Arbitrum, etc.
         @param subnet: MAINNET or TESTNET
         @param web3_provider: http/https url for connecting to rpc blockchain node
         @param pairs: List of trading pairs in format "token0_name-token1_name"
+        @param web3_client: existing Web3 client, shared one from ProviderRegistry by default
+        @param web3_client_async: existing AsyncWeb3 client, shared one from ProviderRegistry by default
         """
-        super().__init__(network, subnet, web3_provider, pairs)
+        super().__init__(network, subnet, web3_provider, pairs,
+                         web3_client=web3_client, web3_client_async=web3_client_async)
         self.router_abi = "SushiSwapV2/Router02"
         self.factory_abi = 'SushiSwapV2/Factory'
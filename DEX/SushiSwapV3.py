@@ -8,15 +8,19 @@ class SushiSwapV3(UniswapV3):
     SushiSwap is a fork of UniswapV3
     """
 
-    def __init__(self, network, subnet, web3_provider=None, fee=None, pairs=None):
+    def __init__(self, network, subnet, web3_provider=None, fee=None, pairs=None,
+                 web3_client=None, web3_client_async=None):
         """
         @param network: network name like Ethereum, Arbitrum, etc.
         @param subnet: MAINNET or TESTNET
         @param web3_provider: http/https url for connecting to rpc blockchain node
         @param fee: commission of a pool, one of [100,500,3000,10000]
         @param pairs: List of trading pairs in format "token0_name-token1_name"
+        @param web3_client: existing Web3 client, shared one from ProviderRegistry by default
+        @param web3_client_async: existing AsyncWeb3 client, shared one from ProviderRegistry by default
         """
-        super().__init__(network, subnet, web3_provider, fee, pairs)
+        super().__init__(network, subnet, web3_provider, fee, pairs,
+                         web3_client=web3_client, web3_client_async=web3_client_async)
         self.quoter_ver = "v2"
         self.multicall_abi = "General/multicall"
         self.abi_folder = "SushiSwapV3"
@@ -0,0 +1,123 @@
+import json
+import os
+from threading import Lock
+from DEX.Token import Token
+
+
+class TokenRegistry:
+    """
+    Tokens of one network from DEX/resources/tokens/{network}-{subnet}.json,
+    the file is loaded once per process on the first lookup and shared by all exchanges.
+    Tokens are indexed by upper case symbol and by address.
+    A symbol belongs to the first token listed or registered with it,
+    other tokens with the same symbol are found only by address and listed in duplicates
+    """
+
+    _registries = {}
+    _registries_lock = Lock()
+
+    def __init__(self, network: str, subnet: str, tokens_path: str = None):
+        """
+        @param network: network name like Ethereum, Polygon, etc.
+        @param subnet: MAINNET or TESTNET
+        @param tokens_path: path of the tokens file, DEX/resources/tokens/{network}-{subnet}.json by default
+        """
+        if tokens_path is None:
+            tokens_path = f'{os.path.dirname(os.path.abspath(__file__))}/' \
+                          f'resources/tokens/{network}-{subnet.lower()}.json'
+        self.tokens_path = tokens_path
+        self._lock = Lock()
+        self._loaded = False
+        # {SYMBOL: Token}
+        self._by_symbol = {}
+        # {lower case address: Token}, lookups accept checksum and lower case addresses
+        self._by_address = {}
+        # {SYMBOL: addresses of tokens with the symbol which don't own it}
+        self.duplicates = {}
+
+    @classmethod
+    def get(cls, network: str, subnet: str):
+        """
+        @param network: network name like Ethereum, Polygon, etc.
+        @param subnet: MAINNET or TESTNET
+        @return: registry shared by all exchanges of the network in the process
+        """
+        key = (network.upper(), subnet.upper())
+        with cls._registries_lock:
+            if key not in cls._registries:
+                cls._registries[key] = cls(network, subnet)
+            return cls._registries[key]
+
+    def _load(self):
+        """
+        Index the tokens file, it is read only on the first call
+        """
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.tokens_path):
+                with open(self.tokens_path, 'r') as file:
+                    for token_info in json.load(file):
+                        self._add(token_info['symbol'].upper(), token_info['address'], token_info)
+            self._loaded = True
+
+    def _add(self, symbol: str, address: str, token):
+        """
+        Put a token to indexes, must be called with the lock
+        @param token: Token object or dictionary of the tokens file, it becomes Token on the first lookup
+        """
+        address = address.lower()
+        if address in self._by_address:
+            return
+        self._by_address[address] = token
+        if symbol not in self._by_symbol:
+            self._by_symbol[symbol] = token
+        else:
+            self.duplicates.setdefault(symbol, []).append(address)
+
+    def _token(self, index: dict, key: str):
+        """
+        @return: Token object from the index, dictionaries of the tokens file are converted once
+        """
+        token = index.get(key)
+        if token is None or isinstance(token, Token):
+            return token
+        with self._lock:
+            token_info = index[key]
+            if isinstance(token_info, Token):
+                # converted by another thread
+                return token_info
+            token = Token(symbol=token_info['symbol'], address=token_info['address'],
+                          decimals=token_info['decimals'])
+            self._by_address[token_info['address'].lower()] = token
+            if self._by_symbol.get(token.symbol) is token_info:
+                self._by_symbol[token.symbol] = token
+        return token
+
+    def by_symbol(self, symbol: str) -> Token:
+        """
+        @param symbol: token symbol in any case
+        @return: Token which owns the symbol, None if it's unknown
+        """
+        self._load()
+        return self._token(self._by_symbol, symbol.upper())
+
+    def by_address(self, address: str) -> Token:
+        """
+        @param address: token address in checksum or lower case
+        @return: Token with the address, None if it's unknown
+        """
+        self._load()
+        return self._token(self._by_address, address.lower())
+
+    def register(self, token: Token):
+        """
+        Add a token which is missing in the tokens file, a known address is not changed
+        @param token: Token object
+        @raise ValueError: If token is not a Token object
+        """
+        if not isinstance(token, Token):
+            raise ValueError(f'token must be a Token object, got {type(token)} instead')
+        self._load()
+        with self._lock:
+            self._add(token.symbol, token.address, token)
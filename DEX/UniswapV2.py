@@ -1,7 +1,10 @@
-from web3._utils.abi import get_abi_output_types
 from DEX.BaseExchange import BaseExchange
 from DEX.Token import Token
-from DEX.utils import get_function_abi
+from DEX.utils import get_function_abi, encode_function_abi
+from DEX.constants import ZERO_ADDRESS
+from DEX.AddressResolver import compute_v2_pair_address
+from DEX.multicall_codec import result_words
+from DEX.v2_math import get_amount_out, get_amount_in
 from numbers import Real
 
 
@@ -11,17 +14,55 @@ class UniswapV2(BaseExchange):
     Contains methods for interaction with Uniswap V2 exchange
     """
 
-    def __init__(self, network, subnet, web3_provider=None, pairs=None):
+    quote_call_gas = 40_000
+    swap_gas = 110_000
+    # Pair swap fee is 1 - fee_numerator / fee_denominator
+    fee_numerator = 997
+    fee_denominator = 1000
+    # keccak256 of a pair creation code for computing pair addresses offline,
+    # None if it's unknown, then addresses are requested from the factory
+    init_code_hash = '0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f'
+
+    def __init__(self, network, subnet, web3_provider=None, pairs=None,
+                 web3_client=None, web3_client_async=None):
         """
         @param network: network name like Ethereum, Arbitrum, etc.
         @param subnet: MAINNET or TESTNET
         @param web3_provider: http/https url for connecting to rpc blockchain node
         @param pairs: List of trading pairs in format "token0_name-token1_name"
+        @param web3_client: existing Web3 client, shared one from ProviderRegistry by default
+        @param web3_client_async: existing AsyncWeb3 client, shared one from ProviderRegistry by default
         """
-        super().__init__(network, subnet, web3_provider, pairs)
+        super().__init__(network, subnet, web3_provider, pairs,
+                         web3_client=web3_client, web3_client_async=web3_client_async)
         self.router_abi = 'UniswapV2/Router02'
         self.factory_abi = 'UniswapV2/Factory'
-        self._router_output_types = None
+        self.pair_abi = 'UniswapV2/Pair'
+        self._get_reserves_selector = None
+        self._pair_addresses = {}
+        self._reserve_call_pairs = []
+        self.reserves = {}
+        self.quote_source = 'router'
+
+    @property
+    def quote_source(self):
+        """
+        Where quotes come from:
+        "router" - getAmountsOut/getAmountsIn functions of a Router02 contract
+        "reserves" - getReserves function of every pair contract,
+        amounts are calculated locally
+        """
+        return self._quote_source
+
+    @quote_source.setter
+    def quote_source(self, source: str):
+        """
+        @param source: "router" or "reserves"
+        @raise ValueError: If source is not "router" or "reserves"
+        """
+        if source not in ['router', 'reserves']:
+            raise ValueError(f'quote_source must be "router" or "reserves", got {source} instead')
+        self._quote_source = source
 
     @property
     def weth_addr(self):
@@ -45,9 +86,7 @@ class UniswapV2(BaseExchange):
         for pushing to multicall contract
         """
         converted_amount = int(amount * 10 ** quote_asset.decimals)
-        route = [base_asset.address, quote_asset.address]
-        return self.router.encodeABI(fn_name='getAmountsIn',
-                                     args=(converted_amount, route))
+        return self._encode_get_amounts_in(base_asset.address, quote_asset.address, converted_amount)
 
     def _encode_buy_price_func(self, base_asset: Token, quote_asset: Token, amount: Real = 1):
         """
@@ -61,9 +100,27 @@ class UniswapV2(BaseExchange):
         for pushing to multicall contract
         """
         converted_amount = int(amount * 10 ** quote_asset.decimals)
-        route = [quote_asset.address, base_asset.address]
+        return self._encode_get_amounts_out(base_asset.address, quote_asset.address, converted_amount)
+
+    def _encode_get_amounts_in(self, base_address: str, quote_address: str, converted_amount: int):
+        """
+        @param base_address: base asset address
+        @param quote_address: quote asset address
+        @param converted_amount: raw quote asset amount
+        @return: encoded getAmountsIn router contract function
+        """
+        return self.router.encodeABI(fn_name='getAmountsIn',
+                                     args=(converted_amount, [base_address, quote_address]))
+
+    def _encode_get_amounts_out(self, base_address: str, quote_address: str, converted_amount: int):
+        """
+        @param base_address: base asset address
+        @param quote_address: quote asset address
+        @param converted_amount: raw quote asset amount
+        @return: encoded getAmountsOut router contract function
+        """
         return self.router.encodeABI(fn_name='getAmountsOut',
-                                     args=(converted_amount, route))
+                                     args=(converted_amount, [quote_address, base_address]))
 
     def encode_buy_order(self, base_asset: Token, quote_asset: Token,
                          amount_in, amount_out, address_to, slippage):
@@ -93,73 +150,175 @@ class UniswapV2(BaseExchange):
     def router_calls(self) -> list[tuple]:
         """
         For every pair in pair_list property we encode functions
-        for getting buy and sell prices and put it a list
+        for getting buy and sell prices and put it a list.
+        The list is rebuilt only when quote_asset_prices, quote_ladder or pairs change
         @return: data for calling multical contract
         to get quotes from router02 contract via multicall,
         contains list of tuples (calling_address, encoded data )
         """
+        return self._cached_calls('router_calls', self._build_router_calls)
+
+    def _build_router_calls(self) -> list[tuple]:
+        """
+        Encode router calls with calldata templates,
+        only amounts are encoded for every call
+        @return: list of tuples (calling_address, encoded data)
+        """
         router_calls = []
-        for tokens in self.pair_list.values():
+        router_address = self.router.address
+        for pair, tokens in self.pair_list.items():
             base_asset = tokens['base_asset']
             quote_asset = tokens['quote_asset']
-            quote_currency_amount = self.quote_asset_prices[quote_asset.symbol]
-            buy_call = self._encode_buy_price_func(base_asset, quote_asset, quote_currency_amount)
-            sell_call = self._encode_sell_price_func(base_asset, quote_asset, quote_currency_amount)
-            router_calls.append((self.router.address, buy_call))
-            router_calls.append((self.router.address, sell_call))
+            buy_template = self._calldata_template(self._encode_get_amounts_out,
+                                                   base_asset.address, quote_asset.address)
+            sell_template = self._calldata_template(self._encode_get_amounts_in,
+                                                    base_asset.address, quote_asset.address)
+            for quote_currency_amount in self.ladder_amounts(pair):
+                converted_amount = int(quote_currency_amount * 10 ** quote_asset.decimals)
+                router_calls.append((router_address, buy_template.encode(converted_amount)))
+                router_calls.append((router_address, sell_template.encode(converted_amount)))
         return router_calls
 
+    def decode_multicall_router(self, multicall_raw_data) -> dict:
+        """
+        decode multicall output data and put price data to a quotes dictionary
+        @param multicall_raw_data: tha data that returns after calling multicall
+        @return: quotes dictionary
+        """
+        # getAmountsOut and getAmountsIn return uint[] with two amounts:
+        # array offset, length, amount in, amount out
+        return self._decode_ladder_results(multicall_raw_data, buy_word_index=3, sell_word_index=2)
+
+    @property
+    def pair_addresses(self) -> dict:
+        """
+        Addresses of pair contracts for pairs in pair_list property.
+        Unknown addresses are resolved by address_resolver,
+        pairs which are not created on the exchange are skipped
+        @return: dictionary {pair name: pair contract address}
+        """
+        missing_pairs = [pair for pair in self.pair_list if pair not in self._pair_addresses]
+        if missing_pairs:
+            self._pair_addresses.update(self.address_resolver.resolve(
+                self, {pair: (self.pair_list[pair]['base_asset'].address,
+                              self.pair_list[pair]['quote_asset'].address) for pair in missing_pairs}))
+        return {pair: self._pair_addresses[pair] for pair in self.pair_list
+                if self._pair_addresses[pair] != ZERO_ADDRESS}
+
     @property
-    def router_output_types(self) -> list[str]:
+    def pool_index_fee(self) -> int:
+        """
+        @return: swap fee in hundredths of a bip like V3 pool fees, 3000 for 0.3%,
+        used as a key of address_resolver index
         """
-        I decided to use getAmountsIn for getting types,
-        because it has the same types as getAmountsOut
+        return round((self.fee_denominator - self.fee_numerator) * 1_000_000 / self.fee_denominator)
 
-        return: list of string representation of function
-        output types for decoding after multicall
+    def compute_pool_address(self, token_a: str, token_b: str):
         """
-        if self._router_output_types is None:
-            abi_function = get_function_abi(abi_name=self.router_abi,
-                                            func_name='getAmountsIn')
-            self._router_output_types = get_abi_output_types(abi_function)
-        return self._router_output_types
+        @param token_a: token address
+        @param token_b: token address
+        @return: pair contract address computed offline, None if init_code_hash is unknown
+        """
+        if self.init_code_hash is None:
+            return None
+        return compute_v2_pair_address(self.factory.address, token_a, token_b, self.init_code_hash)
 
-    def decode_multicall_router(self, multicall_raw_data) -> dict:
+    def encode_factory_pool_call(self, token_a: str, token_b: str) -> str:
         """
-        decode multicall output data and put price data to a quotes dictionary
-        @param multicall_raw_data: tha data that returns after calling multicall
+        @param token_a: token address
+        @param token_b: token address
+        @return: encoded getPair function of a Factory contract
+        """
+        return self.factory.encodeABI(fn_name='getPair', args=(token_a, token_b))
+
+    @property
+    def reserve_calls(self) -> list[tuple]:
+        """
+        @return: data for calling multicall contract
+        to get reserves of every pair in pair_list property,
+        contains list of tuples (pair address, encoded getReserves function)
+        """
+        if self._get_reserves_selector is None:
+            self._get_reserves_selector = encode_function_abi(
+                get_function_abi(abi_name=self.pair_abi, func_name='getReserves'))
+        pair_addresses = self.pair_addresses
+        self._reserve_call_pairs = list(pair_addresses)
+        return [(address, self._get_reserves_selector) for address in pair_addresses.values()]
+
+    def decode_multicall_reserves(self, multicall_raw_data) -> dict:
+        """
+        Decode getReserves results, put them to reserves property
+        in (base asset reserve, quote asset reserve) order
+        and calculate quotes from them
+        @param multicall_raw_data: tha data that returns after calling multicall with reserve_calls
+        @return: quotes dictionary
+        """
+        reserves = {}
+        reserves0 = result_words(multicall_raw_data, [0] * len(multicall_raw_data))
+        reserves1 = result_words(multicall_raw_data, [1] * len(multicall_raw_data))
+        for pair, reserve0, reserve1 in zip(self._reserve_call_pairs, reserves0, reserves1):
+            if reserve0 is None or reserve1 is None:
+                continue
+            base_asset = self.pair_list[pair]['base_asset']
+            quote_asset = self.pair_list[pair]['quote_asset']
+            # pair contract sorts tokens by address
+            if int(base_asset.address, 16) < int(quote_asset.address, 16):
+                reserves[pair] = (reserve0, reserve1)
+            else:
+                reserves[pair] = (reserve1, reserve0)
+        self.reserves = reserves
+        return self.price_book_from_reserves()
+
+    def quote_amounts(self, pair: str, amounts: list[Real]) -> tuple[list, list]:
+        """
+        Calculate buy and sell amounts from reserves property
+        for any number of quote asset amounts without requests to blockchain,
+        results are the same as getAmountsOut and getAmountsIn of a Router02 contract
+        @param pair: pair name from pair_list property
+        @param amounts: list of quote asset amounts
+        @return: lists of base asset amounts (buy_amounts, sell_amounts),
+        None for amounts which router would reject
+        """
+        base_asset = self.pair_list[pair]['base_asset']
+        quote_asset = self.pair_list[pair]['quote_asset']
+        base_reserve, quote_reserve = self.reserves[pair]
+        buy_amounts = []
+        sell_amounts = []
+        for amount in amounts:
+            converted_amount = int(amount * 10 ** quote_asset.decimals)
+            buy_amount = get_amount_out(converted_amount, quote_reserve, base_reserve,
+                                        self.fee_numerator, self.fee_denominator)
+            sell_amount = get_amount_in(converted_amount, base_reserve, quote_reserve,
+                                        self.fee_numerator, self.fee_denominator)
+            buy_amounts.append(None if buy_amount is None else buy_amount / 10 ** base_asset.decimals)
+            sell_amounts.append(None if sell_amount is None else sell_amount / 10 ** base_asset.decimals)
+        return buy_amounts, sell_amounts
+
+    def price_book_from_reserves(self) -> dict:
+        """
+        Calculate quotes for every pair in reserves property
+        for quote asset amount from quote_asset_prices property
+        @return: quotes dictionary
+        """
+        return self.local_price_book(self.reserves)
+
+    @property
+    def price_calls(self) -> list[tuple]:
+        """
+        @return: router_calls or reserve_calls depending on quote_source property
+        """
+        if self.quote_source == 'reserves':
+            return self.reserve_calls
+        return self.router_calls
+
+    def decode_price_calls(self, multicall_raw_data) -> dict:
+        """
+        @param multicall_raw_data: results of price_calls
         @return: quotes dictionary
         """
-        quotes = {}
-        for i in range(0, len(multicall_raw_data), 2):
-            pair = list(self.pair_list.keys())[i // 2]  # just pair name
-            buy_call_success = multicall_raw_data[i][0]
-            sell_call_success = multicall_raw_data[i + 1][0]
-            base_asset_decimals = self.pair_list[pair]['base_asset'].decimals
-            quote_asset_symbol = self.pair_list[pair]['quote_asset'].symbol
-            if buy_call_success and sell_call_success:
-                buy_amount = self.web3_client.codec.decode(
-                        self.router_output_types,
-                        multicall_raw_data[i][1])[0][1] / 10 ** base_asset_decimals
-                sell_amount = self.web3_client.codec.decode(
-                        self.router_output_types,
-                        multicall_raw_data[i + 1][1])[0][0] / 10 ** base_asset_decimals
-                quote_currency_amount = self.quote_asset_prices[quote_asset_symbol]
-                buy_price = quote_currency_amount / buy_amount
-                sell_price = quote_currency_amount / sell_amount
-                quotes[pair] = {'buy_price': buy_price, 'buy_amount': buy_amount,
-                                'sell_price': sell_price, 'sell_amount': sell_amount}
-        return quotes
-
-    def update_price_book(self):
-        """
-        Calls multicall contract to get quotes
-        then decode multicall and put quotes dictionary
-        to the price_book property
-        """
-        multicall_raw_data = self.multicall.functions.tryAggregate(
-            False, self.router_calls).call()
-        self.price_book = self.decode_multicall_router(multicall_raw_data)
+        if self.quote_source == 'reserves':
+            return self.decode_multicall_reserves(multicall_raw_data)
+        return self.decode_multicall_router(multicall_raw_data)
 
     def make_trade(self, token_in: Token, token_out: Token, recipient, amount_in,
                    amount_out, slippage, tx_params, private_key):
@@ -1,7 +1,11 @@
-from web3._utils.abi import get_abi_output_types
+from eth_abi import encode
 from .BaseExchange import BaseExchange
 from .Token import Token
-from .utils import get_contract, get_function_abi
+from .V3Pool import V3Pool
+from .constants import ZERO_ADDRESS
+from .AddressResolver import compute_v3_pool_address
+from .multicall_codec import try_block_and_aggregate, try_aggregate, try_aggregate_async
+from .utils import get_contract, get_function_abi, encode_function_abi
 from numbers import Real
 
 
@@ -11,28 +15,68 @@ class UniswapV3(BaseExchange):
     Contains methods for interaction with Uniswap V3 exchange
     """
 
-    def __init__(self, network, subnet, web3_provider=None, fee=None, pairs=None):
+    quote_call_gas = 150_000
+    swap_gas = 160_000
+    # keccak256 of a pool creation code for computing pool addresses offline,
+    # None if it's unknown, then addresses are requested from the factory
+    init_code_hash = '0xe34f199b19b2b4f47f68442619d555527d244f78a3297ea89325f843f87b8b54'
+    # address which deploys pools, the factory if None
+    pool_deployer = None
+
+    def __init__(self, network, subnet, web3_provider=None, fee=None, pairs=None,
+                 web3_client=None, web3_client_async=None):
         """
         @param network: network name like Ethereum, Arbitrum, etc.
         @param subnet: MAINNET or TESTNET
         @param web3_provider: http/https url for connecting to rpc blockchain node
         @param fee: commission of a pool, one of [100,500,3000,10000]
         @param pairs: List of trading pairs in format "token0_name-token1_name"
+        @param web3_client: existing Web3 client, shared one from ProviderRegistry by default
+        @param web3_client_async: existing AsyncWeb3 client, shared one from ProviderRegistry by default
         """
-        super().__init__(network, subnet, web3_provider, pairs)
+        super().__init__(network, subnet, web3_provider, pairs,
+                         web3_client=web3_client, web3_client_async=web3_client_async)
         self._quoter = None
         self._quoter_abi_suffix = None
         self._quoter_abi = None
-        self._quoter_output_types = None
         self.quoter_ver = "v2"  # quoter_ ver - version of Quoter contract. Only "v1" or "v2" can be set
         self.abi_folder = "UniswapV3"
         self.factory_abi = "UniswapV3/Factory"
         self.multicall_abi = "General/multicall"
         self.router_abi = 'UniswapV3/SwapRouter02'
+        # forks have the same pool functions which are used for quoting
+        self.pool_abi = 'UniswapV3/Pool'
+        self._pool_selectors = {}
+        self._pool_addresses = {}
+        self._pool_state_call_layout = []
+        self.pool_states = {}
+        # how many tick bitmap words to load on each side of the current tick word
+        self.tick_words_around = 2
+        self.quote_source = 'quoter'
 
         self.fee = fee
         self.name = self.__class__.__name__ + '/' + str(self.fee)
 
+    @property
+    def quote_source(self):
+        """
+        Where quotes come from:
+        "quoter" - quoteExactInputSingle/quoteExactOutputSingle functions of a Quoter contract
+        "pool_state" - slot0, liquidity, tick bitmap and ticks of every pool,
+        swaps are simulated locally
+        """
+        return self._quote_source
+
+    @quote_source.setter
+    def quote_source(self, source: str):
+        """
+        @param source: "quoter" or "pool_state"
+        @raise ValueError: If source is not "quoter" or "pool_state"
+        """
+        if source not in ['quoter', 'pool_state']:
+            raise ValueError(f'quote_source must be "quoter" or "pool_state", got {source} instead')
+        self._quote_source = source
+
     @property
     def fee(self):
         """
@@ -102,21 +146,6 @@ class UniswapV3(BaseExchange):
             self._weth_addr = self.quoter.functions.WETH9().call()
         return self._weth_addr
 
-    @property
-    def quoter_output_types(self) -> list[str]:
-        """
-        I decided to use quoteExactInputSingle for getting types,
-        because it has the same types as quoteExactOutputSingle
-
-        return: list of string representation of types for decoding
-        after multicall
-        """
-        if self._quoter_output_types is None:
-            abi_function = get_function_abi(abi_name=f'{self.abi_folder}/Quoter{self.quoter_abi_suffix}',
-                                            func_name='quoteExactInputSingle')
-            self._quoter_output_types = get_abi_output_types(abi_function)
-        return self._quoter_output_types
-
     def _encode_sell_price_func(self, base_asset: Token, quote_asset: Token, amount: Real = 1):
         """
         How much base asset tokens we must pass in
@@ -130,15 +159,38 @@ class UniswapV3(BaseExchange):
         to push it in a multicall contract
         """
         converted_amount = int(amount * 10 ** quote_asset.decimals)
+        return self._encode_quote_exact_output(base_asset.address, quote_asset.address, converted_amount)
+
+    def _encode_buy_price_func(self, base_asset: Token, quote_asset: Token, amount: Real = 1):
+        """
+        How much base asset tokens we could get if we pass in
+        exact amount of quote asset tokens
+
+        @param base_asset: first asset in the pair
+        @param quote_asset: second asset in the pair
+        @param amount: quote asset token amount
+        @return: encoded quoteExactInputSingle function of a Quoter contract
+        to push it in a multicall contract
+        """
+        converted_amount = int(amount * 10 ** quote_asset.decimals)
+        return self._encode_quote_exact_input(base_asset.address, quote_asset.address, converted_amount)
+
+    def _encode_quote_exact_output(self, base_address: str, quote_address: str, converted_amount: int):
+        """
+        @param base_address: base asset address, token in
+        @param quote_address: quote asset address, token out
+        @param converted_amount: raw quote asset amount out
+        @return: encoded quoteExactOutputSingle function of a Quoter contract
+        @raise ValueError: If quoter_ver is not "v1" or "v2"
+        """
         if self.quoter_ver == "v1":
             return self.quoter.encodeABI(fn_name='quoteExactOutputSingle',
-                                         args=(base_asset.address,
-                                               quote_asset.address,
+                                         args=(base_address, quote_address,
                                                self.fee, converted_amount, 0))
         elif self.quoter_ver == "v2":
             struct_params = {
-                "tokenIn": base_asset.address,
-                "tokenOut": quote_asset.address,
+                "tokenIn": base_address,
+                "tokenOut": quote_address,
                 "amount": converted_amount,
                 "fee": self.fee,
                 "sqrtPriceLimitX96": 0
@@ -148,28 +200,23 @@ class UniswapV3(BaseExchange):
         else:
             raise ValueError(f'quoter_ver might be Only "v1" or "v2", got {self.quoter_ver} instead')
 
-    def _encode_buy_price_func(self, base_asset: Token, quote_asset: Token, amount: Real = 1):
+    def _encode_quote_exact_input(self, base_address: str, quote_address: str, converted_amount: int):
         """
-        How much base asset tokens we could get if we pass in
-        exact amount of quote asset tokens
-
-        @param base_asset: first asset in the pair
-        @param quote_asset: second asset in the pair
-        @param amount: quote asset token amount
+        @param base_address: base asset address, token out
+        @param quote_address: quote asset address, token in
+        @param converted_amount: raw quote asset amount in
         @return: encoded quoteExactInputSingle function of a Quoter contract
-        to push it in a multicall contract
+        @raise ValueError: If quoter_ver is not "v1" or "v2"
         """
-        converted_amount = int(amount * 10 ** quote_asset.decimals)
         if self.quoter_ver == "v1":
             return self.quoter.encodeABI(fn_name='quoteExactInputSingle',
-                                         args=(quote_asset.address,
-                                               base_asset.address,
+                                         args=(quote_address, base_address,
                                                self.fee, converted_amount, 0))
 
         elif self.quoter_ver == "v2":
             struct_params = {
-                "tokenIn": quote_asset.address,
-                "tokenOut": base_asset.address,
+                "tokenIn": quote_address,
+                "tokenOut": base_address,
                 "amountIn": converted_amount,
                 "fee": self.fee,
                 "sqrtPriceLimitX96": 0
@@ -209,20 +256,33 @@ class UniswapV3(BaseExchange):
     def quoter_calls(self) -> list[tuple]:
         """
         For every pair in pair_list property we encode functions
-        for getting buy and sell prices and put it a list
+        for getting buy and sell prices and put it a list.
+        The list is rebuilt only when quote_asset_prices, quote_ladder, pairs, fee or quoter_ver change
         @return: data for calling multical contract,
         for getting quotes from Quoter v1 or v2 contract via multicall,
         contains list of tuples (calling_address, encoded data )
         """
+        return self._cached_calls('quoter_calls', self._build_quoter_calls)
+
+    def _build_quoter_calls(self) -> list[tuple]:
+        """
+        Encode quoter calls with calldata templates,
+        only amounts are encoded for every call
+        @return: list of tuples (calling_address, encoded data)
+        """
         quoter_calls = []
-        for tokens in self.pair_list.values():
+        quoter_address = self.quoter.address
+        for pair, tokens in self.pair_list.items():
             base_asset = tokens['base_asset']
             quote_asset = tokens['quote_asset']
-            quote_currency_amount = self.quote_asset_prices[quote_asset.symbol]
-            buy_call = self._encode_buy_price_func(base_asset, quote_asset, quote_currency_amount)
-            sell_call = self._encode_sell_price_func(base_asset, quote_asset, quote_currency_amount)
-            quoter_calls.append((self.quoter.address, buy_call))
-            quoter_calls.append((self.quoter.address, sell_call))
+            buy_template = self._calldata_template(self._encode_quote_exact_input,
+                                                   base_asset.address, quote_asset.address)
+            sell_template = self._calldata_template(self._encode_quote_exact_output,
+                                                    base_asset.address, quote_asset.address)
+            for quote_currency_amount in self.ladder_amounts(pair):
+                converted_amount = int(quote_currency_amount * 10 ** quote_asset.decimals)
+                quoter_calls.append((quoter_address, buy_template.encode(converted_amount)))
+                quoter_calls.append((quoter_address, sell_template.encode(converted_amount)))
         return quoter_calls
 
     def decode_multicall_quoter(self, multicall_raw_data):
@@ -231,39 +291,313 @@ class UniswapV3(BaseExchange):
         @param multicall_raw_data: tha data that returns after calling multicall
         @return: quotes dictionary
         """
-        quotes = {}
-        for i in range(0, len(multicall_raw_data), 2):
-
-            buy_call_success = multicall_raw_data[i][0]
-            sell_call_success = multicall_raw_data[i + 1][0]
-            pair = list(self.pair_list.keys())[i // 2]  # just pair name
-            base_asset_decimals = self.pair_list[pair]['base_asset'].decimals
-            quote_asset_symbol = self.pair_list[pair]['quote_asset'].symbol
-            if buy_call_success and sell_call_success:
-                buy_amount = self.web3_client.codec.decode(
-                    self.quoter_output_types,
-                    multicall_raw_data[i][1])[0] / 10 ** base_asset_decimals
-                sell_amount = self.web3_client.codec.decode(
-                    self.quoter_output_types,
-                    multicall_raw_data[i + 1][1])[0] / 10 ** base_asset_decimals
-                quote_currency_amount = self.quote_asset_prices[quote_asset_symbol]
-
-                buy_price = quote_currency_amount / buy_amount
-                sell_price = quote_currency_amount / sell_amount
-                quotes[pair] = {'buy_price': buy_price, 'buy_amount': buy_amount,
-                                'sell_price': sell_price, 'sell_amount': sell_amount}
-
-        return quotes
-
-    def update_price_book(self):
-        """
-        Calls multicall contract to get quotes
-        then decode multicall and put quotes dictionary
-        to the price_book property
-        """
-        multicall_raw_data = self.multicall.functions.tryAggregate(
-            False, self.quoter_calls).call()
-        self.price_book = self.decode_multicall_quoter(multicall_raw_data)
+        # amount is the first word of the result of both quoter versions
+        return self._decode_ladder_results(multicall_raw_data, buy_word_index=0, sell_word_index=0)
+
+    @property
+    def pool_addresses(self) -> dict:
+        """
+        Addresses of pool contracts with the exchange fee for pairs in pair_list property.
+        Unknown addresses are resolved by address_resolver,
+        pairs which don't have a pool are skipped
+        @return: dictionary {pair name: pool contract address}
+        """
+        missing_pairs = [pair for pair in self.pair_list if pair not in self._pool_addresses]
+        if missing_pairs:
+            self._pool_addresses.update(self.address_resolver.resolve(
+                self, {pair: (self.pair_list[pair]['base_asset'].address,
+                              self.pair_list[pair]['quote_asset'].address) for pair in missing_pairs}))
+        return {pair: self._pool_addresses[pair] for pair in self.pair_list
+                if self._pool_addresses[pair] != ZERO_ADDRESS}
+
+    @property
+    def _template_key(self) -> tuple:
+        """
+        Fee and quoter version are encoded to quoter calls
+        """
+        return self.fee, self.quoter_ver
+
+    @property
+    def pool_index_fee(self) -> int:
+        """
+        @return: pool fee, used as a key of address_resolver index
+        """
+        return self.fee
+
+    def compute_pool_address(self, token_a: str, token_b: str):
+        """
+        @param token_a: token address
+        @param token_b: token address
+        @return: pool contract address computed offline, None if init_code_hash is unknown
+        """
+        if self.init_code_hash is None:
+            return None
+        deployer = self.factory.address if self.pool_deployer is None else self.pool_deployer
+        return compute_v3_pool_address(deployer, token_a, token_b, self.fee, self.init_code_hash)
+
+    def encode_factory_pool_call(self, token_a: str, token_b: str) -> str:
+        """
+        @param token_a: token address
+        @param token_b: token address
+        @return: encoded getPool function of a Factory contract
+        """
+        return self.factory.encodeABI(fn_name='getPool', args=(token_a, token_b, self.fee))
+
+    def _encode_pool_call(self, func_name: str, arg_types: list[str] = None, args: list = None):
+        """
+        @param func_name: pool contract function name
+        @param arg_types: abi types of function arguments
+        @param args: function arguments
+        @return: encoded pool function without web3 contract object
+        """
+        if func_name not in self._pool_selectors:
+            self._pool_selectors[func_name] = encode_function_abi(
+                get_function_abi(abi_name=self.pool_abi, func_name=func_name))
+        if not arg_types:
+            return self._pool_selectors[func_name]
+        return self._pool_selectors[func_name] + encode(arg_types, args).hex()
+
+    def _pool_state(self, pair: str, address: str) -> V3Pool:
+        """
+        @param pair: pair name from pair_list property
+        @param address: pool address
+        @return: V3Pool object from pool_states property, creates it if it doesn't exist
+        """
+        pool = self.pool_states.get(pair)
+        if pool is None or pool.address != address:
+            base_asset = self.pair_list[pair]['base_asset']
+            quote_asset = self.pair_list[pair]['quote_asset']
+            # pool contract sorts tokens by address
+            token0, token1 = sorted([base_asset.address, quote_asset.address], key=lambda x: int(x, 16))
+            pool = V3Pool(address, token0, token1, self.fee)
+            self.pool_states[pair] = pool
+        return pool
+
+    @property
+    def pool_state_calls(self) -> list[tuple]:
+        """
+        For every pool encode slot0, liquidity, tickSpacing if it is unknown,
+        and if the pool was already loaded tickBitmap words around the previous tick
+        and ticks which were initialized in them
+        @return: data for calling multicall contract,
+        contains list of tuples (calling_address, encoded data)
+        """
+        calls = []
+        layout = []
+        for pair, address in self.pool_addresses.items():
+            pool = self._pool_state(pair, address)
+            calls.append((address, self._encode_pool_call('slot0')))
+            layout.append((pair, 'slot0', None))
+            calls.append((address, self._encode_pool_call('liquidity')))
+            layout.append((pair, 'liquidity', None))
+            if pool.tick_spacing is None:
+                calls.append((address, self._encode_pool_call('tickSpacing')))
+                layout.append((pair, 'tickSpacing', None))
+                continue
+            for word_position in pool.tick_bitmap:
+                calls.append((address, self._encode_pool_call('tickBitmap', ['int16'], [word_position])))
+                layout.append((pair, 'tickBitmap', word_position))
+            for tick in pool.initialized_ticks():
+                calls.append((address, self._encode_pool_call('ticks', ['int24'], [tick])))
+                layout.append((pair, 'ticks', tick))
+        self._pool_state_call_layout = layout
+        return calls
+
+    def _apply_pool_state_results(self, layout: list[tuple], multicall_raw_data) -> set:
+        """
+        Put decoded results of pool calls to V3Pool objects
+        @param layout: list of (pair, function name, argument) for every call
+        @param multicall_raw_data: results of the calls
+        @return: set of pairs which calls were failed
+        """
+        codec = self.web3_client.codec
+        failed_pairs = set()
+        for (pair, func_name, arg), (success, raw_data) in zip(layout, multicall_raw_data):
+            if not success:
+                failed_pairs.add(pair)
+                continue
+            pool = self.pool_states[pair]
+            # only first words are decoded, so it works for forks with extended outputs
+            if func_name == 'slot0':
+                pool.sqrt_price_x96, pool.tick = codec.decode(['uint160', 'int24'], raw_data[:64])
+            elif func_name == 'liquidity':
+                pool.liquidity = codec.decode(['uint128'], raw_data)[0]
+            elif func_name == 'tickSpacing':
+                pool.tick_spacing = codec.decode(['int24'], raw_data)[0]
+            elif func_name == 'tickBitmap':
+                pool.tick_bitmap[arg] = codec.decode(['uint256'], raw_data)[0]
+            elif func_name == 'ticks':
+                pool.ticks[arg] = tuple(codec.decode(['uint128', 'int128'], raw_data[:64]))
+        return failed_pairs
+
+    def _missing_pool_data_calls(self, pairs, failed_pairs: set) -> tuple[list, list]:
+        """
+        @param pairs: pairs which pool state must be completed
+        @param failed_pairs: pairs which calls were failed, they are skipped
+        @return: calls of tick bitmap words around the current tick and initialized ticks
+        which are not loaded yet, and (pair, function name, argument) of every call
+        """
+        calls = []
+        layout = []
+        for pair in pairs:
+            pool = self.pool_states[pair]
+            if pair in failed_pairs or not pool.is_loaded:
+                continue
+            for word_position in pool.word_range(self.tick_words_around):
+                if word_position not in pool.tick_bitmap:
+                    calls.append((pool.address, self._encode_pool_call('tickBitmap', ['int16'], [word_position])))
+                    layout.append((pair, 'tickBitmap', word_position))
+            for tick in pool.initialized_ticks():
+                if tick not in pool.ticks:
+                    calls.append((pool.address, self._encode_pool_call('ticks', ['int24'], [tick])))
+                    layout.append((pair, 'ticks', tick))
+        return calls, layout
+
+    def _load_missing_pool_data(self, pairs, block_identifier='latest'):
+        """
+        Request tick bitmap words around the current tick and initialized ticks
+        which are not loaded yet. Needs up to 2 multicalls: for words and then for ticks
+        @param pairs: pairs which pool state must be completed
+        @param block_identifier: block number to request data at, "latest" by default
+        @return: set of pairs which calls were failed
+        """
+        failed_pairs = set()
+        for _ in range(2):
+            calls, layout = self._missing_pool_data_calls(pairs, failed_pairs)
+            if not calls:
+                break
+            multicall_raw_data = try_aggregate(self.web3_client, self.multicall.address, calls, block_identifier)
+            failed_pairs |= self._apply_pool_state_results(layout, multicall_raw_data)
+        return failed_pairs
+
+    async def _load_missing_pool_data_async(self, pairs, block_identifier='latest'):
+        """
+        Asynchronous version of _load_missing_pool_data
+        @param pairs: pairs which pool state must be completed
+        @param block_identifier: block number to request data at, "latest" by default
+        @return: set of pairs which calls were failed
+        """
+        failed_pairs = set()
+        for _ in range(2):
+            calls, layout = self._missing_pool_data_calls(pairs, failed_pairs)
+            if not calls:
+                break
+            multicall_raw_data = await try_aggregate_async(self.web3_client_async, self.multicall.address,
+                                                           calls, block_identifier)
+            failed_pairs |= self._apply_pool_state_results(layout, multicall_raw_data)
+        return failed_pairs
+
+    def _decode_pool_state_results(self, multicall_raw_data) -> tuple[list, set]:
+        """
+        Put results of pool_state_calls to pool_states property, words and ticks are replaced by fresh ones
+        @param multicall_raw_data: results of pool_state_calls
+        @return: pairs of the calls and set of pairs which calls were failed
+        """
+        layout = self._pool_state_call_layout
+        pairs = list(dict.fromkeys(pair for pair, _, _ in layout))
+        for pair in pairs:
+            self.pool_states[pair].tick_bitmap = {}
+            self.pool_states[pair].ticks = {}
+        return pairs, self._apply_pool_state_results(layout, multicall_raw_data)
+
+    def _pool_state_price_book(self, pairs, failed_pairs: set) -> dict:
+        """
+        Drop tick bitmap words which are far from the current tick and calculate quotes from pool states
+        @param pairs: pairs of pool_state_calls
+        @param failed_pairs: pairs which calls were failed
+        @return: quotes dictionary
+        """
+        for pair in pairs:
+            pool = self.pool_states[pair]
+            if pool.is_loaded:
+                words = pool.word_range(self.tick_words_around)
+                pool.tick_bitmap = {word: pool.tick_bitmap[word] for word in words if word in pool.tick_bitmap}
+        return self.local_price_book([pair for pair in pairs if pair not in failed_pairs
+                                      and self.pool_states[pair].is_loaded])
+
+    def decode_multicall_pool_state(self, multicall_raw_data) -> dict:
+        """
+        Decode results of pool_state_calls, update pool_states property,
+        load missing tick data and calculate quotes from pool states
+        @param multicall_raw_data: tha data that returns after calling multicall with pool_state_calls
+        @return: quotes dictionary
+        """
+        pairs, failed_pairs = self._decode_pool_state_results(multicall_raw_data)
+        block_identifier = 'latest' if self.block_number is None else self.block_number
+        failed_pairs |= self._load_missing_pool_data(pairs, block_identifier)
+        return self._pool_state_price_book(pairs, failed_pairs)
+
+    async def decode_multicall_pool_state_async(self, multicall_raw_data) -> dict:
+        """
+        Asynchronous version of decode_multicall_pool_state,
+        missing tick data is requested without blocking the event loop
+        @param multicall_raw_data: results of pool_state_calls
+        @return: quotes dictionary
+        """
+        pairs, failed_pairs = self._decode_pool_state_results(multicall_raw_data)
+        block_identifier = 'latest' if self.block_number is None else self.block_number
+        failed_pairs |= await self._load_missing_pool_data_async(pairs, block_identifier)
+        return self._pool_state_price_book(pairs, failed_pairs)
+
+    def load_pool_states(self):
+        """
+        Load full state of every pool in pair_list property
+        after that quotes for any amount can be calculated with quote_amounts
+        """
+        block_number, block_hash, multicall_raw_data = try_block_and_aggregate(
+            self.web3_client, self.multicall.address, self.pool_state_calls)
+        self.block_number = block_number
+        self.decode_multicall_pool_state(multicall_raw_data)
+
+    def quote_amounts(self, pair: str, amounts: list[Real]) -> tuple[list, list]:
+        """
+        Calculate buy and sell amounts from pool_states property
+        for any number of quote asset amounts without requests to blockchain,
+        results are the same as quoteExactInputSingle and quoteExactOutputSingle of a Quoter contract
+        @param pair: pair name from pair_list property
+        @param amounts: list of quote asset amounts
+        @return: lists of base asset amounts (buy_amounts, sell_amounts),
+        None for amounts which Quoter would reject or which are out of the loaded ticks
+        """
+        base_asset = self.pair_list[pair]['base_asset']
+        quote_asset = self.pair_list[pair]['quote_asset']
+        pool = self.pool_states[pair]
+        buy_amounts = []
+        sell_amounts = []
+        for amount in amounts:
+            converted_amount = int(amount * 10 ** quote_asset.decimals)
+            buy_amount = pool.quote_exact_input(quote_asset.address, converted_amount)
+            sell_amount = pool.quote_exact_output(base_asset.address, converted_amount)
+            buy_amounts.append(None if buy_amount is None else buy_amount / 10 ** base_asset.decimals)
+            sell_amounts.append(None if sell_amount is None else sell_amount / 10 ** base_asset.decimals)
+        return buy_amounts, sell_amounts
+
+    @property
+    def price_calls(self) -> list[tuple]:
+        """
+        @return: quoter_calls or pool_state_calls depending on quote_source property
+        """
+        if self.quote_source == 'pool_state':
+            return self.pool_state_calls
+        return self.quoter_calls
+
+    def decode_price_calls(self, multicall_raw_data) -> dict:
+        """
+        @param multicall_raw_data: results of price_calls
+        @return: quotes dictionary
+        """
+        if self.quote_source == 'pool_state':
+            return self.decode_multicall_pool_state(multicall_raw_data)
+        return self.decode_multicall_quoter(multicall_raw_data)
+
+    async def decode_price_calls_async(self, multicall_raw_data) -> dict:
+        """
+        @param multicall_raw_data: results of price_calls
+        @return: quotes dictionary, pool state follow-up requests are awaited
+        """
+        if self.quote_source == 'pool_state':
+            return await self.decode_multicall_pool_state_async(multicall_raw_data)
+        return self.decode_multicall_quoter(multicall_raw_data)
 
     def make_trade(self, token_in: Token, token_out: Token, recipient, amount_in,
                    amount_out, slippage, tx_params, private_key):
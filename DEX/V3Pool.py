@@ -0,0 +1,157 @@
+from DEX.v3_math import (MIN_TICK, MAX_TICK, MIN_SQRT_RATIO, MAX_SQRT_RATIO,
+                         get_sqrt_ratio_at_tick, get_tick_at_sqrt_ratio,
+                         compute_swap_step, next_initialized_tick_within_one_word)
+
+
+class PoolStateNotLoaded(Exception):
+    """
+    Raised when a swap goes out of the loaded part of the tick bitmap
+    """
+
+
+class V3Pool:
+    """
+    Local copy of a Uniswap V3 like pool state:
+    slot0, active liquidity, tick bitmap words and initialized ticks.
+    Simulates swaps with the same integer math as the pool contract,
+    so quotes are equal to Quoter contract results without any requests
+    """
+
+    def __init__(self, address: str, token0: str, token1: str, fee: int, tick_spacing: int = None):
+        """
+        @param address: pool contract address
+        @param token0: address of token0 of the pool
+        @param token1: address of token1 of the pool
+        @param fee: pool fee in hundredths of a bip, 500 for 0.05%
+        @param tick_spacing: pool tick spacing
+        """
+        self.address = address
+        self.token0 = token0
+        self.token1 = token1
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.sqrt_price_x96 = None
+        self.tick = None
+        self.liquidity = None
+        # {word position: 256 bit word}
+        self.tick_bitmap = {}
+        # {tick: (liquidity_gross, liquidity_net)}
+        self.ticks = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        """
+        @return: True if slot0, liquidity and tick spacing are known
+        """
+        return None not in (self.sqrt_price_x96, self.tick, self.liquidity, self.tick_spacing)
+
+    def word_range(self, words_around: int) -> range:
+        """
+        @param words_around: how many bitmap words to take on each side of the current tick word
+        @return: range of bitmap word positions around the current tick
+        """
+        word_position = (self.tick // self.tick_spacing) >> 8
+        return range(word_position - words_around, word_position + words_around + 1)
+
+    def initialized_ticks(self) -> list[int]:
+        """
+        @return: ticks which are marked as initialized in the loaded bitmap words
+        """
+        ticks = []
+        for word_position, word in self.tick_bitmap.items():
+            while word:
+                bit_position = (word & -word).bit_length() - 1
+                ticks.append((word_position * 256 + bit_position) * self.tick_spacing)
+                word &= word - 1
+        return ticks
+
+    def swap(self, zero_for_one: bool, amount_specified: int, sqrt_price_limit_x96: int = None) -> tuple[int, int]:
+        """
+        Simulate a swap without changing the pool state
+        @param zero_for_one: direction of the swap, True for token0 -> token1
+        @param amount_specified: positive for exact input, negative for exact output
+        @param sqrt_price_limit_x96: price limit, the widest possible limit if None
+        @return: (amount0, amount1) pool balance deltas, positive are paid to the pool
+        @raise PoolStateNotLoaded: if the swap needs a tick bitmap word that is not loaded
+        """
+        if not self.is_loaded:
+            raise PoolStateNotLoaded(f'Pool {self.address} state is not loaded')
+        if sqrt_price_limit_x96 is None:
+            sqrt_price_limit_x96 = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        exact_input = amount_specified > 0
+        amount_remaining = amount_specified
+        amount_calculated = 0
+        sqrt_price_x96 = self.sqrt_price_x96
+        tick = self.tick
+        liquidity = self.liquidity
+
+        while amount_remaining != 0 and sqrt_price_x96 != sqrt_price_limit_x96:
+            sqrt_price_start_x96 = sqrt_price_x96
+            try:
+                tick_next, initialized, _ = next_initialized_tick_within_one_word(
+                    self.tick_bitmap, tick, self.tick_spacing, zero_for_one)
+            except KeyError as error:
+                raise PoolStateNotLoaded(f'Tick bitmap word {error} of pool {self.address} is not loaded')
+            tick_next = min(max(tick_next, MIN_TICK), MAX_TICK)
+            sqrt_price_next_x96 = get_sqrt_ratio_at_tick(tick_next)
+            if (sqrt_price_next_x96 < sqrt_price_limit_x96) if zero_for_one \
+                    else (sqrt_price_next_x96 > sqrt_price_limit_x96):
+                sqrt_price_target_x96 = sqrt_price_limit_x96
+            else:
+                sqrt_price_target_x96 = sqrt_price_next_x96
+
+            sqrt_price_x96, amount_in, amount_out, fee_amount = compute_swap_step(
+                sqrt_price_x96, sqrt_price_target_x96, liquidity, amount_remaining, self.fee)
+            if exact_input:
+                amount_remaining -= amount_in + fee_amount
+                amount_calculated -= amount_out
+            else:
+                amount_remaining += amount_out
+                amount_calculated += amount_in + fee_amount
+
+            if sqrt_price_x96 == sqrt_price_next_x96:
+                if initialized:
+                    if tick_next not in self.ticks:
+                        raise PoolStateNotLoaded(f'Tick {tick_next} of pool {self.address} is not loaded')
+                    liquidity_net = self.ticks[tick_next][1]
+                    liquidity += -liquidity_net if zero_for_one else liquidity_net
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price_x96 != sqrt_price_start_x96:
+                tick = get_tick_at_sqrt_ratio(sqrt_price_x96)
+
+        if zero_for_one == exact_input:
+            return amount_specified - amount_remaining, amount_calculated
+        return amount_calculated, amount_specified - amount_remaining
+
+    def quote_exact_input(self, token_in: str, amount_in: int):
+        """
+        The same as quoteExactInputSingle of a Quoter contract
+        @param token_in: address of the token to sell
+        @param amount_in: raw amount of token_in
+        @return: raw amount of the other token out, None if it can't be calculated
+        """
+        zero_for_one = token_in.lower() == self.token0.lower()
+        try:
+            amount0, amount1 = self.swap(zero_for_one, amount_in)
+        except (PoolStateNotLoaded, ValueError, ZeroDivisionError):
+            return None
+        return -amount1 if zero_for_one else -amount0
+
+    def quote_exact_output(self, token_in: str, amount_out: int):
+        """
+        The same as quoteExactOutputSingle of a Quoter contract
+        @param token_in: address of the token to sell
+        @param amount_out: raw amount of the other token to buy
+        @return: raw amount of token_in needed, None if it can't be calculated
+        or pool doesn't have enough liquidity
+        """
+        zero_for_one = token_in.lower() == self.token0.lower()
+        try:
+            amount0, amount1 = self.swap(zero_for_one, -amount_out)
+        except (PoolStateNotLoaded, ValueError, ZeroDivisionError):
+            return None
+        amount_received = -amount1 if zero_for_one else -amount0
+        # Quoter reverts if the pool can't give the whole amount out
+        if amount_received != amount_out:
+            return None
+        return amount0 if zero_for_one else amount1
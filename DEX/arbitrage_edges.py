@@ -0,0 +1,65 @@
+"""
+Edges of the arbitrage graph built with hash joins on tokens.
+Vertex has form like "{exchange_name}_{pair_name}_{buy/sell}",
+after a buy vertex we hold the base token of the pair, after a sell vertex the quote token.
+An edge connects a vertex with vertices of other exchanges which consume the held token:
+sell vertices of pairs with this base token and buy vertices of pairs with this quote token
+"""
+
+
+def split_pair(pair: str) -> tuple[str, str]:
+    """
+    @param pair: pair name like "WMATIC-WETH"
+    @return: base and quote token symbols
+    """
+    tokens = pair.split('-')
+    return tokens[0], tokens[1]
+
+
+def pair_vertices(exchange_name: str, pair: str) -> list[tuple]:
+    """
+    @param exchange_name: name of the exchange
+    @param pair: pair name like "WMATIC-WETH"
+    @return: buy and sell vertices of the pair as tuples (vertex, is buy vertex, held token, consumed token,
+    follows a buy vertex, follows a sell vertex)
+    """
+    base, quote = split_pair(pair)
+    # a pair with the same base and quote token is matched by the first rule only:
+    # base token first after a buy step, quote token first after a sell step
+    degenerate = base == quote
+    return [(f'{exchange_name}_{pair}_buy', True, base, quote, not degenerate, True),
+            (f'{exchange_name}_{pair}_sell', False, quote, base, True, not degenerate)]
+
+
+def _index_pairs(price_books: list[tuple[str, list]]):
+    """
+    @return: vertices with the tokens held after them
+    and index {token: {exchange position: [(vertex, follows a buy vertex, follows a sell vertex)]}}
+    """
+    producers = []
+    consumers = {}
+    for position, (exchange_name, pairs) in enumerate(price_books):
+        for pair in pairs:
+            for vertex, is_buy, held, consumed, after_buy, after_sell in pair_vertices(exchange_name, pair):
+                producers.append((position, vertex, held, is_buy))
+                consumers.setdefault(consumed, {}).setdefault(position, []).append((vertex, after_buy, after_sell))
+    return producers, consumers
+
+
+def token_edges(price_books: list[tuple[str, list]]) -> list[tuple[str, str]]:
+    """
+    Finds connections between vertices of different exchanges.
+    Pairs are indexed by token once, so the work is linear in pairs plus produced edges
+    @param price_books: list of tuples (exchange name, pair names of its price book)
+    @return: list of edges (vertex, next vertex)
+    """
+    producers, consumers = _index_pairs(price_books)
+    edges = []
+    for position, vertex, token, after_buy in producers:
+        for consumer_position, vertices in consumers.get(token, {}).items():
+            if consumer_position == position:
+                continue
+            for next_vertex, after_buy_match, after_sell_match in vertices:
+                if after_buy_match if after_buy else after_sell_match:
+                    edges.append((vertex, next_vertex))
+    return edges
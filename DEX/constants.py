@@ -5,4 +5,16 @@ BINANCE_SYMBOLS = ['ETHUSDC', 'ETHUSDT', 'ETHDAI', 'USDCUSDT', 'USDTDAI',
 
 DEX_QUOTE_ASSETS = ['ETH', 'USDC', 'DAI', 'USDT', 'MATIC', 'USDC.E']
 
+# tokens of DEX_QUOTE_ASSETS which exist on chain only wrapped
+QUOTE_ASSET_ALIASES = {'ETH': 'WETH', 'MATIC': 'WMATIC'}
+
 AVAILABLE_SUBNETS = ['MAINNET', 'TESTNET']
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+# wrapped native token of every network, gas is paid in the native token
+NATIVE_TOKENS = {'ETHEREUM': 'WETH', 'ARBITRUM': 'WETH', 'OPTIMISM': 'WETH', 'LINEA': 'WETH',
+                 'POLYGON': 'WMATIC', 'BSC': 'WBNB', 'AVALANCHE': 'WAVAX'}
+
+# approximate gas of a flash loan arbitrage transaction without swaps
+FLASHLOAN_GAS = 250_000
@@ -0,0 +1,58 @@
+"""
+Cross rates of tokens derived from price books of the previous scan.
+Tokens are vertices and every quoted pair is an edge weighted by its bid-ask spread,
+so a token is priced through the most liquid chain of pairs to the source token
+"""
+from math import sqrt, log
+import networkx as nx
+from DEX.arbitrage_edges import split_pair
+
+# extra weight of every hop, so the shortest of equally liquid paths is taken
+HOP_WEIGHT = 1e-6
+
+
+def pair_mid_prices(price_books) -> dict:
+    """
+    The most liquid quote of every token pair across price books
+    @param price_books: iterable of price books {pair: quote}, dictionaries or PriceBook objects
+    @return: dictionary {(BASE, QUOTE): (mid price of base in quote, relative spread)}, symbols are upper case
+    """
+    mid_prices = {}
+    for price_book in price_books:
+        for pair, quote in price_book.items():
+            base, quote_symbol = (symbol.upper() for symbol in split_pair(pair))
+            buy_price, sell_price = quote.get('buy_price'), quote.get('sell_price')
+            if base == quote_symbol or not buy_price or not sell_price or buy_price <= 0 or sell_price <= 0:
+                continue
+            # buy price is higher than sell price by fees and price impact of quote_amount
+            spread = max(log(buy_price / sell_price), 0)
+            key = (base, quote_symbol) if (quote_symbol, base) not in mid_prices else (quote_symbol, base)
+            mid_price = sqrt(buy_price * sell_price) if key[0] == base else 1 / sqrt(buy_price * sell_price)
+            if key not in mid_prices or spread < mid_prices[key][1]:
+                mid_prices[key] = (mid_price, spread)
+    return mid_prices
+
+
+def token_rates(mid_prices: dict, source: str) -> dict:
+    """
+    @param mid_prices: dictionary from pair_mid_prices
+    @param source: upper case symbol of the token to price others in
+    @return: dictionary {token symbol: amount of the token worth 1 source token}
+    for every token connected to the source, the source itself included
+    """
+    graph = nx.Graph()
+    for (base, quote), (mid_price, spread) in mid_prices.items():
+        graph.add_edge(base, quote, price=(base, mid_price), weight=spread + HOP_WEIGHT)
+    if source not in graph:
+        return {source: 1.0}
+    paths = nx.single_source_dijkstra_path(graph, source)
+    rates = {source: 1.0}
+    # paths share prefixes, so every token is priced from the previous token of its path
+    for token, path in sorted(paths.items(), key=lambda item: len(item[1])):
+        if token == source:
+            continue
+        previous = path[-2]
+        base, mid_price = graph.edges[previous, token]['price']
+        # 1 previous token is worth 1 / mid_price base tokens or mid_price quote tokens
+        rates[token] = rates[previous] / mid_price if base == token else rates[previous] * mid_price
+    return rates
@@ -0,0 +1,207 @@
+"""
+Encoding and decoding of Multicall3 tryAggregate/tryBlockAndAggregate calls
+without web3 contract objects and eth_abi.
+Results are parsed with fixed offsets straight from the returned bytes
+"""
+from collections.abc import Sequence
+from web3 import Web3
+
+TRY_AGGREGATE_SELECTOR = bytes(Web3.keccak(text='tryAggregate(bool,(address,bytes)[])')[:4])
+TRY_BLOCK_AND_AGGREGATE_SELECTOR = bytes(Web3.keccak(text='tryBlockAndAggregate(bool,(address,bytes)[])')[:4])
+
+
+def _word(value: int) -> bytes:
+    return value.to_bytes(32, 'big')
+
+
+def _to_bytes(data) -> bytes:
+    """
+    @param data: hex string with 0x prefix or bytes
+    """
+    return bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+
+
+def encode_aggregate_call(selector: bytes, require_success: bool, calls: list[tuple]) -> bytes:
+    """
+    @param selector: TRY_AGGREGATE_SELECTOR or TRY_BLOCK_AND_AGGREGATE_SELECTOR
+    @param require_success: revert whole multicall if one call fails
+    @param calls: list of tuples (calling_address, encoded data)
+    @return: calldata for the multicall contract
+    """
+    heads = []
+    tails = []
+    # offsets are relative to the start of the array elements, after the length word
+    tail_offset = 32 * len(calls)
+    for address, data in calls:
+        data = _to_bytes(data)
+        padding = b'\x00' * (-len(data) % 32)
+        tail = (bytes(12) + bytes.fromhex(address[2:]) + _word(64) + _word(len(data)) + data + padding)
+        heads.append(_word(tail_offset))
+        tails.append(tail)
+        tail_offset += len(tail)
+    return b''.join([selector, _word(int(require_success)), _word(64), _word(len(calls)), *heads, *tails])
+
+
+class MulticallResults(Sequence):
+    """
+    Sequence of (success, return data) tuples over raw returned bytes of a multicall.
+    Element offsets are parsed once, slices share the raw bytes without copying,
+    words method pulls uint256 words of return data without creating tuples
+    """
+
+    def __init__(self, raw: bytes, array_offset: int = None, _parsed=None, _start=0, _stop=None):
+        """
+        @param raw: returned bytes of tryAggregate or tryBlockAndAggregate
+        @param array_offset: offset of the (bool, bytes)[] array in raw
+        """
+        self.raw = raw
+        if _parsed is None:
+            _parsed = self._parse(raw, array_offset)
+        self._success, self._data_start, self._data_length = _parsed
+        self._start = _start
+        self._stop = len(self._success) if _stop is None else _stop
+
+    @staticmethod
+    def _parse(raw: bytes, array_offset: int):
+        """
+        @return: lists of success flags, data starts and data lengths
+        """
+        length = int.from_bytes(raw[array_offset:array_offset + 32], 'big')
+        elements_start = array_offset + 32
+        success = [False] * length
+        data_start = [0] * length
+        data_length = [0] * length
+        from_bytes = int.from_bytes
+        for index in range(length):
+            head = elements_start + 32 * index
+            element = elements_start + from_bytes(raw[head:head + 32], 'big')
+            success[index] = raw[element + 31] == 1
+            data = element + from_bytes(raw[element + 32:element + 64], 'big')
+            data_length[index] = from_bytes(raw[data:data + 32], 'big')
+            data_start[index] = data + 32
+        return success, data_start, data_length
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return MulticallResults(self.raw, _parsed=(self._success, self._data_start, self._data_length),
+                                    _start=self._start + start, _stop=self._start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('MulticallResults index out of range')
+        index += self._start
+        data_start = self._data_start[index]
+        return self._success[index], self.raw[data_start:data_start + self._data_length[index]]
+
+    def words(self, word_indexes: list[int]) -> list:
+        """
+        @param word_indexes: for every result, index of a 32 bytes word in its return data
+        @return: list of uint256 values, None for failed calls or too short data
+        """
+        raw = self.raw
+        from_bytes = int.from_bytes
+        values = [None] * len(self)
+        for position, word_index in enumerate(word_indexes):
+            index = self._start + position
+            if self._success[index] and self._data_length[index] >= 32 * (word_index + 1):
+                word_start = self._data_start[index] + 32 * word_index
+                values[position] = from_bytes(raw[word_start:word_start + 32], 'big')
+        return values
+
+
+def result_words(results, word_indexes: list[int]) -> list:
+    """
+    @param results: MulticallResults or a list of (success, return data) tuples
+    @param word_indexes: for every result, index of a 32 bytes word in its return data
+    @return: list of uint256 values, None for failed calls or too short data
+    """
+    if isinstance(results, MulticallResults):
+        return results.words(word_indexes)
+    values = []
+    for (success, data), word_index in zip(results, word_indexes):
+        word = data[32 * word_index:32 * (word_index + 1)] if success else b''
+        values.append(int.from_bytes(word, 'big') if len(word) == 32 else None)
+    return values
+
+
+def decode_try_aggregate(raw) -> MulticallResults:
+    """
+    @param raw: returned bytes of tryAggregate
+    @return: results of the calls
+    """
+    raw = bytes(raw)
+    return MulticallResults(raw, int.from_bytes(raw[:32], 'big'))
+
+
+def decode_try_block_and_aggregate(raw) -> tuple[int, bytes, MulticallResults]:
+    """
+    @param raw: returned bytes of tryBlockAndAggregate
+    @return: block number, block hash and results of the calls
+    """
+    raw = bytes(raw)
+    return int.from_bytes(raw[:32], 'big'), raw[32:64], MulticallResults(raw, int.from_bytes(raw[64:96], 'big'))
+
+
+def try_block_and_aggregate(web3_client, multicall_address: str, calls: list[tuple],
+                            block_identifier='latest') -> tuple[int, bytes, MulticallResults]:
+    """
+    Send tryBlockAndAggregate as a raw eth_call
+    @param web3_client: Web3 client
+    @param multicall_address: multicall contract address
+    @param calls: list of tuples (calling_address, encoded data)
+    @param block_identifier: block number to call at, "latest" by default
+    @return: block number, block hash and results of the calls
+    """
+    data = encode_aggregate_call(TRY_BLOCK_AND_AGGREGATE_SELECTOR, False, calls)
+    raw = web3_client.eth.call({'to': multicall_address, 'data': data}, block_identifier)
+    return decode_try_block_and_aggregate(raw)
+
+
+async def try_block_and_aggregate_async(web3_client_async, multicall_address: str, calls: list[tuple],
+                                        block_identifier='latest') -> tuple[int, bytes, MulticallResults]:
+    """
+    Asynchronous version of try_block_and_aggregate
+    @param web3_client_async: AsyncWeb3 client
+    @param multicall_address: multicall contract address
+    @param calls: list of tuples (calling_address, encoded data)
+    @param block_identifier: block number to call at, "latest" by default
+    @return: block number, block hash and results of the calls
+    """
+    data = encode_aggregate_call(TRY_BLOCK_AND_AGGREGATE_SELECTOR, False, calls)
+    raw = await web3_client_async.eth.call({'to': multicall_address, 'data': data}, block_identifier)
+    return decode_try_block_and_aggregate(raw)
+
+
+def try_aggregate(web3_client, multicall_address: str, calls: list[tuple],
+                  block_identifier='latest') -> MulticallResults:
+    """
+    Send tryAggregate as a raw eth_call
+    @param web3_client: Web3 client
+    @param multicall_address: multicall contract address
+    @param calls: list of tuples (calling_address, encoded data)
+    @param block_identifier: block number to call at, "latest" by default
+    @return: results of the calls
+    """
+    data = encode_aggregate_call(TRY_AGGREGATE_SELECTOR, False, calls)
+    return decode_try_aggregate(web3_client.eth.call({'to': multicall_address, 'data': data}, block_identifier))
+
+
+async def try_aggregate_async(web3_client_async, multicall_address: str, calls: list[tuple],
+                              block_identifier='latest') -> MulticallResults:
+    """
+    Asynchronous version of try_aggregate
+    @param web3_client_async: AsyncWeb3 client
+    @param multicall_address: multicall contract address
+    @param calls: list of tuples (calling_address, encoded data)
+    @param block_identifier: block number to call at, "latest" by default
+    @return: results of the calls
+    """
+    data = encode_aggregate_call(TRY_AGGREGATE_SELECTOR, False, calls)
+    raw = await web3_client_async.eth.call({'to': multicall_address, 'data': data}, block_identifier)
+    return decode_try_aggregate(raw)
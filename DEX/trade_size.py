@@ -0,0 +1,87 @@
+"""
+Profit maximizing input amount of an arbitrage cycle.
+A chain of constant product legs is one virtual pool: every leg maps an input x to
+A * x / (B + C * x), and so does their composition. Profit A * x / (B + C * x) - x
+is maximal at x* = (sqrt(A * B) - B) / C, so V2 cycles are sized in closed form.
+Other cycles are sized by golden-section search of a concave profit function
+"""
+from math import sqrt
+from DEX.v2_math import get_amount_out
+
+# 1 / golden ratio
+_INVERSE_PHI = (sqrt(5) - 1) / 2
+
+
+def compose_v2_legs(legs: list[tuple]) -> tuple[float, float, float]:
+    """
+    @param legs: list of tuples (reserve_in, reserve_out, fee_numerator, fee_denominator) in the trade order
+    @return: coefficients (A, B, C) of the composed output A * x / (B + C * x)
+    """
+    a, b, c = 1.0, 1.0, 0.0
+    for reserve_in, reserve_out, fee_numerator, fee_denominator in legs:
+        gamma = fee_numerator / fee_denominator
+        leg_a, leg_b, leg_c = gamma * reserve_out, float(reserve_in), gamma
+        # leg(cycle(x)) = leg_a * a * x / (leg_b * b + (leg_b * c + leg_c * a) * x)
+        a, b, c = leg_a * a, leg_b * b, leg_b * c + leg_c * a
+    return a, b, c
+
+
+def optimal_v2_input(legs: list[tuple]) -> float:
+    """
+    @param legs: list of tuples (reserve_in, reserve_out, fee_numerator, fee_denominator) in the trade order
+    @return: profit maximizing raw input amount, 0 if the cycle is not profitable at any amount
+    """
+    if not legs:
+        return 0
+    a, b, c = compose_v2_legs(legs)
+    if a <= b or c <= 0:
+        return 0
+    return (sqrt(a) * sqrt(b) - b) / c
+
+
+def v2_path_amounts(legs: list[tuple], amount_in: int) -> list[int]:
+    """
+    Exact integer amounts of every leg, like Router02 getAmountsOut
+    @param legs: list of tuples (reserve_in, reserve_out, fee_numerator, fee_denominator) in the trade order
+    @param amount_in: raw input amount of the first leg
+    @return: raw amounts [amount_in, output of the first leg, ..., output of the last leg],
+    None if a leg would revert
+    """
+    amounts = [amount_in]
+    for reserve_in, reserve_out, fee_numerator, fee_denominator in legs:
+        amount_out = get_amount_out(amounts[-1], reserve_in, reserve_out, fee_numerator, fee_denominator)
+        if not amount_out:
+            return None
+        amounts.append(amount_out)
+    return amounts
+
+
+def golden_section_maximum(function, low: float, high: float,
+                           tolerance: float = 1e-6, max_iterations: int = 100) -> float:
+    """
+    Argument of the maximum of a unimodal function on [low, high]
+    @param function: function of one float argument
+    @param low: lower bound of the argument
+    @param high: upper bound of the argument
+    @param tolerance: relative width of the bracket to stop at
+    @param max_iterations: maximum amount of function evaluations after the first two
+    @return: argument of the best found value
+    @raise ValueError: If low is bigger than high
+    """
+    if low > high:
+        raise ValueError(f'low must not be bigger than high, got {low} and {high}')
+    left = high - _INVERSE_PHI * (high - low)
+    right = low + _INVERSE_PHI * (high - low)
+    left_value, right_value = function(left), function(right)
+    for _ in range(max_iterations):
+        if high - low <= tolerance * max(abs(high), abs(low), 1e-18):
+            break
+        if left_value < right_value:
+            low, left, left_value = left, right, right_value
+            right = low + _INVERSE_PHI * (high - low)
+            right_value = function(right)
+        else:
+            high, right, right_value = right, left, left_value
+            left = high - _INVERSE_PHI * (high - low)
+            left_value = function(left)
+    return left if left_value >= right_value else right
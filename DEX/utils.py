@@ -122,3 +122,21 @@ def exec_time(func):
         return result
 
     return exec_time_wrapper
+
+
+def geometric_ladder(smallest: float, largest: float, steps: int) -> list[float]:
+    """
+    Multipliers for quote_ladder property of exchanges,
+    every next size is bigger than the previous one by the same ratio
+    @param smallest: the smallest multiplier, like 0.1
+    @param largest: the largest multiplier, like 100
+    @param steps: amount of sizes in the ladder
+    @return: list of multipliers from smallest to largest
+    @raise ValueError: If bounds are not positive or steps is less than 2
+    """
+    if smallest <= 0 or largest <= smallest:
+        raise ValueError(f'Ladder bounds must be 0 < smallest < largest, got {smallest} and {largest}')
+    if steps < 2:
+        raise ValueError(f'Ladder must have at least 2 steps, got {steps}')
+    ratio = (largest / smallest) ** (1 / (steps - 1))
+    return [smallest * ratio ** step for step in range(steps)]
@@ -0,0 +1,41 @@
+"""
+Integer math of Uniswap V2 like pairs (UniswapV2Library)
+All amounts and reserves are raw integers in the smallest token units
+"""
+
+
+def get_amount_out(amount_in: int, reserve_in: int, reserve_out: int,
+                   fee_numerator: int = 997, fee_denominator: int = 1000):
+    """
+    Maximum output amount of the other asset for a given input amount
+    @param amount_in: amount of input token
+    @param reserve_in: pair reserve of input token
+    @param reserve_out: pair reserve of output token
+    @param fee_numerator: 997 for 0.3% fee
+    @param fee_denominator: 1000 for 0.3% fee
+    @return: amount out or None if router would revert
+    """
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return None
+    amount_in_with_fee = amount_in * fee_numerator
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * fee_denominator + amount_in_with_fee
+    return numerator // denominator
+
+
+def get_amount_in(amount_out: int, reserve_in: int, reserve_out: int,
+                  fee_numerator: int = 997, fee_denominator: int = 1000):
+    """
+    Required input amount of the other asset for a given output amount
+    @param amount_out: desired amount of output token
+    @param reserve_in: pair reserve of input token
+    @param reserve_out: pair reserve of output token
+    @param fee_numerator: 997 for 0.3% fee
+    @param fee_denominator: 1000 for 0.3% fee
+    @return: amount in or None if router would revert
+    """
+    if amount_out <= 0 or reserve_in <= 0 or reserve_out <= 0 or amount_out >= reserve_out:
+        return None
+    numerator = reserve_in * amount_out * fee_denominator
+    denominator = (reserve_out - amount_out) * fee_numerator
+    return numerator // denominator + 1
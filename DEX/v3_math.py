@@ -0,0 +1,279 @@
+"""
+Integer math of Uniswap V3 like pools
+(TickMath, FullMath, SqrtPriceMath, SwapMath and TickBitmap libraries)
+All amounts are raw integers in the smallest token units,
+prices are Q64.96 square roots as in the pool contract
+"""
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+Q96 = 1 << 96
+MAX_UINT160 = (1 << 160) - 1
+MAX_UINT256 = (1 << 256) - 1
+FEE_PIPS_DENOMINATOR = 1_000_000
+
+_TICK_RATIO_MULTIPLIERS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+
+def mul_div(a: int, b: int, denominator: int) -> int:
+    """
+    floor(a * b / denominator) with full precision
+    """
+    return a * b // denominator
+
+
+def mul_div_rounding_up(a: int, b: int, denominator: int) -> int:
+    """
+    ceil(a * b / denominator) with full precision
+    """
+    return -(-a * b // denominator)
+
+
+def div_rounding_up(a: int, b: int) -> int:
+    """
+    ceil(a / b)
+    """
+    return -(-a // b)
+
+
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    """
+    @param tick: tick from MIN_TICK to MAX_TICK
+    @return: sqrt(1.0001^tick) * 2^96
+    @raise ValueError: if tick is out of range
+    """
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f'Tick must be from {MIN_TICK} to {MAX_TICK}, got {tick} instead')
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 0x100000000000000000000000000000000
+    for bit, multiplier in _TICK_RATIO_MULTIPLIERS:
+        if abs_tick & bit:
+            ratio = (ratio * multiplier) >> 128
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    # round up to be sure that get_tick_at_sqrt_ratio(get_sqrt_ratio_at_tick(tick)) == tick
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96: int) -> int:
+    """
+    @param sqrt_price_x96: sqrt price from MIN_SQRT_RATIO to MAX_SQRT_RATIO
+    @return: the greatest tick for which get_sqrt_ratio_at_tick(tick) <= sqrt_price_x96
+    @raise ValueError: if sqrt price is out of range
+    """
+    if sqrt_price_x96 < MIN_SQRT_RATIO or sqrt_price_x96 >= MAX_SQRT_RATIO:
+        raise ValueError(f'Sqrt price must be from {MIN_SQRT_RATIO} to {MAX_SQRT_RATIO}')
+    low, high = MIN_TICK, MAX_TICK
+    while low < high:
+        middle = (low + high + 1) // 2
+        if get_sqrt_ratio_at_tick(middle) <= sqrt_price_x96:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96: int, liquidity: int,
+                                                  amount: int, add: bool) -> int:
+    """
+    Next sqrt price after adding or removing amount of token0
+    """
+    if amount == 0:
+        return sqrt_price_x96
+    numerator1 = liquidity << 96
+    product = amount * sqrt_price_x96
+    if add:
+        if product <= MAX_UINT256:
+            denominator = numerator1 + product
+            if denominator <= MAX_UINT256:
+                return mul_div_rounding_up(numerator1, sqrt_price_x96, denominator)
+        return div_rounding_up(numerator1, numerator1 // sqrt_price_x96 + amount)
+    if product > MAX_UINT256 or numerator1 <= product:
+        raise ValueError('Not enough liquidity for the output amount')
+    return mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 - product)
+
+
+def get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96: int, liquidity: int,
+                                                    amount: int, add: bool) -> int:
+    """
+    Next sqrt price after adding or removing amount of token1
+    """
+    if add:
+        return sqrt_price_x96 + (amount << 96) // liquidity
+    quotient = div_rounding_up(amount << 96, liquidity)
+    if sqrt_price_x96 <= quotient:
+        raise ValueError('Not enough liquidity for the output amount')
+    return sqrt_price_x96 - quotient
+
+
+def get_next_sqrt_price_from_input(sqrt_price_x96: int, liquidity: int,
+                                   amount_in: int, zero_for_one: bool) -> int:
+    """
+    Next sqrt price after swapping exact amount in
+    """
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96, liquidity, amount_in, True)
+    return get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96, liquidity, amount_in, True)
+
+
+def get_next_sqrt_price_from_output(sqrt_price_x96: int, liquidity: int,
+                                    amount_out: int, zero_for_one: bool) -> int:
+    """
+    Next sqrt price after swapping for exact amount out
+    """
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96, liquidity, amount_out, False)
+    return get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96, liquidity, amount_out, False)
+
+
+def get_amount0_delta(sqrt_ratio_a_x96: int, sqrt_ratio_b_x96: int,
+                      liquidity: int, round_up: bool) -> int:
+    """
+    Amount of token0 between two sqrt prices for the given liquidity
+    """
+    if sqrt_ratio_a_x96 > sqrt_ratio_b_x96:
+        sqrt_ratio_a_x96, sqrt_ratio_b_x96 = sqrt_ratio_b_x96, sqrt_ratio_a_x96
+    numerator1 = liquidity << 96
+    numerator2 = sqrt_ratio_b_x96 - sqrt_ratio_a_x96
+    if round_up:
+        return div_rounding_up(mul_div_rounding_up(numerator1, numerator2, sqrt_ratio_b_x96),
+                               sqrt_ratio_a_x96)
+    return mul_div(numerator1, numerator2, sqrt_ratio_b_x96) // sqrt_ratio_a_x96
+
+
+def get_amount1_delta(sqrt_ratio_a_x96: int, sqrt_ratio_b_x96: int,
+                      liquidity: int, round_up: bool) -> int:
+    """
+    Amount of token1 between two sqrt prices for the given liquidity
+    """
+    if sqrt_ratio_a_x96 > sqrt_ratio_b_x96:
+        sqrt_ratio_a_x96, sqrt_ratio_b_x96 = sqrt_ratio_b_x96, sqrt_ratio_a_x96
+    if round_up:
+        return mul_div_rounding_up(liquidity, sqrt_ratio_b_x96 - sqrt_ratio_a_x96, Q96)
+    return mul_div(liquidity, sqrt_ratio_b_x96 - sqrt_ratio_a_x96, Q96)
+
+
+def compute_swap_step(sqrt_ratio_current_x96: int, sqrt_ratio_target_x96: int,
+                      liquidity: int, amount_remaining: int, fee_pips: int) -> tuple[int, int, int, int]:
+    """
+    One step of a swap inside a single tick range
+    @param sqrt_ratio_current_x96: current sqrt price of the pool
+    @param sqrt_ratio_target_x96: price which can not be exceeded in this step
+    @param liquidity: usable liquidity
+    @param amount_remaining: positive for exact input, negative for exact output
+    @param fee_pips: pool fee in hundredths of a bip, 500 for 0.05%
+    @return: (next sqrt price, amount in, amount out, fee amount)
+    """
+    zero_for_one = sqrt_ratio_current_x96 >= sqrt_ratio_target_x96
+    exact_in = amount_remaining >= 0
+    amount_in = amount_out = 0
+
+    if exact_in:
+        amount_remaining_less_fee = mul_div(amount_remaining, FEE_PIPS_DENOMINATOR - fee_pips,
+                                            FEE_PIPS_DENOMINATOR)
+        if zero_for_one:
+            amount_in = get_amount0_delta(sqrt_ratio_target_x96, sqrt_ratio_current_x96, liquidity, True)
+        else:
+            amount_in = get_amount1_delta(sqrt_ratio_current_x96, sqrt_ratio_target_x96, liquidity, True)
+        if amount_remaining_less_fee >= amount_in:
+            sqrt_ratio_next_x96 = sqrt_ratio_target_x96
+        else:
+            sqrt_ratio_next_x96 = get_next_sqrt_price_from_input(sqrt_ratio_current_x96, liquidity,
+                                                                 amount_remaining_less_fee, zero_for_one)
+    else:
+        if zero_for_one:
+            amount_out = get_amount1_delta(sqrt_ratio_target_x96, sqrt_ratio_current_x96, liquidity, False)
+        else:
+            amount_out = get_amount0_delta(sqrt_ratio_current_x96, sqrt_ratio_target_x96, liquidity, False)
+        if -amount_remaining >= amount_out:
+            sqrt_ratio_next_x96 = sqrt_ratio_target_x96
+        else:
+            sqrt_ratio_next_x96 = get_next_sqrt_price_from_output(sqrt_ratio_current_x96, liquidity,
+                                                                  -amount_remaining, zero_for_one)
+
+    reached_target = sqrt_ratio_target_x96 == sqrt_ratio_next_x96
+    if zero_for_one:
+        if not (reached_target and exact_in):
+            amount_in = get_amount0_delta(sqrt_ratio_next_x96, sqrt_ratio_current_x96, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount1_delta(sqrt_ratio_next_x96, sqrt_ratio_current_x96, liquidity, False)
+    else:
+        if not (reached_target and exact_in):
+            amount_in = get_amount1_delta(sqrt_ratio_current_x96, sqrt_ratio_next_x96, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount0_delta(sqrt_ratio_current_x96, sqrt_ratio_next_x96, liquidity, False)
+
+    # cap the output amount to not exceed the remaining output amount
+    if not exact_in and amount_out > -amount_remaining:
+        amount_out = -amount_remaining
+
+    if exact_in and sqrt_ratio_next_x96 != sqrt_ratio_target_x96:
+        # we didn't reach the target, so take the remainder of the maximum input as fee
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = mul_div_rounding_up(amount_in, fee_pips, FEE_PIPS_DENOMINATOR - fee_pips)
+    return sqrt_ratio_next_x96, amount_in, amount_out, fee_amount
+
+
+def tick_position(compressed_tick: int) -> tuple[int, int]:
+    """
+    @param compressed_tick: tick divided by tick spacing
+    @return: (word position, bit position) of the tick in the tick bitmap
+    """
+    return compressed_tick >> 8, compressed_tick & 0xff
+
+
+def next_initialized_tick_within_one_word(tick_bitmap: dict, tick: int, tick_spacing: int,
+                                          lte: bool) -> tuple[int, bool, int]:
+    """
+    Next initialized tick in the same bitmap word as the tick, to the left (lte) or to the right
+    @param tick_bitmap: dictionary {word position: 256 bit word}
+    @param tick: starting tick
+    @param tick_spacing: tick spacing of the pool
+    @param lte: search to the left (less than or equal) if True
+    @return: (next tick, is it initialized, word position used for the search)
+    @raise KeyError: if the needed word is not in tick_bitmap
+    """
+    compressed = tick // tick_spacing
+    if lte:
+        word_position, bit_position = tick_position(compressed)
+        mask = (1 << bit_position) - 1 + (1 << bit_position)
+        masked = tick_bitmap[word_position] & mask
+        initialized = masked != 0
+        if initialized:
+            next_tick = (compressed - (bit_position - (masked.bit_length() - 1))) * tick_spacing
+        else:
+            next_tick = (compressed - bit_position) * tick_spacing
+    else:
+        word_position, bit_position = tick_position(compressed + 1)
+        mask = ~((1 << bit_position) - 1) & MAX_UINT256
+        masked = tick_bitmap[word_position] & mask
+        initialized = masked != 0
+        if initialized:
+            least_significant_bit = (masked & -masked).bit_length() - 1
+            next_tick = (compressed + 1 + (least_significant_bit - bit_position)) * tick_spacing
+        else:
+            next_tick = (compressed + 1 + (255 - bit_position)) * tick_spacing
+    return next_tick, initialized, word_position
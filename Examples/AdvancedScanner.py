@@ -1,145 +1,501 @@
+import asyncio
 from threading import Thread
 from DEX.utils import exec_time
 import itertools
-from prettytable import PrettyTable
+from operator import itemgetter
 from DEX.Converter import Converter
-from networkx import DiGraph, simple_cycles
+from DEX.MulticallBatcher import MulticallBatcher
+from DEX.arbitrage_edges import token_edges, split_pair
+from DEX.ArbitrageGraph import ArbitrageGraph
+from DEX.OpportunityStream import OpportunityStream, OpportunityRenderer
+from DEX.ShardedCycleEvaluator import ShardedCycleEvaluator
+from DEX.UniswapV2 import UniswapV2
+from DEX.BaseExchange import BaseExchange
+from DEX.GasPriceFeed import GasPriceFeed
+from DEX.PriceOracle import PriceOracle
+from DEX.constants import NATIVE_TOKENS, FLASHLOAN_GAS
+import numpy as np
+from DEX.trade_size import optimal_v2_input, v2_path_amounts, golden_section_maximum
 
 
 class AdvancedScanner:
-    def __init__(self, *exchanges, quote_asset: str, quote_amount):
+    SEARCH_MODES = ('cycles', 'negative_cycles')
+
+    def __init__(self, *exchanges, quote_asset: str, quote_amount, batch_multicalls=False, quote_ladder=None,
+                 columnar_price_book=False, search_mode='cycles', top_k=20, render='table', render_interval=0,
+                 workers=None, net_profit=False, gas_price_interval=5, price_ttl=30, max_price_staleness=300,
+                 price_source='binance'):
         """
         @param exchanges: Exchange objects for scanning
         @param quote_asset: token symbol name, used for measuring volume or depth to scan
         @param quote_amount: amount of quote asset token
+        @param batch_multicalls: if True quote calls of all exchanges in the same network
+        are sent together by MulticallBatcher instead of one multicall per exchange
+        @param quote_ladder: multipliers of quote_amount every pair is quoted for,
+        like geometric_ladder(0.1, 100, 7) from DEX.utils, only quote_amount by default
+        @param columnar_price_book: if True exchanges keep quotes in PriceBook NumPy columns
+        updated in place instead of building new dictionaries on every refresh
+        @param search_mode: "cycles" evaluates every simple cycle up to max_path_length,
+        "negative_cycles" finds profitable cycles with hop indexed Bellman-Ford on -log(rate) weights,
+        which grows with edges instead of exponentially with path length, for large universes.
+        It's a heuristic: the best cycles are found, but a profitable cycle can be missed
+        when it shares a vertex with several better walks, see ArbitrageGraph.negative_cycles
+        @param top_k: amount of the best opportunities kept in arbitrage_spreads, all of them if None
+        @param render: format opportunities are printed in by a background thread after every scan,
+        "table", "jsonl" or "csv", None turns printing off
+        @param render_interval: minimum seconds between two prints, newer results replace waiting ones
+        @param workers: amount of processes cycles of the catalogue are evaluated in,
+        every process gets a shard of cycles and returns its top_k, all in this thread if None
+        @param net_profit: if True cycles are ranked and filtered by profit net of gas,
+        in percents of quote_amount, from swap_gas of every exchange, gas prices and the native token price,
+        by gross profit if False. Gas is not taken into account until the first gas price of a network arrives
+        @param gas_price_interval: seconds between background refreshes of gas prices,
+        they start in background at once
+        @param price_ttl: seconds between background refreshes of quote asset prices from Binance
+        @param max_price_staleness: scans are skipped if quote asset prices are older than that in seconds
+        @param price_source: "binance" or "price_books", then quote asset prices are derived
+        from price books of the previous scan and Binance is requested only by the first scan
+        @raise ValueError: If search_mode, render or price_source is unknown
         """
+        if search_mode not in self.SEARCH_MODES:
+            raise ValueError(f'search_mode must be one of {self.SEARCH_MODES}, got {search_mode}')
+        self.search_mode = search_mode
         self.exchanges = {exchange.name: exchange for exchange in exchanges}
-        self.converter = Converter(quote_asset, quote_amount)
+        if quote_ladder is not None:
+            for exchange in exchanges:
+                exchange.quote_ladder = quote_ladder
+        for exchange in exchanges:
+            exchange.columnar_price_book = columnar_price_book
+        self.converter = Converter(quote_asset, quote_amount, price_source)
+        self.price_oracle = PriceOracle(self.converter, price_ttl, max_price_staleness)
         self.arbitrage_spreads = None
+        self.opportunities = OpportunityStream(top_k, None if render is None
+                                               else OpportunityRenderer(render, min_interval=render_interval))
+        # graph and cycles of the previous scan, updated only where pairs changed
+        self.graph = ArbitrageGraph(catalogue=search_mode == 'cycles')
+        self.evaluator = ShardedCycleEvaluator(workers) if workers else None
+        # exchanges grouped by (network, subnet)
+        self.networks = {}
+        for exchange in exchanges:
+            self.networks.setdefault(self._network_key(exchange), []).append(exchange)
+        # last block number of every network quotes were taken at
+        self.heads = {}
+        self.net_profit = net_profit
+        # gas prices of every network refreshed in background threads, scans never wait for them
+        self.gas_feeds = {network: GasPriceFeed(network_exchanges[0].web3_client, gas_price_interval)
+                          for network, network_exchanges in self.networks.items()}
+        for feed in self.gas_feeds.values():
+            feed.start()
+        self.batchers = []
+        if batch_multicalls:
+            self.batchers = [MulticallBatcher(*network_exchanges)
+                             for network_exchanges in self.networks.values()]
+
+    @staticmethod
+    def _network_key(exchange):
+        """
+        @return: (network, subnet) of the exchange
+        """
+        return exchange.network.upper(), exchange.subnet
+
+    def get_heads(self) -> dict:
+        """
+        Cheap request of the current block number for every network
+        @return: dictionary {(network, subnet): block number}
+        """
+        return {network: exchanges[0].web3_client.eth.block_number
+                for network, exchanges in self.networks.items()}
+
+    async def get_heads_async(self) -> dict:
+        """
+        Asynchronous version of get_heads
+        @return: dictionary {(network, subnet): block number}
+        """
+        networks = list(self.networks)
+        block_numbers = await asyncio.gather(*(self.networks[network][0].web3_client_async.eth.block_number
+                                               for network in networks))
+        return dict(zip(networks, block_numbers))
 
-    def update_quote_asset_prices(self):
+    def update_quote_asset_prices(self) -> bool:
         """
-        Set quote asset prices for all exchange objects
+        Set quote asset prices for all exchange objects from the last snapshot of price_oracle,
+        only the first call waits for HTTP, then prices are refreshed in background.
+        With price_source "price_books" prices are derived from the current price books instead
+        @return: False if the snapshot is older than max_price_staleness, so prices were not set
         """
-        self.exchanges[list(self.exchanges)[0]].quote_asset_prices = self.converter.convert()
+        price_books = [exchange.price_book for exchange in self.exchanges.values() if exchange.price_book]
+        if self.converter.source == 'price_books' and price_books:
+            self.exchanges[list(self.exchanges)[0]].quote_asset_prices = self.converter.convert(price_books)
+            return True
+        if self.price_oracle.updated_at is None:
+            self.price_oracle.refresh()
+        if self.converter.source == 'binance':
+            self.price_oracle.start()
+        prices = self.price_oracle.prices
+        if prices is None:
+            print(f'Quote asset prices are {self.price_oracle.staleness:.0f}s old, '
+                  f'last error: {self.price_oracle.last_error}')
+            return False
+        self.exchanges[list(self.exchanges)[0]].quote_asset_prices = prices
+        return True
 
     # @exec_time
     def update_prices(self):
         """
         Create and run threads for update_price_book method
         for all passed in init exchanges
+        or for every MulticallBatcher if batch_multicalls is enabled
         """
         threads = []
-        for exchange in self.exchanges.values():
-            thread = Thread(target=exchange.update_price_book())
+        if self.batchers:
+            targets = [(batcher.update_price_books, self._network_key(batcher.exchanges[0]))
+                       for batcher in self.batchers]
+        else:
+            targets = [(exchange.update_price_book, self._network_key(exchange))
+                       for exchange in self.exchanges.values()]
+        for target, network in targets:
+            # quotes of one network are pinned to the same block
+            thread = Thread(target=target, args=(self.heads.get(network, 'latest'),))
             thread.start()
             threads.append(thread)
 
         for thread in threads:
             thread.join()
 
+    async def update_prices_async(self, timeout=5):
+        """
+        Run update_price_book_async for all passed in init exchanges concurrently
+        Exchange which didn't answer in timeout or raised an error gets an empty
+        price book, so it drops out of the current scan without holding back others
+        @param timeout: maximum time in seconds to wait for every exchange
+        @return: list of exchange names which dropped out
+        """
+        if self.batchers:
+            results = await asyncio.gather(
+                *(batcher.update_price_books_async(
+                    timeout, self.heads.get(self._network_key(batcher.exchanges[0]), 'latest'))
+                  for batcher in self.batchers))
+            return list(itertools.chain.from_iterable(results))
+        exchanges = list(self.exchanges.values())
+        results = await asyncio.gather(
+            *(asyncio.wait_for(exchange.update_price_book_async(
+                self.heads.get(self._network_key(exchange), 'latest')), timeout)
+              for exchange in exchanges),
+            return_exceptions=True)
+        dropped = []
+        for exchange, result in zip(exchanges, results):
+            if isinstance(result, BaseException):
+                exchange.price_book = {}
+                dropped.append(exchange.name)
+        return dropped
+
+    def consistent_exchanges(self, allow_mixed_blocks=False) -> list:
+        """
+        Exchanges which quotes can be combined in one arbitrage cycle
+        @param allow_mixed_blocks: if True all exchanges are returned
+        @return: exchanges which price book is taken at the newest block of their network
+        """
+        if allow_mixed_blocks:
+            return list(self.exchanges.values())
+        newest_blocks = {}
+        for network, exchanges in self.networks.items():
+            newest_blocks[network] = max((exchange.block_number for exchange in exchanges
+                                          if exchange.price_book and exchange.block_number is not None),
+                                         default=None)
+        return [exchange for exchange in self.exchanges.values()
+                if exchange.block_number is not None
+                and exchange.block_number == newest_blocks[self._network_key(exchange)]]
+
     @exec_time
-    def get_edges(self):
+    def get_edges(self, exchanges=None):
         """
-        Finds possible connections between vertices
+        Finds possible connections between vertices with token_edges
         Vertex has form  like "{exchange.name}_{pair_name}_{buy/sell}"
+        @param exchanges: exchanges to connect, all exchanges by default
         return: list of edges
         """
-        edges = []
-        for exchange1, exchange2 in itertools.permutations(self.exchanges.values(), 2):
-
-            for pricebook1 in exchange1.price_book:
-                base_vertex1 = f'{exchange1.name}_{pricebook1}_buy'
-                sec_vertex1 = None
-                base_vertex2 = f'{exchange1.name}_{pricebook1}_sell'
-                sec_vertex2 = None
-                for pricebook2 in exchange2.price_book:
-                    if pricebook1.split('-')[0] == pricebook2.split('-')[0]:
-                        sec_vertex1 = f'{exchange2.name}_{pricebook2}_sell'
-                    elif pricebook1.split('-')[0] == pricebook2.split('-')[1]:
-                        sec_vertex1 = f'{exchange2.name}_{pricebook2}_buy'
-
-                    if pricebook1.split('-')[1] == pricebook2.split('-')[1]:
-                        sec_vertex2 = f'{exchange2.name}_{pricebook2}_buy'
-
-                    elif pricebook1.split('-')[1] == pricebook2.split('-')[0]:
-                        sec_vertex2 = f'{exchange2.name}_{pricebook2}_sell'
-
-                    if sec_vertex1:
-                        edges.append((base_vertex1, sec_vertex1))
-                    if sec_vertex2:
-                        edges.append((base_vertex2, sec_vertex2))
-        return edges
+        if exchanges is None:
+            exchanges = self.exchanges.values()
+        return token_edges([(exchange.name, list(exchange.price_book)) for exchange in exchanges])
 
-    def scan(self, spread_threshold=-0.2, max_path_length=4):
+    def scan(self, spread_threshold=-0.2, max_path_length=4,
+             skip_if_unchanged=True, allow_mixed_blocks=False):
         """
         @param max_path_length: Max amount of steps in arbitrage
         @param spread_threshold: Minimum potential income
         to show arbitrage opportunity in %
+        @param skip_if_unchanged: don't scan if no new block arrived since the last scan
+        @param allow_mixed_blocks: allow to combine quotes from different blocks in one cycle
+        @return: True if scan was made, False if it was skipped
+        because no new block arrived or quote asset prices are too old
         """
+        heads = self.get_heads()
+        if skip_if_unchanged and heads == self.heads:
+            return False
         # Updates quote_asset_prices for all exchanges
-        self.update_quote_asset_prices()
+        if not self.update_quote_asset_prices():
+            return False
+        self.heads = heads
         # Updates pricebook of every exchange
         self.update_prices()
+        self.find_arbitrage(spread_threshold, max_path_length, allow_mixed_blocks)
+        return True
 
-        self.arbitrage_spreads = []
-        # Creates graph with edges from get_edges method
-        my_graph = DiGraph(self.get_edges())
+    async def scan_async(self, spread_threshold=-0.2, max_path_length=4, timeout=5,
+                         skip_if_unchanged=True, allow_mixed_blocks=False):
+        """
+        The same as scan, but price books of all exchanges
+        are updated concurrently with one asyncio.gather
+        @param max_path_length: Max amount of steps in arbitrage
+        @param spread_threshold: Minimum potential income
+        to show arbitrage opportunity in %
+        @param timeout: maximum time in seconds to wait for every exchange
+        @param skip_if_unchanged: don't scan if no new block arrived since the last scan
+        @param allow_mixed_blocks: allow to combine quotes from different blocks in one cycle
+        @return: True if scan was made, False if it was skipped
+        because no new block arrived or quote asset prices are too old
+        """
+        heads = await self.get_heads_async()
+        if skip_if_unchanged and heads == self.heads:
+            return False
+        if self.price_oracle.updated_at is None:
+            # only the first prices are fetched in the scan, it's a blocking http request
+            await asyncio.to_thread(self.price_oracle.refresh)
+        if not self.update_quote_asset_prices():
+            return False
+        self.heads = heads
+        dropped = await self.update_prices_async(timeout)
+        if dropped:
+            print(f'Skipped in this scan: {", ".join(dropped)}')
+        self.find_arbitrage(spread_threshold, max_path_length, allow_mixed_blocks)
+        return True
+
+    def find_arbitrage(self, spread_threshold, max_path_length, allow_mixed_blocks=False):
+        """
+        Sync the arbitrage graph with current price books, publish the best profitable cycles
+        to subscribers and put them to arbitrage_spreads from the most profitable one.
+        With net_profit profits are net of gas in percents of quote_amount
+        @param max_path_length: Max amount of steps in arbitrage
+        @param spread_threshold: Minimum potential income
+        to show arbitrage opportunity in %
+        @param allow_mixed_blocks: allow to combine quotes from different blocks in one cycle
+        """
+        # Updates the persistent graph, cycles are searched again only through changed pairs
+        exchanges = self.consistent_exchanges(allow_mixed_blocks)
+        self.graph.max_path_length = max_path_length
+        self.graph.sync([(exchange.name, list(exchange.price_book)) for exchange in exchanges])
 
-        # Finds possible arbitrage routes and calculate potential profit
-        cycles = sorted(filter(lambda x: len(x) > 1, simple_cycles(my_graph, max_path_length)))
-        for cycle in cycles:
-            spread = self.calculate_path_income(cycle)
-            if spread[1] >= spread_threshold:
-                self.arbitrage_spreads.append(spread)
+        # Profits of all known arbitrage routes are calculated at once,
+        # path previews are built only for routes above the threshold
+        price_books = {exchange.name: exchange.price_book for exchange in exchanges}
+        costs = self.gas_costs(exchanges) if self.net_profit else None
+        if self.search_mode == 'negative_cycles':
+            profitable_cycles = self.graph.negative_cycles(price_books, spread_threshold, costs=costs)
+        else:
+            profitable_cycles = self.graph.profitable_cycles(price_books, spread_threshold,
+                                                             self.opportunities.top.size, self.evaluator, costs)
+        # The best routes go first, so routes which can't get to the top are skipped at once
+        profitable_cycles.sort(key=itemgetter(1), reverse=True)
+        self.opportunities.start_scan()
+        for cycle, profit in profitable_cycles:
+            if not self.opportunities.top.accepts(profit):
+                break
+            self.opportunities.publish((self.calculate_path_income(cycle)[0], profit))
+        # the table is printed by the renderer thread
+        self.arbitrage_spreads = self.opportunities.end_scan()
 
-        # prints arbitrage table
-        self.print_arbitrage_table()
+    def native_token_price(self, network: str):
+        """
+        @param network: network name like Polygon
+        @return: price of the native token of the network in quote asset units,
+        Converter.matic_price for Polygon, None if it's unknown
+        """
+        prices = BaseExchange._quote_asset_prices or {}
+        quote_amount = self.converter.quote_amount
+        if network.upper() == 'POLYGON' and self.converter.matic_price and prices.get('USDC'):
+            # matic_price is in USDC
+            return self.converter.matic_price * quote_amount / prices['USDC']
+        native_token = NATIVE_TOKENS.get(network.upper())
+        if prices.get(native_token):
+            return quote_amount / prices[native_token]
+        return None
 
-    @exec_time
-    def print_arbitrage_table(self):
+    def path_gas(self, path) -> int:
+        """
+        @param path: list of arbitrage steps
+        @return: estimated gas of the flash loan transaction
+        """
+        return FLASHLOAN_GAS + sum(self.exchanges[step.split('_')[0]].swap_gas for step in path)
+
+    def gas_price(self, exchange) -> int:
+        """
+        @param exchange: exchange object
+        @return: the last gas price in wei of the exchange network from its background feed,
+        None until the feed gets the first price
+        """
+        return self.gas_feeds[self._network_key(exchange)].gas_price
+
+    def gas_unit_cost(self, exchange):
+        """
+        @param exchange: exchange object
+        @return: quote asset paid for one unit of gas in the exchange network, None if it's unknown
+        """
+        gas_price = self.gas_price(exchange)
+        native_price = self.native_token_price(exchange.network)
+        if gas_price is None or native_price is None:
+            return None
+        return gas_price * native_price / 10 ** 18
+
+    @staticmethod
+    def _first_step_token(step: str) -> str:
+        """
+        @param step: arbitrage step like "SushiSwapV2_WMATIC-USDC_buy"
+        @return: symbol of the token the step takes, the quote token of the pair for buy and the base token for sell
+        """
+        _, pair, action = step.split('_')
+        base, quote = split_pair(pair)
+        return quote if action == 'buy' else base
+
+    def quote_asset_value(self, token: str, amount: float):
+        """
+        @param token: token symbol
+        @param amount: amount of the token
+        @return: amount worth in quote asset units, None if the token price is unknown
+        """
+        token_amount = (BaseExchange._quote_asset_prices or {}).get(token)
+        if not token_amount:
+            return None
+        return amount * self.converter.quote_amount / token_amount
+
+    def net_path_profit(self, path, profit: float, amount: float):
         """
-        Print on a display arbitrage table with 2 columns
-        1) PATH - arbitrage steps
-        2) Possible profit in %
+        Profit of a path net of gas of its flash loan transaction, the same figure scans rank by
+        @param path: list of arbitrage steps
+        @param profit: gross profit in percents
+        @param amount: amount_in of the first step in its input token,
+        the quote token of the pair for buy and the base token for sell
+        @return: net profit in percents of amount, None if gas cost or the input token price is unknown
         """
-        arbitrage_table = PrettyTable()
-        arbitrage_table.field_names = ['PATH', 'Profit %']
-        arbitrage_table.sortby = 'Profit %'
-        arbitrage_table.max_table_width = 800
-        arbitrage_table.reversesort = True
+        path = list(path)
+        gas_unit_cost = self.gas_unit_cost(self.exchanges[path[0].split('_')[0]])
+        value = self.quote_asset_value(self._first_step_token(path[0]), amount)
+        if gas_unit_cost is None or not value:
+            return None
+        return profit - self.path_gas(path) * gas_unit_cost / value * 100
 
-        for spread in self.arbitrage_spreads:
-            arbitrage_table.add_row([' -> '.join(spread[0].keys()), spread[1]], divider=True)
+    def gas_costs(self, exchanges) -> np.ndarray:
+        """
+        Gas costs in percents of quote_amount for ArbitrageGraph
+        @param exchanges: exchanges of the graph
+        @return: matrix of 2 rows, cost of a swap on the exchange of every vertex
+        and cost of the flash loan of a cycle starting at the vertex, None if no gas price is known
+        """
+        swap_costs = {}
+        cycle_costs = {}
+        for exchange in exchanges:
+            gas_unit_cost = self.gas_unit_cost(exchange)
+            if gas_unit_cost is None:
+                continue
+            # in percents of quote_amount
+            gas_cost = gas_unit_cost / self.converter.quote_amount * 100
+            swap_costs[exchange.name] = exchange.swap_gas * gas_cost
+            cycle_costs[exchange.name] = FLASHLOAN_GAS * gas_cost
+        if not swap_costs:
+            return None
+        return np.vstack([self.graph.exchange_vector(swap_costs), self.graph.exchange_vector(cycle_costs)])
+
+    def close(self):
+        """
+        Stop the renderer thread, worker processes, gas price feeds and the price oracle
+        """
+        self.price_oracle.stop()
+        for feed in self.gas_feeds.values():
+            feed.stop()
+        if self.opportunities.renderer is not None:
+            self.opportunities.renderer.stop()
+        if self.evaluator is not None:
+            self.evaluator.close()
+
+    def subscribe(self, callback):
+        """
+        @param callback: function called with (path_preview, profit) of every opportunity
+        which gets to the top of a scan, right when it's evaluated, from the best one
+        """
+        self.opportunities.subscribe(callback)
+
+    def print_arbitrage_table(self):
+        """
+        Hand arbitrage_spreads of the last scan to the renderer thread again,
+        it prints them in the render format, nothing is printed if render is None
+        """
+        if self.opportunities.renderer is not None and self.arbitrage_spreads is not None:
+            self.opportunities.renderer.submit(self.arbitrage_spreads)
 
-        print(arbitrage_table)
+    @staticmethod
+    def _depth_amount_out(quote: dict, action: str, amount_in: float) -> float:
+        """
+        Amount we get for amount_in on one step, interpolated over the depth curve of the quote.
+        The curve starts at (0, 0) and the slope of the last segment is used beyond the biggest size
+        @param quote: quote from an exchange price book
+        @param action: buy or sell
+        @param amount_in: quote asset amount to buy with or base asset amount to sell
+        @return: base asset amount for buy or quote asset amount for sell
+        """
+        depth = quote.get('depth')
+        if depth is None:
+            points = [(quote['buy_amount'] * quote['buy_price'], quote['buy_amount'])] if action == 'buy' \
+                else [(quote['sell_amount'], quote['sell_amount'] * quote['sell_price'])]
+        elif action == 'buy':
+            points = [(amount, buy_amount) for amount, buy_amount
+                      in zip(depth['amounts'], depth['buy_amounts']) if buy_amount]
+        else:
+            points = [(sell_amount, amount) for amount, sell_amount
+                      in zip(depth['amounts'], depth['sell_amounts']) if sell_amount]
+        if not points:
+            return 0
+        x0, y0 = 0, 0
+        for x1, y1 in points:
+            if amount_in <= x1:
+                break
+            x0, y0 = x1, y1
+        else:
+            if len(points) > 1:
+                x0, y0 = points[-2]
+        return y0 + (y1 - y0) * (amount_in - x0) / (x1 - x0)
 
-    def calculate_path_income(self, path):
+    def calculate_path_income(self, path, amount=None):
         """
         Calculates profit of a certain arbitrage path
         :param path: List of arbitrage steps
+        :param amount: amount of the first step input token, quote asset for buy and base asset for sell.
+        If provided, every step is evaluated on the depth curve of its quote and path_preview
+        has effective prices of the size, otherwise the main quote amount of the first step is used with the main prices
         :return: path_preview like "SushiSwapV3/500_WMATIC-WETH_sell -> UniswapV3/500_WMATIC-WETH_buy",
         and profit in percents
         """
         initial_amount = None
-        amount_in = None
+        amount_in = amount
         path_preview = {}
         amount_out = 0
         for index, step in enumerate(path):
 
             exchange_name, pair, action = step.split('_')
             exchange = self.exchanges[exchange_name]
-            step_price = exchange.price_book[pair][f'{action}_price']
+            quote = exchange.price_book[pair]
+            step_price = quote[f'{action}_price']
 
-            if action == 'buy':
-                if index == 0:
-                    initial_amount = exchange.price_book[pair][f'{action}_amount'] * step_price
-                    amount_in = initial_amount
+            if index == 0:
+                if amount_in is None:
+                    amount_in = quote['buy_amount'] * step_price if action == 'buy' else quote['sell_amount']
+                initial_amount = amount_in
+            if amount is not None:
+                amount_out = self._depth_amount_out(quote, action, amount_in)
+                if amount_in > 0 and amount_out > 0:
+                    # effective price of this size, so the trader expects the right amount out
+                    step_price = amount_in / amount_out if action == 'buy' else amount_out / amount_in
+            elif action == 'buy':
                 amount_out = amount_in / step_price
             else:
-                if index == 0:
-                    amount_in = exchange.price_book[pair][f'{action}_amount']
-                    initial_amount = amount_in
                 amount_out = amount_in * step_price
             path_preview[step] = [step_price, amount_in]
             amount_in = amount_out
@@ -148,6 +504,74 @@ class AdvancedScanner:
 
         return path_preview, profit
 
+    def _v2_legs(self, path) -> list:
+        """
+        @param path: list of arbitrage steps
+        @return: list of tuples (reserve_in, reserve_out, fee_numerator, fee_denominator, token_in, token_out)
+        for every step, None if a step is not on a UniswapV2 like exchange with known reserves
+        """
+        legs = []
+        for step in path:
+            exchange_name, pair, action = step.split('_')
+            exchange = self.exchanges[exchange_name]
+            if not isinstance(exchange, UniswapV2) or pair not in exchange.reserves:
+                return None
+            base_reserve, quote_reserve = exchange.reserves[pair]
+            tokens = exchange.pair_list[pair]
+            if action == 'buy':
+                legs.append((quote_reserve, base_reserve, exchange.fee_numerator, exchange.fee_denominator,
+                             tokens['quote_asset'], tokens['base_asset']))
+            else:
+                legs.append((base_reserve, quote_reserve, exchange.fee_numerator, exchange.fee_denominator,
+                             tokens['base_asset'], tokens['quote_asset']))
+        return legs
+
+    def _first_step_sizes(self, path) -> tuple:
+        """
+        @return: the smallest and the biggest first step input amount quoted on the depth curve,
+        None if the first step has one quoted size
+        """
+        exchange_name, pair, action = path[0].split('_')
+        depth = self.exchanges[exchange_name].price_book[pair].get('depth')
+        if depth is None:
+            return None
+        if action == 'buy':
+            sizes = [amount for amount, buy_amount in zip(depth['amounts'], depth['buy_amounts']) if buy_amount]
+        else:
+            sizes = [sell_amount for sell_amount in depth['sell_amounts'] if sell_amount]
+        return (min(sizes), max(sizes)) if len(sizes) > 1 else None
+
+    def optimize_path(self, path, iterations=60):
+        """
+        Size an arbitrage path for the biggest absolute profit.
+        Paths of UniswapV2 like exchanges with reserves are sized in closed form
+        and evaluated with exact integer router math, other paths are sized by golden-section search
+        of the depth curves between the smallest and the biggest size of quote_ladder
+        @param path: list of arbitrage steps
+        @param iterations: maximum amount of evaluations of the golden-section search
+        @return: path_preview with the first step amount_in as the input amount, and profit in percents,
+        the same as calculate_path_income if the path can't be sized
+        """
+        path = list(path)
+        legs = self._v2_legs(path)
+        if legs is not None:
+            raw_amount = int(optimal_v2_input([leg[:4] for leg in legs]))
+            amounts = v2_path_amounts([leg[:4] for leg in legs], raw_amount) if raw_amount > 0 else None
+            if amounts is not None:
+                path_preview = {}
+                for step, leg, raw_in, raw_out in zip(path, legs, amounts, amounts[1:]):
+                    amount_in = raw_in / 10 ** leg[4].decimals
+                    amount_out = raw_out / 10 ** leg[5].decimals
+                    step_price = amount_in / amount_out if step.endswith('_buy') else amount_out / amount_in
+                    path_preview[step] = [step_price, amount_in]
+                return path_preview, (amounts[-1] - amounts[0]) / amounts[0] * 100
+        sizes = self._first_step_sizes(path)
+        if sizes is None:
+            return self.calculate_path_income(path)
+        amount = golden_section_maximum(lambda size: size * self.calculate_path_income(path, size)[1],
+                                        *sizes, max_iterations=iterations)
+        return self.calculate_path_income(path, amount)
+
 
 if __name__ == "__main__":
     from DEX.UniswapV3 import UniswapV3
@@ -155,7 +579,6 @@ if __name__ == "__main__":
     from DEX.SushiSwapV3 import SushiSwapV3
     import os
     from dotenv import load_dotenv
-    import time
 
     load_dotenv()
     net = "Polygon"
@@ -175,8 +598,13 @@ if __name__ == "__main__":
     sushi2 = SushiSwapV2(net, subnet, web3_provider, sushi2_pairs)
 
     scanner = AdvancedScanner(uniswapV3_500, uniswapV3_3000, sushi2, sushi3_500, sushi3_3000,
-                              quote_asset='USDC', quote_amount=100)
-    while True:
-        scanner.scan(spread_threshold=-0.4, max_path_length=4)
-        time.sleep(10)
+                              quote_asset='USDC', quote_amount=100, batch_multicalls=True)
+
+    async def main():
+        while True:
+            # scan every new block, polling the head is much cheaper than a scan
+            await scanner.scan_async(spread_threshold=-0.4, max_path_length=4)
+            await asyncio.sleep(1)
+
+    asyncio.run(main())
 
@@ -9,7 +9,6 @@ from DEX.utils import get_contract
 from AdvancedScanner import AdvancedScanner
 from threading import Thread
 import codecs
-from operator import itemgetter
 
 
 class AdvancedTrader:
@@ -31,20 +30,32 @@ class AdvancedTrader:
     def arbitrage(self):
         while True:
             try:
-                self.scanner.scan()
-                spreads = sorted(self.scanner.arbitrage_spreads,
-                                 key=itemgetter(1), reverse=True)
-                if spreads[0][1] > self.thd:
+                if not self.scanner.scan():
+                    # no new block since the last scan
+                    time.sleep(1)
+                    continue
+                # already sorted from the most profitable opportunity
+                spreads = self.scanner.arbitrage_spreads
+                if spreads:
+                    # the flash loan takes the profit maximizing amount instead of the quote size,
+                    # so the decision is made for that amount
+                    path, optimal_profit = self.scanner.optimize_path(spreads[0][0])
+                    optimal_amount = list(path.values())[0][1]
+                    # gas is paid once per transaction, so it's charged to the optimized amount
+                    net_profit = self.scanner.net_path_profit(path, optimal_profit, optimal_amount)
+                    if net_profit is None or net_profit <= self.thd:
+                        if net_profit is not None and optimal_profit > self.thd:
+                            print('Potential income do not worth transaction fee')
+                        time.sleep(10)
+                        continue
                     print(f'Arbitrage opportunity found! '
-                          f'\n {" -> ".join(spreads[0][0].keys())}'
-                          f'\n Potential profit is {spreads[0][1]}%')
-                    path = spreads[0][0]
+                          f'\n {" -> ".join(path.keys())}'
+                          f'\n Optimal size {optimal_amount}, potential profit net of gas is {net_profit}%')
                     amount_in = None
                     trades = []
                     approves = []
                     tokens = []
                     routers = []
-                    remainder = 0
                     for index, (step, prices) in enumerate(path.items()):
                         # Loop through the arbitrage steps and collect all needed data for my smart contract
                         trade, amount_out_min, approve, quote_asset, router = \
@@ -55,7 +66,6 @@ class AdvancedTrader:
                         print('-----------------------')
                         if index == 0:
                             flashloan_amount = int(prices[1] * 10**quote_asset.decimals)
-                        remainder += 0.1
                         amount_in = amount_out_min
                         trades.append(trade)
                         approves.append(approve)
@@ -64,31 +74,27 @@ class AdvancedTrader:
                     encoded_data = encode(types=['address[]', 'bytes[]', 'address[]', 'bytes[]'],
                                           args=[routers, trades, tokens, approves])
 
-                    min_income = (self.thd - remainder) / 100 * self.quote_amount + 100
                     self.prepare_tansaction()
-                    gas = 250000 + 150000*len(trades)
-                    if min_income > self.gas_price*gas * self.converter.matic_price / 10**18 * 1.05:
-                        # If potential income more than gas fees
-                        request_flashloan = self.arbitrage_contract.functions.requestFlashLoan(
-                            tokens[0], flashloan_amount,
-                            encoded_data).build_transaction({"chainId": self.chain_id,
-                                                             "from": self.address, "gas": gas, "nonce": self.nonce,
-                                                             'maxFeePerGas': int(self.gas_price * 1.05),
-                                                             'maxPriorityFeePerGas': int(self.gas_price * 1)})
-                        try:
-                            signed_tx = self.w3.eth.account.sign_transaction(request_flashloan,
-                                                                             private_key=self.private_key)
-
-                            send_tx = self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-                            tx_receipt = self.w3.eth.wait_for_transaction_receipt(send_tx)
-                            print(tx_receipt)
-                            time.sleep(1)
-                            break
-
-                        except Exception as e:
-                            print(e)
-                    else:
-                        print('Potential income do not worth transaction fee')
+                    gas = self.scanner.path_gas(list(path))
+                    gas_price = self.scanner.gas_price(self.exchanges[list(path)[0].split('_')[0]])
+                    request_flashloan = self.arbitrage_contract.functions.requestFlashLoan(
+                        tokens[0], flashloan_amount,
+                        encoded_data).build_transaction({"chainId": self.chain_id,
+                                                         "from": self.address, "gas": gas, "nonce": self.nonce,
+                                                         'maxFeePerGas': int(gas_price * 1.05),
+                                                         'maxPriorityFeePerGas': int(gas_price * 1)})
+                    try:
+                        signed_tx = self.w3.eth.account.sign_transaction(request_flashloan,
+                                                                         private_key=self.private_key)
+
+                        send_tx = self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+                        tx_receipt = self.w3.eth.wait_for_transaction_receipt(send_tx)
+                        print(tx_receipt)
+                        time.sleep(1)
+                        break
+
+                    except Exception as e:
+                        print(e)
                 time.sleep(10)
 
             except Exception as e:
@@ -133,22 +139,16 @@ class AdvancedTrader:
     def get_chain_id(self):
         self.chain_id = self.w3.eth.chain_id
 
-    def get_gas_price(self):
-        self.gas_price = self.w3.eth.gas_price
-
     def prepare_tansaction(self):
-        # get actual nonce, gas price and chain id
+        # get actual nonce and chain id, gas price is taken from the scanner gas feeds
         thread1 = Thread(target=self.get_nonce())
         thread2 = Thread(target=self.get_chain_id())
-        thread3 = Thread(target=self.get_gas_price())
 
         thread1.start()
         thread2.start()
-        thread3.start()
 
         thread1.join()
         thread2.join()
-        thread3.join()
 
 
 if __name__ == "__main__":
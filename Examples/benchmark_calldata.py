@@ -0,0 +1,54 @@
+"""
+Compares building quote calls with contract.encodeABI for every call
+and with calldata templates, where only the amount word is encoded.
+No RPC requests are made, so any url works
+"""
+import timeit
+from DEX.SushiSwapV2 import SushiSwapV2
+from DEX.UniswapV3 import UniswapV3
+from DEX.utils import geometric_ladder
+
+PAIRS = ['WMATIC-WETH', 'WETH-USDC', 'WBTC-WETH', 'WMATIC-USDC', 'LINK-WETH', 'WETH-USDT']
+REPEATS = 20
+
+
+def encode_abi_calls(exchange):
+    """
+    Quote calls encoded by contract.encodeABI, like before calldata templates
+    """
+    calls = []
+    contract = exchange.quoter if isinstance(exchange, UniswapV3) else exchange.router
+    for pair, tokens in exchange.pair_list.items():
+        for amount in exchange.ladder_amounts(pair):
+            calls.append((contract.address,
+                          exchange._encode_buy_price_func(tokens['base_asset'], tokens['quote_asset'], amount)))
+            calls.append((contract.address,
+                          exchange._encode_sell_price_func(tokens['base_asset'], tokens['quote_asset'], amount)))
+    return calls
+
+
+def report(name, exchange, build_calls):
+    seconds = timeit.timeit(build_calls, number=REPEATS) / REPEATS
+    calls = len(build_calls())
+    print(f'{name:<44} {seconds * 1e3:8.3f} ms per refresh, {seconds / calls * 1e6:7.2f} us per call')
+
+
+if __name__ == '__main__':
+    url = 'http://127.0.0.1:8545'
+    exchanges = {'UniswapV3 quoter': UniswapV3('Polygon', 'MAINNET', url, 500, PAIRS),
+                 'SushiSwapV2 router': SushiSwapV2('Polygon', 'MAINNET', url, PAIRS)}
+    for exchange in exchanges.values():
+        exchange.quote_asset_prices = {'USDC': 100, 'WETH': 0.05, 'WMATIC': 150,
+                                       'USDT': 100, 'WBTC': 0.003, 'LINK': 7}
+        exchange.quote_ladder = geometric_ladder(0.1, 100, 8)
+
+    for name, exchange in exchanges.items():
+        if isinstance(exchange, UniswapV3):
+            calls_property, build_calls = 'quoter_calls', exchange._build_quoter_calls
+        else:
+            calls_property, build_calls = 'router_calls', exchange._build_router_calls
+        # templates are compiled by the first call
+        assert encode_abi_calls(exchange) == getattr(exchange, calls_property)
+        report(f'{name}, encodeABI', exchange, lambda: encode_abi_calls(exchange))
+        report(f'{name}, templates', exchange, build_calls)
+        report(f'{name}, cached calls', exchange, lambda: getattr(exchange, calls_property))
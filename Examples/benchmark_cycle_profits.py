@@ -0,0 +1,73 @@
+"""
+Compares walking every cycle in Python, like calculate_path_income does,
+with ArbitrageGraph.cycle_profits, which sums log-rates of a price vector
+over the compiled cycle matrix. Price books are random, no RPC requests are made
+"""
+import random
+import time
+from DEX.ArbitrageGraph import ArbitrageGraph
+from DEX.PriceBook import PriceBook
+
+TOKENS = [f'TOKEN{index}' for index in range(12)]
+EXCHANGES = 5
+PAIRS = 30
+MAX_PATH_LENGTH = 4
+SPREAD_THRESHOLD = 0.5
+
+
+def random_quotes(values):
+    quotes = {}
+    while len(quotes) < PAIRS:
+        base, quote = random.sample(TOKENS, 2)
+        price = values[base] / values[quote] * random.uniform(0.995, 1.005)
+        quotes[f'{base}-{quote}'] = {'buy_price': price * random.uniform(1, 1.01), 'buy_amount': 1,
+                                     'sell_price': price * random.uniform(0.99, 1), 'sell_amount': 1}
+    return quotes
+
+
+def python_profits(cycles, price_books):
+    """
+    Walk of every cycle with vertex string splitting and path previews, like calculate_path_income
+    """
+    spreads = []
+    for cycle in cycles:
+        amount = 1
+        path_preview = {}
+        for step in cycle:
+            exchange_name, pair, action = step.split('_')
+            step_price = price_books[exchange_name][pair][f'{action}_price']
+            path_preview[step] = [step_price, amount]
+            amount = amount / step_price if action == 'buy' else amount * step_price
+        profit = (amount - 1) * 100
+        if profit >= SPREAD_THRESHOLD:
+            spreads.append((path_preview, profit))
+    return spreads
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    random.seed(1)
+    values = {token: random.uniform(0.1, 10) for token in TOKENS}
+    price_books = {f'Exchange{index}': random_quotes(values) for index in range(EXCHANGES)}
+    graph = ArbitrageGraph(MAX_PATH_LENGTH)
+    graph.sync([(exchange_name, list(quotes)) for exchange_name, quotes in price_books.items()])
+    cycles, compile_seconds = timed(lambda: graph.cycles)
+    print(f'{len(cycles)} cycles, compiled in {compile_seconds * 1e3:.1f} ms once per topology change')
+
+    spreads, seconds = timed(python_profits, cycles, price_books)
+    print(f'{"python walk":<30} {seconds * 1e3:8.1f} ms, {len(spreads)} cycles above threshold')
+    profitable, seconds = timed(graph.profitable_cycles, price_books, SPREAD_THRESHOLD)
+    print(f'{"cycle_profits, dict books":<30} {seconds * 1e3:8.1f} ms, {len(profitable)} cycles above threshold')
+
+    columnar_books = {}
+    for exchange_name, quotes in price_books.items():
+        columnar_books[exchange_name] = PriceBook()
+        columnar_books[exchange_name].load(quotes)
+    graph.profitable_cycles(columnar_books, SPREAD_THRESHOLD)
+    profitable, seconds = timed(graph.profitable_cycles, columnar_books, SPREAD_THRESHOLD)
+    print(f'{"cycle_profits, PriceBook":<30} {seconds * 1e3:8.1f} ms, {len(profitable)} cycles above threshold')
@@ -0,0 +1,79 @@
+"""
+Compares the former get_edges loop over all exchange and pair combinations
+with token_edges, which joins pairs on an index by token.
+Price books are random pairs of a fixed token list, no RPC requests are made.
+The old loop is too slow for the biggest size, its time is extrapolated from a smaller run
+"""
+import itertools
+import random
+import time
+from DEX.arbitrage_edges import token_edges
+
+TOKENS = [f'TOKEN{index}' for index in range(150)]
+SIZES = [(10, 40), (20, 80), (50, 200)]
+# biggest amount of inner steps the old loop is really run for
+MAX_OLD_STEPS = 10 ** 7
+
+
+def old_edges(price_books):
+    """
+    get_edges before the token index, kept for comparison
+    """
+    edges = []
+    for (name1, pairs1), (name2, pairs2) in itertools.permutations(price_books, 2):
+        for pricebook1 in pairs1:
+            base_vertex1 = f'{name1}_{pricebook1}_buy'
+            sec_vertex1 = None
+            base_vertex2 = f'{name1}_{pricebook1}_sell'
+            sec_vertex2 = None
+            for pricebook2 in pairs2:
+                if pricebook1.split('-')[0] == pricebook2.split('-')[0]:
+                    sec_vertex1 = f'{name2}_{pricebook2}_sell'
+                elif pricebook1.split('-')[0] == pricebook2.split('-')[1]:
+                    sec_vertex1 = f'{name2}_{pricebook2}_buy'
+
+                if pricebook1.split('-')[1] == pricebook2.split('-')[1]:
+                    sec_vertex2 = f'{name2}_{pricebook2}_buy'
+                elif pricebook1.split('-')[1] == pricebook2.split('-')[0]:
+                    sec_vertex2 = f'{name2}_{pricebook2}_sell'
+
+                if sec_vertex1:
+                    edges.append((base_vertex1, sec_vertex1))
+                if sec_vertex2:
+                    edges.append((base_vertex2, sec_vertex2))
+    return edges
+
+
+def random_price_books(exchanges, pairs):
+    books = []
+    for index in range(exchanges):
+        pair_names = set()
+        while len(pair_names) < pairs:
+            base, quote = random.sample(TOKENS, 2)
+            pair_names.add(f'{base}-{quote}')
+        books.append((f'Exchange{index}', sorted(pair_names)))
+    return books
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    random.seed(1)
+    old_step_seconds = None
+    for exchanges, pairs in SIZES:
+        books = random_price_books(exchanges, pairs)
+        new, new_seconds = timed(token_edges, books)
+        old_steps = exchanges * (exchanges - 1) * pairs * pairs
+        if old_steps <= MAX_OLD_STEPS:
+            old, old_seconds = timed(old_edges, books)
+            old_step_seconds = old_seconds / old_steps
+            assert set(old) == set(new), 'edge sets differ'
+            old_text = f'{old_seconds * 1e3:10.1f} ms'
+        else:
+            old_text = f'{old_step_seconds * old_steps * 1e3:10.1f} ms (extrapolated)'
+        print(f'{exchanges:>3} exchanges x {pairs:>3} pairs: old loop {old_text}, '
+              f'token index {new_seconds * 1e3:8.1f} ms, {len(set(new))} edges')
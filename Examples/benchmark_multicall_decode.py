@@ -0,0 +1,45 @@
+"""
+Compares decoding of tryBlockAndAggregate results of getAmountsOut/getAmountsIn calls
+by eth_abi (what web3 contract call and codec.decode do) with fixed offsets parsing of multicall_codec
+"""
+import random
+import timeit
+from eth_abi import encode, decode
+from DEX.multicall_codec import decode_try_block_and_aggregate
+
+REPEATS = 5
+
+
+def make_raw_result(calls: int) -> bytes:
+    """
+    @param calls: amount of router calls in the multicall
+    @return: ABI encoded tryBlockAndAggregate result, every 20th call failed
+    """
+    results = []
+    for index in range(calls):
+        amounts = [random.getrandbits(96), random.getrandbits(96)]
+        results.append((index % 20 != 0, encode(['uint256[]'], [amounts])))
+    return encode(['uint256', 'bytes32', '(bool,bytes)[]'], [1, bytes(32), results])
+
+
+def eth_abi_decode(raw: bytes) -> list:
+    _, _, results = decode(['uint256', 'bytes32', '(bool,bytes)[]'], raw)
+    amounts = []
+    for index, (success, data) in enumerate(results):
+        amounts.append(decode(['uint256[]'], data)[0][1 - index % 2] if success else None)
+    return amounts
+
+
+def fixed_offsets_decode(raw: bytes) -> list:
+    _, _, results = decode_try_block_and_aggregate(raw)
+    return results.words([3, 2] * (len(results) // 2))
+
+
+if __name__ == '__main__':
+    for pairs in [10, 100, 1000, 5000]:
+        raw = make_raw_result(2 * pairs)
+        assert eth_abi_decode(raw) == fixed_offsets_decode(raw)
+        eth_abi_time = timeit.timeit(lambda: eth_abi_decode(raw), number=REPEATS) / REPEATS
+        fixed_time = timeit.timeit(lambda: fixed_offsets_decode(raw), number=REPEATS) / REPEATS
+        print(f'{pairs:>5} pairs: eth_abi {eth_abi_time * 1e3:9.3f} ms, '
+              f'fixed offsets {fixed_time * 1e3:7.3f} ms, x{eth_abi_time / fixed_time:.0f}')
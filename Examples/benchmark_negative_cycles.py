@@ -0,0 +1,51 @@
+"""
+Compares cycle catalogue search with hop indexed Bellman-Ford negative cycle search
+of ArbitrageGraph for growing max_path_length. Price books are random quotes
+around common token values, no RPC requests are made
+"""
+import random
+import time
+from DEX.ArbitrageGraph import ArbitrageGraph
+
+TOKENS = [f'TOKEN{index}' for index in range(20)]
+EXCHANGES = 6
+PAIRS = 40
+PATH_LENGTHS = (2, 3, 4, 5, 6)
+# catalogue search is skipped after it takes longer than this
+MAX_CATALOGUE_SECONDS = 2
+
+
+def random_quotes(values):
+    quotes = {}
+    while len(quotes) < PAIRS:
+        base, quote = random.sample(TOKENS, 2)
+        price = values[base] / values[quote] * random.uniform(0.995, 1.005)
+        quotes[f'{base}-{quote}'] = {'buy_price': price * random.uniform(1, 1.01), 'buy_amount': 1,
+                                     'sell_price': price * random.uniform(0.99, 1), 'sell_amount': 1}
+    return quotes
+
+
+def search(price_books, max_path_length, catalogue):
+    start = time.perf_counter()
+    graph = ArbitrageGraph(max_path_length, catalogue=catalogue)
+    graph.sync([(exchange_name, list(quotes)) for exchange_name, quotes in price_books.items()])
+    if catalogue:
+        found = graph.profitable_cycles(price_books, 0)
+    else:
+        found = graph.negative_cycles(price_books, 0)
+    return found, time.perf_counter() - start, graph.graph.number_of_edges()
+
+
+if __name__ == '__main__':
+    random.seed(1)
+    values = {token: random.uniform(0.1, 10) for token in TOKENS}
+    price_books = {f'Exchange{index}': random_quotes(values) for index in range(EXCHANGES)}
+    catalogue_seconds = 0
+    for max_path_length in PATH_LENGTHS:
+        found, seconds, edges = search(price_books, max_path_length, catalogue=False)
+        line = (f'max_path_length {max_path_length}, {edges} edges: '
+                f'negative cycles {seconds * 1e3:8.1f} ms ({len(found)} profitable found)')
+        if catalogue_seconds < MAX_CATALOGUE_SECONDS:
+            found, catalogue_seconds, _ = search(price_books, max_path_length, catalogue=True)
+            line += f', catalogue {catalogue_seconds * 1e3:9.1f} ms ({len(found)} profitable)'
+        print(line)
@@ -0,0 +1,99 @@
+"""
+Compares per-exchange web3 clients with clients shared through ProviderRegistry.
+A local JSON-RPC server counts accepted connections, every round sends one request
+per exchange from a new thread, like AdvancedScanner.update_prices does,
+and one asynchronous round per exchange with asyncio.gather
+"""
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import mean
+from threading import Thread, Lock
+from web3 import Web3, AsyncWeb3
+from DEX.ProviderRegistry import ProviderRegistry
+
+EXCHANGES = 10
+ROUNDS = 50
+
+
+class RPCHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    connections = 0
+    lock = Lock()
+
+    def setup(self):
+        super().setup()
+        with RPCHandler.lock:
+            RPCHandler.connections += 1
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        body = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0x1'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_sync(clients):
+    latencies = []
+
+    def request(client):
+        start = time.perf_counter()
+        client.eth.block_number
+        latencies.append(time.perf_counter() - start)
+
+    for _ in range(ROUNDS):
+        threads = [Thread(target=request, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return latencies
+
+
+async def run_async(clients):
+    latencies = []
+
+    async def request(client):
+        start = time.perf_counter()
+        await client.eth.block_number
+        latencies.append(time.perf_counter() - start)
+
+    for _ in range(ROUNDS):
+        await asyncio.gather(*(request(client) for client in clients))
+    return latencies
+
+
+def report(name, run):
+    RPCHandler.connections = 0
+    latencies = run()
+    print(f'{name:<28} mean latency {mean(latencies) * 1000:7.3f} ms, '
+          f'{RPCHandler.connections} connections for {len(latencies)} requests')
+
+
+if __name__ == '__main__':
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RPCHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+
+    report('sync, client per exchange',
+           lambda: run_sync([Web3(Web3.HTTPProvider(url)) for _ in range(EXCHANGES)]))
+    registry = ProviderRegistry(pool_size=EXCHANGES)
+    report('sync, ProviderRegistry', lambda: run_sync([registry.web3(url) for _ in range(EXCHANGES)]))
+
+    async def per_exchange():
+        return await run_async([AsyncWeb3(Web3.AsyncHTTPProvider(url)) for _ in range(EXCHANGES)])
+
+    async def shared():
+        return await run_async([registry.async_web3(url) for _ in range(EXCHANGES)])
+
+    report('async, client per exchange', lambda: asyncio.run(per_exchange()))
+    report('async, ProviderRegistry', lambda: asyncio.run(shared()))
+    server.shutdown()
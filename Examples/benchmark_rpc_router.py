@@ -0,0 +1,101 @@
+"""
+Compares one RPC endpoint with RPCRouter over three local mock JSON-RPC servers:
+a fast one, a slow one and a flaky one which is rate limited every third request.
+eth_call requests are hedged, eth_blockNumber requests are balanced by score
+"""
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import mean, quantiles
+from threading import Thread
+from DEX.ProviderRegistry import ProviderRegistry
+
+REQUESTS = 200
+
+
+def mock_server(delay: float, rate_limit_every: int = 0):
+    """
+    @param delay: seconds the server waits before answering
+    @param rate_limit_every: answer with a rate limit error to every n-th request, 0 to never
+    @return: url of the started server
+    """
+    counter = {'requests': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            counter['requests'] += 1
+            time.sleep(delay)
+            if rate_limit_every and counter['requests'] % rate_limit_every == 0:
+                answer = {'jsonrpc': '2.0', 'id': request['id'],
+                          'error': {'code': -32005, 'message': 'limit exceeded'}}
+            else:
+                answer = {'jsonrpc': '2.0', 'id': request['id'], 'result': '0x1'}
+            body = json.dumps(answer).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        def handle_error(self, request, client_address):
+            # hedged requests which lost the race are cancelled by the client
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def report(name, latencies):
+    percentiles = quantiles(latencies, n=100)
+    print(f'{name:<34} mean {mean(latencies) * 1000:7.2f} ms, '
+          f'p50 {percentiles[49] * 1000:7.2f} ms, p99 {percentiles[98] * 1000:7.2f} ms')
+
+
+def run_sync(client, call):
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        call(client)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run_async(client):
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        await client.eth.call({'to': '0x' + '00' * 20, 'data': '0x'})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+if __name__ == '__main__':
+    fast = mock_server(0.005)
+    slow = mock_server(0.05)
+    flaky = mock_server(0.002, rate_limit_every=3)
+    urls = [slow, flaky, fast]
+    registry = ProviderRegistry(hedge=2)
+
+    def eth_call(client):
+        return client.eth.call({'to': '0x' + '00' * 20, 'data': '0x'})
+
+    def block_number(client):
+        return client.eth.block_number
+
+    report('eth_call, slow endpoint only', run_sync(registry.web3(slow), eth_call))
+    report('eth_call, hedged by RPCRouter', run_sync(registry.web3(urls), eth_call))
+    report('eth_blockNumber, balanced', run_sync(registry.web3(urls), block_number))
+
+    report('async eth_call, hedged', asyncio.run(run_async(registry.async_web3(urls))))
+    for endpoint in registry.router(urls).ranked():
+        print(endpoint, f'requests={endpoint.requests}, errors={endpoint.errors}')
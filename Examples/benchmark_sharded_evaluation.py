@@ -0,0 +1,43 @@
+"""
+Compares evaluation of a big cycle catalogue in one thread with ShardedCycleEvaluator
+for growing amounts of worker processes. The catalogue is a random matrix of vertex ids,
+like ArbitrageGraph compiles it, so building it doesn't dominate the run.
+Speedup is limited by the amount of CPU cores of the machine
+"""
+import os
+import time
+import numpy as np
+from DEX.ShardedCycleEvaluator import ShardedCycleEvaluator, top_cycle_profits
+
+VERTICES = 40000
+CYCLES = 4 * 10 ** 6
+MAX_PATH_LENGTH = 4
+WORKERS = (1, 2, 4, 8)
+SCANS = 5
+TOP_K = 20
+
+
+def timed_scans(evaluate, vertex_ids, rng):
+    seconds = []
+    for _ in range(SCANS):
+        log_rates = np.r_[rng.normal(0, 0.003, VERTICES), 0]
+        start = time.perf_counter()
+        evaluate(vertex_ids, log_rates, 0, TOP_K)
+        seconds.append(time.perf_counter() - start)
+    # the first scan shares the cycle matrix, later ones only the price vector
+    return min(seconds[1:])
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(1)
+    vertex_ids = rng.integers(0, VERTICES, (CYCLES, MAX_PATH_LENGTH), dtype=np.intp)
+    print(f'{CYCLES} cycles, {os.cpu_count()} CPU cores')
+    serial = timed_scans(top_cycle_profits, vertex_ids, rng)
+    print(f'{"one thread":<12} {serial * 1e3:8.1f} ms per scan')
+    for workers in WORKERS:
+        evaluator = ShardedCycleEvaluator(workers)
+        try:
+            seconds = timed_scans(evaluator.top_cycle_profits, vertex_ids, rng)
+        finally:
+            evaluator.close()
+        print(f'{f"{workers} workers":<12} {seconds * 1e3:8.1f} ms per scan, speedup {serial / seconds:4.2f}x')
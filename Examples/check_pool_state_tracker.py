@@ -0,0 +1,98 @@
+"""
+Replays recorded eth_getLogs results of fixtures/pool_state_tracker_reorg.json
+through PoolStateTracker with a fake web3 client, including chain reorganizations,
+and checks reserves, processed blocks and stored block hashes after every poll
+"""
+import json
+import os
+from types import SimpleNamespace
+from web3 import Web3
+from DEX.PoolStateTracker import PoolStateTracker
+from DEX.Token import Token
+from DEX.UniswapV2 import UniswapV2
+
+FIXTURE_PATH = f'{os.path.dirname(os.path.abspath(__file__))}/fixtures/pool_state_tracker_reorg.json'
+PAIR = 'AAA-BBB'
+
+
+class FakeEth:
+    """
+    eth module of a web3 client which serves blocks and logs of a recorded chain
+    """
+
+    def __init__(self):
+        # {block number: block from the fixture}
+        self.chain = {}
+
+    def get_block(self, block_identifier):
+        block = self.chain[max(self.chain) if block_identifier == 'latest' else block_identifier]
+        return {'number': block['number'], 'hash': bytes.fromhex(block['hash'][2:])}
+
+    def get_logs(self, filter_params):
+        logs = []
+        for block_number in range(filter_params['fromBlock'], filter_params['toBlock'] + 1):
+            for log in self.chain.get(block_number, {'logs': []})['logs']:
+                logs.append(dict(log, topics=[bytes.fromhex(topic[2:]) for topic in log['topics']],
+                                 data=bytes.fromhex(log['data'][2:]),
+                                 blockHash=bytes.fromhex(log['blockHash'][2:])))
+        return logs
+
+
+class FakeExchange(UniswapV2):
+    """
+    UniswapV2 exchange with one pair quoted from reserves, full state is loaded from the fixture
+    """
+
+    def __init__(self, web3_client, pool: str, initial_reserves: list):
+        self._price_book = None
+        self.columnar_price_book = False
+        self.name = 'FakeExchange'
+        self.web3_client = web3_client
+        self.block_number = None
+        self.block_hash = None
+        self._pair_list = {PAIR: {'base_asset': Token('AAA', '0x' + '11' * 20, 18),
+                                  'quote_asset': Token('BBB', '0x' + '22' * 20, 18)}}
+        self._pair_addresses = {PAIR: pool}
+        self.initial_reserves = tuple(initial_reserves)
+        self.reserves = {}
+        self.quote_source = 'reserves'
+
+    @property
+    def pair_list(self) -> dict:
+        return self._pair_list
+
+    @property
+    def pair_addresses(self) -> dict:
+        return self._pair_addresses
+
+    def update_price_book(self, block_identifier='latest'):
+        self.reserves[PAIR] = self.initial_reserves
+        self.price_book = self.local_price_book([PAIR])
+        block = self.web3_client.eth.get_block(block_identifier)
+        self.stamp_price_book(block['number'], block['hash'])
+
+    def local_price_book(self, pairs) -> dict:
+        return {pair: {'reserves': self.reserves[pair]} for pair in pairs}
+
+
+if __name__ == '__main__':
+    with open(FIXTURE_PATH, 'r') as file:
+        fixture = json.load(file)
+    eth = FakeEth()
+    exchange = FakeExchange(SimpleNamespace(eth=eth, to_hex=Web3.to_hex),
+                            fixture['pool'], fixture['initial_reserves'])
+    tracker = PoolStateTracker(exchange, history_size=8)
+    for step in fixture['steps']:
+        for block in step['blocks']:
+            eth.chain[block['number']] = block
+        changed = tracker.poll()
+        assert exchange.reserves[PAIR] == tuple(step['reserves']), (step['comment'], exchange.reserves[PAIR])
+        assert tracker.last_block == step['last_block'], (step['comment'], tracker.last_block)
+        assert bool(changed) == step['changed'], (step['comment'], changed)
+        stored = [(number, '0x' + block_hash.hex()) for number, block_hash in tracker.block_hashes]
+        assert len({number for number, _ in stored}) == len(stored), (step['comment'], stored)
+        assert all(eth.chain[number]['hash'] == block_hash for number, block_hash in stored), step['comment']
+        assert exchange.price_book[PAIR]['block_number'] == tracker.last_block, step['comment']
+        print(f'block {tracker.last_block:>3}: reserves {exchange.reserves[PAIR]}, '
+              f'{len(stored)} stored block hashes - {step["comment"]}')
+    print('PoolStateTracker replay matches the fixture')